@@ -0,0 +1,107 @@
+"""
+Registration-day benchmark for course enrollment (src/enrollment.py).
+
+Runs against a throwaway copy of src/ (so sanzad.db is never touched).
+Worker threads act as students enrolling at once in a handful of popular,
+capacity-limited courses; every request is sent twice under the same
+request key (a double click) and some students drop again, which promotes
+the waitlist. Reports requests per second and latency percentiles, and
+checks the invariants:
+
+  - no course is overbooked
+  - seat counters match the enrollment rows
+  - a repeated request key returns the first outcome
+
+Exits non-zero when an invariant is violated:
+
+    python bench_enrollment.py [--threads 16] [--students 3000] [--courses 10] [--capacity 200]
+"""
+
+import argparse
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+INSTITUTION = "Bench University"
+
+
+def _worker(enrollment, students, courses, latencies, errors):
+    for student_id in students:
+        code = courses[student_id % len(courses)]
+        key = f"bench:{student_id}:{code}"
+        try:
+            started = time.perf_counter()
+            first = enrollment.enroll(INSTITUTION, code, student_id, request_key=key)
+            latencies.append(time.perf_counter() - started)
+            again = enrollment.enroll(INSTITUTION, code, student_id, request_key=key)
+            if again["status"] != first["status"]:
+                errors.append(f"request {key} returned {first['status']} then {again['status']}")
+            if student_id % 7 == 0:
+                enrollment.drop(INSTITUTION, code, student_id)
+        except Exception as exc:  # surfaced in the report
+            errors.append(f"student {student_id}: {type(exc).__name__}: {exc}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--students", type=int, default=3000)
+    parser.add_argument("--courses", type=int, default=10)
+    parser.add_argument("--capacity", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copytree(ROOT / "src", Path(tmp) / "src", ignore=shutil.ignore_patterns("__pycache__"))
+        sys.path.insert(0, str(Path(tmp) / "src"))
+        import db
+        import enrollment
+
+        db.init_db()
+        courses = [f"BENCH{i:03d}" for i in range(args.courses)]
+        enrollment.set_capacities(INSTITUTION, [(code, code, "", args.capacity) for code in courses])
+        students = list(range(1, args.students + 1))
+        latencies, errors = [], []
+        threads = [
+            threading.Thread(
+                target=_worker, args=(enrollment, students[t :: args.threads], courses, latencies, errors)
+            )
+            for t in range(args.threads)
+        ]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        desk = enrollment.get_enrollment_desk().stats()
+        broken = db.enrollment_check(INSTITUTION)
+        seats = db.list_course_seats(INSTITUTION, limit=args.courses)
+
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(int(p * len(latencies)), len(latencies) - 1)] * 1000
+
+    print(
+        f"{len(latencies)} enrollments with {args.threads} threads in {elapsed:.2f} s: "
+        f"{len(latencies) / elapsed:.0f} requests/s, p50 {pct(0.5):.1f} ms, p99 {pct(0.99):.1f} ms"
+    )
+    print(f"{desk['batches']} commits, {desk['retries']} version-conflict retries")
+    print(f"enrolled {sum(s[4] for s in seats)} / {sum(s[3] for s in seats)} seats, waitlisted {sum(s[5] for s in seats)}")
+    if broken:
+        errors.append(f"seat counters out of line: {broken}")
+
+    for error in errors[:20]:
+        print(f"ERROR: {error}")
+    if errors:
+        print("FAIL: enrollment invariants violated")
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Payment throughput benchmark for the local SANZAD Pay ledger (src/payments.py).
+
+Runs against a throwaway copy of src/ (so sanzad.db is never touched).
+Worker threads act as concurrent Mess Hub and Fees tabs: each payment is
+requested twice under the same idempotency key (a double click) and then
+settled, mostly as SUCCESS, some as FAILED. Reports payments per second
+and checks the invariants:
+
+  - every idempotency key produced exactly one payment
+  - the ledger balances (entries sum to zero, balances match entries)
+  - revenue equals the sum of successful payments
+
+Exits non-zero when an invariant is violated:
+
+    python bench_payments.py [--threads 8] [--payments 2000]
+"""
+
+import argparse
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+
+
+def _worker(payments, n, offset, failures, errors):
+    for i in range(offset, offset + n):
+        domain = "mess" if i % 2 else "finance"
+        try:
+            request = dict(
+                tenant_id="Bench University",
+                payer_id=str(i % 500),
+                amount=150.0 if domain == "mess" else 1234.56,
+                currency="KES",
+                description=f"{domain} #{i}",
+                metadata={"domain": domain},
+                idempotency_key=f"bench:{i}",
+            )
+            first = payments.create_payment_request(**request)
+            again = payments.create_payment_request(**request)
+            if first["payment_id"] != again["payment_id"]:
+                errors.append(f"idempotency key bench:{i} produced two payments")
+            success = i % 10 != 0
+            payments.complete_payment(first["payment_id"], success=success)
+            # Settling twice must not post twice.
+            payments.complete_payment(first["payment_id"], success=success)
+            if not success:
+                failures.append(i)
+        except Exception as exc:  # surfaced in the report
+            errors.append(f"payment {i}: {type(exc).__name__}: {exc}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--payments", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copytree(ROOT / "src", Path(tmp) / "src", ignore=shutil.ignore_patterns("__pycache__"))
+        sys.path.insert(0, str(Path(tmp) / "src"))
+        import db
+        import payments
+
+        db.init_db()
+        per_thread = args.payments // args.threads
+        failures, errors = [], []
+        threads = [
+            threading.Thread(target=_worker, args=(payments, per_thread, t * per_thread, failures, errors))
+            for t in range(args.threads)
+        ]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        total = per_thread * args.threads
+        counts = {status: (n, cents) for status, n, cents in db.payment_status_counts()}
+        sums, mismatched = db.ledger_check()
+        revenue = sum(
+            cents for name, _, cents in db.ledger_balances("Bench University") if name.startswith("revenue:")
+        )
+
+    print(f"{total} payments with {args.threads} threads in {elapsed:.2f} s: {total / elapsed:.0f} payments/s")
+    print(f"status counts: {counts}")
+    if sum(n for n, _ in counts.values()) != total:
+        errors.append(f"expected {total} payments, found {sum(n for n, _ in counts.values())}")
+    if any(sums.values()) or mismatched:
+        errors.append(f"ledger out of balance: sums {sums}, mismatched accounts {mismatched}")
+    if revenue != counts.get("SUCCESS", (0, 0))[1]:
+        errors.append(f"revenue {revenue} != successful payments {counts.get('SUCCESS')}")
+    if len(failures) != counts.get("FAILED", (0, 0))[0]:
+        errors.append(f"expected {len(failures)} failed payments, found {counts.get('FAILED')}")
+
+    for error in errors[:20]:
+        print(f"ERROR: {error}")
+    if errors:
+        print("FAIL: payment invariants violated")
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
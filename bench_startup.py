@@ -0,0 +1,111 @@
+"""
+Startup benchmark for the SANZAD Streamlit shell.
+
+Runs src/app.py headless through streamlit's AppTest, each sample in a fresh
+interpreter and against a throwaway copy of src/ (so sanzad.db is never
+touched), and reports:
+
+  first paint   first script run of a new process: app imports, schema setup
+                and the Home page, i.e. what a visitor waits for
+  warm-up       time until the background import of every wing has finished
+  rerun         median of further reruns of the same session, after warm-up
+
+Exits non-zero when a median exceeds its budget, so it can guard against
+regressions:
+
+    python bench_startup.py [--samples 5]
+"""
+
+import argparse
+import json
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+
+# Budgets in milliseconds (medians); streamlit's own import is not counted.
+FIRST_PAINT_BUDGET_MS = 800
+RERUN_BUDGET_MS = 250
+RERUNS = 5
+
+
+def _child(app_path: str):
+    """Measure one cold process and print the result as JSON."""
+    sys.path.insert(0, str(Path(app_path).parent))
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(app_path, default_timeout=60)
+    started = time.perf_counter()
+    at.run()
+    first_paint = time.perf_counter() - started
+    if at.exception:
+        raise SystemExit(f"app raised: {at.exception[0].value}")
+
+    from module_registry import get_registry
+
+    get_registry().wait_warm()
+    warm_up = time.perf_counter() - started
+
+    reruns = []
+    for _ in range(RERUNS):
+        started = time.perf_counter()
+        at.run()
+        reruns.append(time.perf_counter() - started)
+
+    print(
+        json.dumps(
+            {
+                "first_paint_ms": first_paint * 1000,
+                "warm_up_ms": warm_up * 1000,
+                "rerun_ms": statistics.median(reruns) * 1000,
+            }
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child)
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copytree(ROOT / "src", Path(tmp) / "src", ignore=shutil.ignore_patterns("__pycache__"))
+        app_path = str(Path(tmp) / "src" / "app.py")
+        for i in range(args.samples):
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", app_path],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+            r = results[-1]
+            print(
+                f"sample {i + 1}: first paint {r['first_paint_ms']:.0f} ms, "
+                f"warm-up {r['warm_up_ms']:.0f} ms, rerun {r['rerun_ms']:.0f} ms"
+            )
+
+    first_paint = statistics.median(r["first_paint_ms"] for r in results)
+    rerun = statistics.median(r["rerun_ms"] for r in results)
+    print(f"median first paint {first_paint:.0f} ms (budget {FIRST_PAINT_BUDGET_MS} ms)")
+    print(f"median rerun       {rerun:.0f} ms (budget {RERUN_BUDGET_MS} ms)")
+
+    failed = first_paint > FIRST_PAINT_BUDGET_MS or rerun > RERUN_BUDGET_MS
+    if failed:
+        print("FAIL: startup budget exceeded")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,22 +12,50 @@ SANZAD 1.0 main shell (dark‑blue, Profile-driven, Register + Login + Super Adm
 - Student / Teacher / Parent: full Wings navigation and modules.
 """
 
-import importlib
-from typing import List, Dict
+import time
 
 import streamlit as st
-import pandas as pd
 
 from translations import t
+from grid import paged_grid, source_fetch, current_page, pager
+from module_registry import get_registry
+from media_store import get_media_store
+import session_memory
+from event_log import get_event_writer
+from notifications import get_notifier
+from fees import current_term, reconcile_term
+from shell_assets import theme_css, WING_MODULES, NAV_LABELS, LABEL_TO_MODULE, MODULE_TO_LABEL
 from db import (
     init_db,
     create_user,
     add_institution_application,
-    list_institutions,
     approve_institution_db,
     delete_institution_application,
-    list_users,
+    institution_overview,
+    list_institution_departments,
+    query_users,
+    user_facets,
+    USER_QUERY_COLUMNS,
     set_user_status,
+    set_users_status_bulk,
+    set_institution_users_status,
+    list_user_status_audit,
+    get_user_status,
+    user_status_epoch,
+    count_events_by_type,
+    list_outbox,
+    bill_term_fee,
+    record_fee_payment,
+    list_fee_terms,
+    fee_term_totals,
+    student_fee_summaries,
+    DEBT_AGING_BUCKETS,
+    add_teacher_debt,
+    settle_teacher_debt,
+    debt_aging_report,
+    list_teacher_debts,
+    teacher_debt_summaries,
+    select_page,
     verify_login,
 )
 
@@ -50,152 +78,10 @@ if MAIN_LOGO_PATH or ICON_LOGO_PATH:
 # -------------------------------------------------------------------
 # GLOBAL CSS
 # -------------------------------------------------------------------
-st.markdown(
-    """
-    <style>
-    body, .stApp {
-        background:
-            radial-gradient(circle at top left, #0f172a 0, #020617 35%, #020617 70%, #000000 100%),
-            radial-gradient(circle at bottom right, rgba(16,185,129,0.12) 0, rgba(16,185,129,0.0) 55%);
-        background-color: #020617;
-        color: #e5e7eb;
-        font-family: -apple-system, BlinkMacSystemFont, "SF Pro Text", "Segoe UI", sans-serif;
-    }
-
-    section[data-testid="stMain"] > div.block-container {
-        padding-top: 4.6rem;
-        padding-bottom: 3rem;
-        max-width: 1300px;
-    }
-
-    header[data-testid="stHeader"] {
-        background-color: transparent;
-    }
-
-    .szt-top-nav {
-        position: fixed;
-        top: 0; left: 0; right: 0;
-        z-index: 100;
-        backdrop-filter: blur(18px);
-        background: linear-gradient(90deg,
-                    rgba(15,23,42,0.98) 0%,
-                    rgba(17,24,39,0.98) 40%,
-                    rgba(30,64,175,0.98) 80%,
-                    rgba(21,128,61,0.98) 100%);
-        border-bottom: 1px solid rgba(59,130,246,0.9);
-        padding: 0.6rem 1.8rem 0.7rem 1.8rem;
-        display: flex; align-items: center; justify-content: space-between;
-        box-shadow: 0 14px 36px rgba(15,23,42,0.95);
-    }
-    .szt-top-left { display: flex; align-items: center; gap: 0.9rem; }
-    .szt-logo-mark { display: flex; align-items: center; gap: 0.6rem; }
-    .szt-logo-circle {
-        height: 38px; width: 38px; border-radius: 999px;
-        background: radial-gradient(circle at 25% 0, #38bdf8, #22c55e 45%, #0ea5e9 100%);
-        display: flex; align-items: center; justify-content: center;
-        color: #020617; font-size: 1.06rem; font-weight: 800;
-        box-shadow: 0 16px 34px rgba(56,189,248,0.9);
-    }
-    .szt-logo-text-main {
-        font-size: 1.05rem; font-weight: 720; letter-spacing: 0.16em;
-        text-transform: uppercase; color: #e5e7eb;
-    }
-    .szt-logo-text-sub {
-        font-size: 0.8rem; color: #bfdbfe; margin-top: -0.1rem;
-    }
-
-    .szt-top-center { display: flex; align-items: center; gap: 0.5rem; font-size: 0.84rem; }
-    .szt-top-pill {
-        padding: 0.18rem 0.8rem; border-radius: 999px;
-        border: 1px solid rgba(148, 163, 184, 0.85);
-        color: #e5e7eb; font-size: 0.8rem; background: rgba(15,23,42,0.7);
-    }
-    .szt-top-tag-primary {
-        border-color: rgba(56,189,248,0.95);
-        color: #e0f2fe;
-        background: linear-gradient(135deg, rgba(59,130,246,0.65), rgba(34,197,94,0.5));
-    }
-    .szt-top-right { display: flex; align-items: center; gap: 0.5rem; font-size: 0.8rem; color: #e5e7eb; }
-    .szt-top-right span strong { color: #bfdbfe; }
-
-    [data-testid="stSidebar"] {
-        background: radial-gradient(circle at top, #020617 0, #020617 45%, #020617 100%);
-        border-right: 1px solid #020617;
-    }
-    .szt-sidebar-section {
-        padding: 0.4rem 0.6rem 0.9rem 0.6rem;
-        border-radius: 0.9rem;
-        background: rgba(15,23,42,0.96);
-        border: 1px solid rgba(30,64,175,0.9);
-        margin-bottom: 0.9rem;
-        box-shadow: 0 14px 32px rgba(15,23,42,1);
-    }
-    .szt-sidebar-title {
-        font-size: 0.78rem; text-transform: uppercase;
-        letter-spacing: 0.16em; color: #93c5fd; margin-bottom: 0.35rem;
-    }
-
-    .szt-card {
-        padding: 1.2rem 1.6rem;
-        border-radius: 1rem;
-        background: radial-gradient(circle at top left, #020617 0, #020617 55%, #020617 100%);
-        border: 1px solid rgba(30,64,175,0.95);
-        box-shadow: 0 20px 44px rgba(15,23,42,1);
-        margin-bottom: 1.0rem;
-        transition: transform 140ms ease-out, box-shadow 140ms ease-out,
-                    border-color 140ms ease-out, background 140ms ease-out;
-    }
-    .szt-card:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 26px 64px rgba(15,23,42,1);
-        border-color: rgba(56,189,248,0.95);
-        background: radial-gradient(circle at top left, #020617 0, #020617 40%, #020617 100%);
-    }
-
-    h1, h2, h3, h4 {
-        font-weight: 620; letter-spacing: 0.03em; color: #e5e7eb;
-    }
-
-    .stButton>button {
-        border-radius: 999px; border: 1px solid #22c55e;
-        background: linear-gradient(135deg, #22c55e, #38bdf8);
-        color: #020617; padding: 0.4rem 1.35rem;
-        font-weight: 600; font-size: 0.9rem;
-        box-shadow: 0 12px 32px rgba(34,197,94,0.75);
-        transition: transform 80ms ease-out, box-shadow 80ms ease-out,
-                    background 80ms ease-out, border-color 80ms ease-out;
-    }
-    .stButton>button:hover {
-        border-color: #4ade80;
-        background: linear-gradient(135deg, #4ade80, #60a5fa);
-        transform: translateY(-1px);
-        box-shadow: 0 18px 48px rgba(37,99,235,1);
-    }
-    .stButton>button:active {
-        transform: translateY(0px) scale(0.99);
-        box-shadow: 0 10px 26px rgba(15,23,42,1);
-    }
+def apply_theme():
+    # static/theme.css is read and minified once per process (shell_assets).
+    st.markdown(f"<style>{theme_css()}</style>", unsafe_allow_html=True)
 
-    .szt-footer {
-        margin-top: 2rem; padding-top: 1rem;
-        border-top: 1px solid #1f2937;
-        text-align: center; font-size: 0.85rem; color: #9ca3af;
-    }
-
-    @media (max-width: 768px) {
-        .szt-top-nav {
-            padding: 0.5rem 1.0rem 0.65rem 1.0rem;
-            flex-direction: column; align-items: flex-start; gap: 0.25rem;
-        }
-        .szt-logo-text-main { font-size: 0.98rem; }
-        section[data-testid="stMain"] > div.block-container {
-            padding-top: 4.9rem; padding-left: 0.75rem; padding-right: 0.75rem;
-        }
-    }
-    </style>
-    """,
-    unsafe_allow_html=True,
-)
 
 # -------------------------------------------------------------------
 # LANGUAGE OPTIONS
@@ -236,6 +122,23 @@ def login_user_with_email(email: str, password: str):
         "status": user["status"],
     }
 
+
+def enforce_user_status():
+    """Sign the session out if its user has been blocked since the last check."""
+    user = st.session_state.get("current_user")
+    epoch = user_status_epoch()
+    if not user or st.session_state.get("user_status_epoch") == epoch:
+        return
+    st.session_state["user_status_epoch"] = epoch
+    status = get_user_status(user["id"])
+    if status == "active":
+        user["status"] = status
+        return
+    st.session_state["current_user"] = None
+    if user.get("role") == "Super Admin":
+        st.session_state["is_super_admin"] = False
+    st.warning("Your account is no longer active. You have been signed out.")
+
 # -------------------------------------------------------------------
 # TOP NAV + ABOUT
 # -------------------------------------------------------------------
@@ -305,6 +208,29 @@ def show_language_switcher():
             st.session_state["lang"] = new_lang
             st.rerun()
 
+# -------------------------------------------------------------------
+# FRAGMENT STATE CONTRACT
+# -------------------------------------------------------------------
+# The dashboards are split into st.fragment regions (filters + table,
+# action panels). A widget inside a region only reruns that region, not
+# the shell, init_db() or the other regions. Regions never call each other;
+# they share state only through st.session_state["data_versions"]:
+#
+#   - Table regions read their data with indexed queries on every run (other
+#     sessions write too, so a per-session copy would go stale) and reset
+#     their paging when the dataset version changes.
+#   - Action regions call mark_data_changed(name) after a write, then
+#     st.rerun() so every region redraws once with fresh data.
+def data_version(name: str) -> int:
+    return st.session_state.setdefault("data_versions", {}).get(name, 0)
+
+
+def mark_data_changed(*names: str):
+    versions = st.session_state.setdefault("data_versions", {})
+    for name in names:
+        versions[name] = versions.get(name, 0) + 1
+
+
 # -------------------------------------------------------------------
 # SUPER ADMIN DASHBOARD
 # -------------------------------------------------------------------
@@ -317,144 +243,407 @@ def show_super_admin_dashboard():
     )
     st.markdown("</div>", unsafe_allow_html=True)
 
-    tab_inst, tab_users = st.tabs(["🏫 Institutions", "👥 Platform users"])
+    tab_inst, tab_users, tab_diag = st.tabs(
+        ["🏫 Institutions", "👥 Platform users", "🩺 Diagnostics"]
+    )
 
     # ---------- Institutions ----------
     with tab_inst:
         st.markdown('<div class="szt-card">', unsafe_allow_html=True)
         st.subheader("Institutions")
+        sa_institutions_table()
+        sa_institution_actions()
+        st.markdown("</div>", unsafe_allow_html=True)
+
+    # ---------- Users ----------
+    with tab_users:
+        st.markdown('<div class="szt-card">', unsafe_allow_html=True)
+        st.subheader("All platform users")
+        sa_users_table()
+        sa_user_actions()
+        st.markdown("</div>", unsafe_allow_html=True)
+
+    # ---------- Diagnostics ----------
+    with tab_diag:
+        st.markdown('<div class="szt-card">', unsafe_allow_html=True)
+        st.subheader("Platform diagnostics")
+        sa_module_health()
+        sa_media_usage()
+        sa_session_memory()
+        sa_event_log()
+        sa_notifications()
+        st.markdown("</div>", unsafe_allow_html=True)
+
+
+@st.fragment
+def sa_institutions_table():
+    status_filter = st.selectbox(
+        "Filter by status",
+        ["All", "pending", "approved"],
+        index=0,
+        key="sa_inst_status_filter",
+    )
+    filters = {} if status_filter == "All" else {"status": status_filter}
+
+    paged_grid(
+        "sa_inst_grid",
+        source_fetch("institutions", filters),
+        columns=["id", "name", "code", "status", "country", "city", "details"],
+        search_label="Search by name, country, or city",
+        reset_on=(status_filter, data_version("institutions")),
+    )
+
 
-        status_filter = st.selectbox(
-            "Filter by status",
-            ["All", "pending", "approved"],
-            index=0,
-            key="sa_inst_status_filter",
+@st.fragment
+def sa_institution_actions():
+    st.markdown("### Actions")
+    col_a, col_b, col_c = st.columns(3)
+    with col_a:
+        inst_name_approve = st.text_input(
+            "Institution name to approve / assign code", key="sa_inst_name_approve"
         )
-        search_text = st.text_input(
-            "Search by name, country, or city",
-            key="sa_inst_search",
+        inst_code = st.text_input("Code (optional, leave blank to keep existing)", key="sa_inst_code")
+        if st.button("Approve / update code", key="sa_btn_approve_inst"):
+            if inst_name_approve.strip():
+                code_val = inst_code.strip() or None
+                approve_institution_db(inst_name_approve.strip(), code_val)
+                mark_data_changed("institutions")
+                st.success("Institution updated.")
+                st.rerun()
+            else:
+                st.error("Enter institution name.")
+    with col_b:
+        inst_name_delete = st.text_input(
+            "Pending institution name to delete", key="sa_inst_name_delete"
         )
-
-        raw_rows = list_institutions(
-            status=None if status_filter == "All" else status_filter
+        if st.button("Delete pending application", key="sa_btn_delete_inst"):
+            if inst_name_delete.strip():
+                delete_institution_application(inst_name_delete.strip())
+                mark_data_changed("institutions")
+                st.success("Pending application deleted (if found).")
+                st.rerun()
+            else:
+                st.error("Enter institution name.")
+    with col_c:
+        inst_name_users = st.text_input(
+            "Institution name to block / unblock all users", key="sa_inst_name_users"
         )
+        col_c1, col_c2 = st.columns(2)
+        for col, label, status in (
+            (col_c1, "Block all users", "blocked"),
+            (col_c2, "Unblock all users", "active"),
+        ):
+            with col:
+                if st.button(label, key=f"sa_btn_inst_users_{status}"):
+                    if inst_name_users.strip():
+                        changed = set_institution_users_status(
+                            inst_name_users.strip(), status, actor="Super Admin"
+                        )
+                        users_status_changed()
+                        st.success(f"{changed} user(s) of {inst_name_users.strip()} set to {status}.")
+                        st.rerun()
+                    else:
+                        st.error("Enter institution name.")
 
-        cols = ["id", "name", "code", "status", "country", "city", "details"]
-        df = pd.DataFrame(raw_rows, columns=cols)
 
-        if search_text.strip():
-            s = search_text.strip().lower()
-            mask = (
-                df["name"].str.lower().str.contains(s)
-                | df["country"].fillna("").str.lower().str.contains(s)
-                | df["city"].fillna("").str.lower().str.contains(s)
-            )
-            df = df[mask]
+@st.cache_data(ttl=60, show_spinner=False)
+def cached_user_facets():
+    """Facet counts shared by all Super Admin sessions; cleared after status changes."""
+    return user_facets()
 
-        st.dataframe(df, use_container_width=True)
 
-        st.markdown("### Actions")
-        col_a, col_b, col_c = st.columns(3)
-        with col_a:
-            inst_name_approve = st.text_input(
-                "Institution name to approve / assign code", key="sa_inst_name_approve"
-            )
-            inst_code = st.text_input("Code (optional, leave blank to keep existing)", key="sa_inst_code")
-            if st.button("Approve / update code", key="sa_btn_approve_inst"):
-                if inst_name_approve.strip():
-                    code_val = inst_code.strip() or None
-                    approve_institution_db(inst_name_approve.strip(), code_val)
-                    st.success("Institution updated.")
-                    st.rerun()
-                else:
-                    st.error("Enter institution name.")
-        with col_b:
-            inst_name_delete = st.text_input(
-                "Pending institution name to delete", key="sa_inst_name_delete"
-            )
-            if st.button("Delete pending application", key="sa_btn_delete_inst"):
-                if inst_name_delete.strip():
-                    delete_institution_application(inst_name_delete.strip())
-                    st.success("Pending application deleted (if found).")
-                    st.rerun()
-                else:
-                    st.error("Enter institution name.")
-        with col_c:
-            st.info(
-                "To block all users of an institution, use the **Platform users** tab "
-                "and filter by institution name, then block them."
-            )
+def users_status_changed():
+    mark_data_changed("users")
+    cached_user_facets.clear()
 
-        st.markdown("</div>", unsafe_allow_html=True)
 
-    # ---------- Users ----------
-    with tab_users:
-        st.markdown('<div class="szt-card">', unsafe_allow_html=True)
-        st.subheader("All platform users")
+@st.fragment
+def sa_users_table():
+    facets = cached_user_facets()
+    role_counts = dict(facets["role"])
+    status_counts = dict(facets["status"])
+    institution_counts = dict(facets["institution"])
 
-        users: List[Dict] = list_users()
-        df_users = pd.DataFrame(users)
+    role_filter = st.multiselect(
+        "Filter by role",
+        options=list(role_counts),
+        default=list(role_counts),
+        format_func=lambda r: f"{r} ({role_counts[r]})",
+        key="sa_user_role_filter",
+    )
+    status_filter = st.multiselect(
+        "Filter by status",
+        options=list(status_counts),
+        default=list(status_counts),
+        format_func=lambda s: f"{s} ({status_counts[s]})",
+        key="sa_user_status_filter",
+    )
+    institution_filter = st.selectbox(
+        "Filter by institution",
+        [None] + list(institution_counts),
+        format_func=lambda i: "All institutions"
+        if i is None
+        else f"{i or '(none)'} ({institution_counts[i]})",
+        key="sa_user_institution_filter",
+    )
 
-        role_filter = st.multiselect(
-            "Filter by role",
-            options=sorted(df_users["role"].unique()),
-            default=list(sorted(df_users["role"].unique())),
-            key="sa_user_role_filter",
+    # Selecting every option (or none) means "no filter", which keeps the query on the index.
+    roles = None if not role_filter or set(role_filter) == set(role_counts) else role_filter
+    statuses = None if not status_filter or set(status_filter) == set(status_counts) else status_filter
+
+    def fetch(columns, search, sort, descending, page, page_size):
+        return query_users(
+            roles=roles,
+            statuses=statuses,
+            institution=institution_filter,
+            text=search,
+            sort=sort,
+            descending=descending,
+            page=page,
+            page_size=page_size,
+            columns=columns,
         )
-        status_filter = st.multiselect(
-            "Filter by status",
-            options=sorted(df_users["status"].unique()),
-            default=list(sorted(df_users["status"].unique())),
-            key="sa_user_status_filter",
+
+    paged_grid(
+        "sa_user_grid",
+        fetch,
+        columns=USER_QUERY_COLUMNS,
+        search_label="Search by name, email, institution, or user code",
+        reset_on=(tuple(roles or ()), tuple(statuses or ()), institution_filter, data_version("users")),
+    )
+
+    # Bulk action on the selection above: the same predicates, one UPDATE.
+    filters = {}
+    if roles is not None:
+        filters["role"] = roles
+    if statuses is not None:
+        filters["status"] = statuses
+    if institution_filter is not None:
+        filters["institution_name"] = institution_filter
+    search = st.session_state.get("sa_user_grid_search", "")
+    if filters or search.strip():
+        col_f1, col_f2 = st.columns([3, 1])
+        with col_f1:
+            bulk_status = st.selectbox(
+                "Set status of every user matching these filters",
+                ["blocked", "active"],
+                key="sa_bulk_filter_status",
+            )
+        with col_f2:
+            st.write("")
+            if st.button("Apply to matching users", key="sa_btn_bulk_filter"):
+                changed = set_users_status_bulk(
+                    bulk_status, filters=filters, search=search, actor="Super Admin"
+                )
+                users_status_changed()
+                st.success(f"{changed} user(s) set to {bulk_status}.")
+                st.rerun()
+
+
+@st.fragment
+def sa_user_actions():
+    st.markdown("### Block / unblock user")
+    col_u1, col_u2 = st.columns(2)
+    with col_u1:
+        user_id_block = st.number_input(
+            "User ID to block",
+            min_value=1,
+            step=1,
+            key="sa_user_id_block",
         )
-        search_users = st.text_input(
-            "Search by name, email, institution, or user code",
-            key="sa_user_search",
+        if st.button("Block user", key="sa_btn_block_user"):
+            set_user_status(int(user_id_block), "blocked")
+            users_status_changed()
+            st.success(f"User {int(user_id_block)} blocked.")
+            st.rerun()
+    with col_u2:
+        user_id_unblock = st.number_input(
+            "User ID to unblock",
+            min_value=1,
+            step=1,
+            key="sa_user_id_unblock",
         )
+        if st.button("Unblock user", key="sa_btn_unblock_user"):
+            set_user_status(int(user_id_unblock), "active")
+            users_status_changed()
+            st.success(f"User {int(user_id_unblock)} unblocked.")
+            st.rerun()
 
-        if role_filter:
-            df_users = df_users[df_users["role"].isin(role_filter)]
-        if status_filter:
-            df_users = df_users[df_users["status"].isin(status_filter)]
-
-        if search_users.strip():
-            s = search_users.strip().lower()
-            mask = (
-                df_users["full_name"].str.lower().str.contains(s)
-                | df_users["email"].str.lower().str.contains(s)
-                | df_users["institution_name"].fillna("").str.lower().str.contains(s)
-                | df_users["user_code"].fillna("").str.lower().str.contains(s)
-            )
-            df_users = df_users[mask]
+    st.markdown("### Bulk block / unblock by ID")
+    ids_text = st.text_area(
+        "User IDs (comma, space or newline separated)",
+        key="sa_bulk_user_ids",
+    )
+    col_b1, col_b2 = st.columns(2)
+    for col, label, status in (
+        (col_b1, "Block listed users", "blocked"),
+        (col_b2, "Unblock listed users", "active"),
+    ):
+        with col:
+            if st.button(label, key=f"sa_btn_bulk_ids_{status}"):
+                tokens = ids_text.replace(",", " ").split()
+                if tokens and all(tok.isdigit() for tok in tokens):
+                    changed = set_users_status_bulk(
+                        status, user_ids=[int(tok) for tok in tokens], actor="Super Admin"
+                    )
+                    users_status_changed()
+                    st.success(f"{changed} user(s) set to {status}.")
+                    st.rerun()
+                else:
+                    st.error("Enter one or more numeric user IDs.")
 
-        st.dataframe(df_users, use_container_width=True)
+    with st.expander("Recent bulk status changes"):
+        audit = list_user_status_audit()
+        if audit:
+            import pandas as pd
 
-        st.markdown("### Block / unblock user")
-        col_u1, col_u2 = st.columns(2)
-        with col_u1:
-            user_id_block = st.number_input(
-                "User ID to block",
-                min_value=1,
-                step=1,
-                key="sa_user_id_block",
-            )
-            if st.button("Block user", key="sa_btn_block_user"):
-                set_user_status(int(user_id_block), "blocked")
-                st.success(f"User {int(user_id_block)} blocked.")
-                st.rerun()
-        with col_u2:
-            user_id_unblock = st.number_input(
-                "User ID to unblock",
-                min_value=1,
-                step=1,
-                key="sa_user_id_unblock",
+            st.dataframe(
+                pd.DataFrame(audit, columns=["id", "at", "actor", "status", "scope", "affected"]),
+                use_container_width=True,
+                hide_index=True,
             )
-            if st.button("Unblock user", key="sa_btn_unblock_user"):
-                set_user_status(int(user_id_unblock), "active")
-                st.success(f"User {int(user_id_unblock)} unblocked.")
-                st.rerun()
+        else:
+            st.write("No bulk changes yet.")
+
+@st.fragment
+def sa_module_health():
+    import pandas as pd
+
+    st.markdown("### Wings modules")
+    registry = get_registry()
+    missing = [label for label, name in WING_MODULES.items() if name not in registry.names()]
+    broken = registry.broken()
+    if broken or missing:
+        for name, error in sorted(broken.items()):
+            st.error(f"{name}: {error}")
+        for label in missing:
+            st.warning(f"{label}: no module file {WING_MODULES[label]}.py yet.")
+    else:
+        st.success("All modules imported and expose render(role).")
+    st.dataframe(
+        pd.DataFrame(
+            registry.report(),
+            columns=["module", "status", "import ms", "first render ms"],
+        ),
+        use_container_width=True,
+        hide_index=True,
+    )
+    if st.button("Refresh", key="sa_btn_module_health"):
+        st.rerun(scope="fragment")
+
+def sa_media_usage():
+    st.markdown("### Media store")
+    files, used, quota = get_media_store().usage()
+    st.progress(min(used / quota, 1.0) if quota else 0.0)
+    st.caption(f"{files} file(s), {used / 2**20:.1f} MB of {quota / 2**20:.0f} MB quota (LRU eviction above quota).")
+
+@st.fragment
+def sa_session_memory():
+    import pandas as pd
+
+    st.markdown("### Session memory")
+    session_memory.account_session(force=True)
+    sessions, total = session_memory.usage_report()
+    policy = session_memory.policy
+    MB = session_memory.MB
+
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Live sessions", len(sessions))
+    m2.metric("Session state total", f"{total / MB:.1f} MB")
+    m3.metric("Largest session", f"{sessions[0].total_bytes / MB:.1f} MB" if sessions else "–")
+
+    if sessions:
+        st.dataframe(
+            pd.DataFrame(
+                [
+                    {
+                        "session": u.session_id[:8],
+                        "user": u.user,
+                        "KB": round(u.total_bytes / 1024, 1),
+                        "largest keys": ", ".join(
+                            f"{k} ({v / 1024:.0f} KB)" for k, v in list(u.key_bytes.items())[:3]
+                        ),
+                        "evictions": u.evictions,
+                        "offloaded items": u.offloaded,
+                    }
+                    for u in sessions
+                ]
+            ),
+            use_container_width=True,
+            hide_index=True,
+        )
 
-        st.markdown("</div>", unsafe_allow_html=True)
+    with st.expander("Caps (apply to every session on its next measurement)"):
+        col_s, col_k = st.columns(2)
+        with col_s:
+            session_mb = st.number_input(
+                "Per-session cap (MB)", min_value=1, value=policy.session_bytes // MB, key="sa_mem_session_mb"
+            )
+        with col_k:
+            key_mb = st.number_input(
+                "Per-cache cap (MB)", min_value=1, value=policy.key_bytes // MB, key="sa_mem_key_mb"
+            )
+        caps = {}
+        cap_cols = st.columns(3)
+        for i, (key, cap) in enumerate(policy.list_caps.items()):
+            with cap_cols[i % 3]:
+                caps[key] = st.number_input(
+                    f"Max items in {key}", min_value=1, value=cap, key=f"sa_mem_cap_{key}"
+                )
+        if st.button("Apply caps", key="sa_btn_mem_caps"):
+            policy.session_bytes = int(session_mb) * MB
+            policy.key_bytes = int(key_mb) * MB
+            policy.list_caps.update({k: int(v) for k, v in caps.items()})
+            st.success("Caps updated.")
+
+@st.fragment
+def sa_event_log():
+    st.markdown("### Event log")
+    stats = get_event_writer().stats()
+    e1, e2, e3, e4 = st.columns(4)
+    e1.metric("Logged", stats["appended"])
+    e2.metric("Written", stats["flushed"])
+    e3.metric("Buffered", f"{stats['pending']} / {stats['capacity']}")
+    e4.metric("Dropped", stats["dropped"])
+    if stats["failed_batches"]:
+        st.warning(f"{stats['failed_batches']} failed batch(es); last error: {stats['last_error']}")
+    counts = count_events_by_type()
+    if counts:
+        st.dataframe(
+            {"event type": [c[0] for c in counts], "events": [c[1] for c in counts]},
+            use_container_width=True,
+            hide_index=True,
+        )
+    else:
+        st.write("No events written yet.")
+
+@st.fragment
+def sa_notifications():
+    st.markdown("### Notification outbox")
+    stats = get_notifier().stats()
+    n1, n2, n3, n4 = st.columns(4)
+    n1.metric("Queued (this process)", stats["queued"])
+    n2.metric("Delivered", stats["delivered"])
+    n3.metric("Recipients", stats["recipients"])
+    n4.metric("Failed attempts", stats["failed"])
+    rows = list_outbox(limit=20)
+    if rows:
+        st.dataframe(
+            {
+                "id": [r[0] for r in rows],
+                "created": [r[1] for r in rows],
+                "title": [r[2] for r in rows],
+                "audience": [r[3] for r in rows],
+                "status": [r[4] for r in rows],
+                "attempts": [r[5] for r in rows],
+                "recipients": [r[6] for r in rows],
+                "last error": [r[7] or "" for r in rows],
+            },
+            use_container_width=True,
+            hide_index=True,
+        )
+    else:
+        st.write("No notifications sent yet.")
 
 # -------------------------------------------------------------------
 # INSTITUTION MANAGEMENT DASHBOARD
@@ -471,20 +660,13 @@ def show_institution_dashboard():
     )
     st.markdown("</div>", unsafe_allow_html=True)
 
-    # Load all users then keep only this institution
-    all_users = list_users()
-    df = pd.DataFrame(all_users)
-    df = df[df["institution_name"] == institution_name]
-
-    # Treat student_id as a department label for now
-    if "student_id" in df.columns:
-        df["department"] = df["student_id"].fillna("").replace("", "No department")
-    else:
-        df["department"] = "No department"
+    inst_department_labels()
+    inst_people_tables(institution_name)
+    inst_management_actions()
 
-    # Build department list
-    depts = sorted(set(df["department"].tolist())) if not df.empty else []
 
+@st.fragment
+def inst_department_labels():
     st.markdown('<div class="szt-card">', unsafe_allow_html=True)
     st.subheader("Departments Management")
 
@@ -506,9 +688,27 @@ def show_institution_dashboard():
         else:
             st.error("Enter a department name.")
 
+    st.markdown("</div>", unsafe_allow_html=True)
+
+
+INST_PAGE_SIZE = 25
+
+
+@st.fragment
+def inst_people_tables(institution_name: str):
+    import pandas as pd
+
+    # Read on every run: other sessions (Super Admin, sign-ups) add departments.
+    departments = list_institution_departments(institution_name)
+    depts = [d[0] for d in departments]
+    dept_counts = {d[0]: d[1:] for d in departments}
+
+    st.markdown('<div class="szt-card">', unsafe_allow_html=True)
     dept_filter = st.selectbox(
         "Select department to manage",
-        ["All departments"] + depts if depts else ["All departments"],
+        ["All departments"] + depts,
+        format_func=lambda d: d if d not in dept_counts
+        else f"{d} ({dept_counts[d][0]} teachers, {dept_counts[d][1]} students)",
         key="inst_dept_filter",
     )
 
@@ -519,65 +719,65 @@ def show_institution_dashboard():
 
     st.markdown("</div>", unsafe_allow_html=True)
 
-    # Filter by department
-    df_filtered = df.copy()
-    if dept_filter != "All departments":
-        df_filtered = df_filtered[df_filtered["department"] == dept_filter]
-
-    # Search filter
-    if search_text.strip():
-        s = search_text.strip().lower()
-        mask = (
-            df_filtered["full_name"].str.lower().str.contains(s)
-            | df_filtered["email"].str.lower().str.contains(s)
-        )
-        df_filtered = df_filtered[mask]
-
-    # Split into teachers and students
-    df_teachers = df_filtered[df_filtered["role"] == "Teacher"].copy()
-    df_students = df_filtered[df_filtered["role"] == "Student"].copy()
-
-    # Placeholder columns for money + dates (until you add real tables)
-    if "teacher_debt" not in df_teachers.columns:
-        df_teachers["teacher_debt"] = 0.0
-    if "fee_balance" not in df_students.columns:
-        df_students["fee_balance"] = 0.0
-    if "last_payment_date" not in df_students.columns:
-        df_students["last_payment_date"] = ""
+    department = None if dept_filter == "All departments" else dept_filter
+    signature = (department, search_text.strip())
+    teacher_page = current_page("inst_teachers", signature)
+    student_page = current_page("inst_students", signature)
+    overview = institution_overview(
+        institution_name,
+        department=department,
+        search=search_text,
+        teacher_page=teacher_page,
+        student_page=student_page,
+        page_size=INST_PAGE_SIZE,
+    )
 
     st.markdown('<div class="szt-card">', unsafe_allow_html=True)
-    st.subheader(
-        f"Teachers and students — {dept_filter if dept_filter != 'All departments' else 'All departments'}"
-    )
+    st.subheader(f"Teachers and students — {dept_filter}")
+
+    headcounts = overview["headcounts"]
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Teachers", headcounts.get("Teacher", 0))
+    m2.metric("Students", headcounts.get("Student", 0))
+    m3.metric("Parents", headcounts.get("Parent", 0))
 
     col_left, col_right = st.columns(2)
 
     with col_left:
         st.markdown("### Teachers in department")
-        if df_teachers.empty:
+        rows, total = overview["teachers"]
+        if not total:
             st.info("No teachers found for this selection.")
         else:
-            st.dataframe(
-                df_teachers[
-                    ["id", "full_name", "email", "role", "department", "teacher_debt"]
-                ],
-                use_container_width=True,
+            df_teachers = pd.DataFrame(
+                rows, columns=["id", "full_name", "email", "role", "department"]
             )
+            debts = teacher_debt_summaries(institution_name, df_teachers["id"].tolist())
+            df_teachers["teacher_debt"] = [debts.get(i, 0) / 100 for i in df_teachers["id"]]
+            st.dataframe(df_teachers, use_container_width=True, hide_index=True)
+            pager("inst_teachers", teacher_page, total, INST_PAGE_SIZE)
 
     with col_right:
         st.markdown("### Students in department")
-        if df_students.empty:
+        rows, total = overview["students"]
+        if not total:
             st.info("No students found for this selection.")
         else:
-            st.dataframe(
-                df_students[
-                    ["id", "full_name", "email", "student_id", "department", "fee_balance", "last_payment_date"]
-                ],
-                use_container_width=True,
+            df_students = pd.DataFrame(
+                rows, columns=["id", "full_name", "email", "student_id", "department"]
             )
+            # Balances come from the materialized fee_balances (Fee Management → Reconcile).
+            fees = student_fee_summaries(institution_name, df_students["id"].tolist())
+            df_students["fee_balance"] = [fees.get(i, (0, None))[0] / 100 for i in df_students["id"]]
+            df_students["last_payment_date"] = [fees.get(i, (0, None))[1] or "" for i in df_students["id"]]
+            st.dataframe(df_students, use_container_width=True, hide_index=True)
+            pager("inst_students", student_page, total, INST_PAGE_SIZE)
 
     st.markdown("</div>", unsafe_allow_html=True)
 
+
+@st.fragment
+def inst_management_actions():
     # Management tabs
     st.markdown('<div class="szt-card">', unsafe_allow_html=True)
     st.subheader("Management actions")
@@ -608,48 +808,196 @@ def show_institution_dashboard():
                 "Later you can add an edit form that loads a user by ID and updates fields with UPDATE in db.py."
             )
 
-    # --- Fee Management (per student, placeholder for real fee tables) ---
+    # --- Fee Management (fee lines, payments, reconciliation) ---
     with tab_fees:
-        st.markdown("#### Fee balances and history (placeholder)")
-        fee_student_id = st.number_input(
-            "Student user ID",
-            min_value=1,
-            step=1,
-            key="inst_fee_student_id",
-        )
-        new_balance = st.number_input(
-            "New fee balance",
-            min_value=0.0,
-            step=10.0,
-            key="inst_fee_new_balance",
-        )
-        if st.button("Save fee balance", key="inst_fee_update_btn"):
-            st.warning(
-                "Add real fee tables in db.py (e.g. student_fees, fee_payments) and update them here. "
-                "This UI is already wired for that future logic."
-            )
+        inst_fee_management()
 
-    # --- Teacher Debts (placeholder for real debts table) ---
+    # --- Teacher Debts (entries, settlements, aging) ---
     with tab_debts:
-        st.markdown("#### Teacher debts (placeholder)")
-        debt_teacher_id = st.number_input(
-            "Teacher user ID",
-            min_value=1,
-            step=1,
-            key="inst_debt_teacher_id",
+        inst_teacher_debts()
+
+    st.markdown("</div>", unsafe_allow_html=True)
+
+def inst_fee_management():
+    institution_name = (st.session_state.get("current_user") or {}).get("institution_name", "")
+    terms = list_fee_terms(institution_name)
+    default_term = current_term()
+    term = st.selectbox(
+        "Term",
+        sorted(set(terms) | {default_term}, reverse=True),
+        key="inst_fee_term",
+    )
+
+    c1, c2 = st.columns(2)
+    with c1:
+        st.markdown("#### Bill a term fee")
+        departments = [d for d, _, students in list_institution_departments(institution_name) if students]
+        with st.form("inst_fee_bill_form", clear_on_submit=True):
+            item = st.text_input("Fee item", placeholder="e.g. Tuition")
+            amount = st.number_input("Amount per student", min_value=0.0, step=100.0)
+            due = st.date_input("Due date")
+            dept = st.selectbox("Students", ["All departments"] + departments)
+            if st.form_submit_button("Bill students"):
+                if not item.strip() or amount <= 0:
+                    st.warning("Enter a fee item and an amount.")
+                else:
+                    added = bill_term_fee(
+                        institution_name,
+                        term,
+                        item.strip(),
+                        round(amount * 100),
+                        due.isoformat(),
+                        department=None if dept == "All departments" else dept,
+                    )
+                    st.success(f"Billed {added} student(s). Reconcile to update balances.")
+    with c2:
+        st.markdown("#### Record cash / bank payment")
+        with st.form("inst_fee_payment_form", clear_on_submit=True):
+            student_id = st.number_input("Student user ID", min_value=1, step=1)
+            amount = st.number_input("Amount received", min_value=0.0, step=100.0)
+            reference = st.text_input("Receipt / bank reference")
+            if st.form_submit_button("Record payment"):
+                if amount <= 0 or not reference.strip():
+                    st.warning("Enter an amount and a reference.")
+                elif record_fee_payment(
+                    institution_name, int(student_id), term, round(amount * 100), reference.strip()
+                ):
+                    st.success("Payment recorded. Reconcile to update balances.")
+                else:
+                    st.warning("That reference has already been recorded.")
+
+    st.markdown("#### Balances")
+    if st.button("Reconcile term", key="inst_fee_reconcile_btn"):
+        started = time.perf_counter()
+        result = reconcile_term(institution_name, term)
+        st.success(
+            f"Imported {result['imported']} SANZAD Pay payment(s), made {result['allocations']} "
+            f"allocation(s) worth {result['allocated_cents'] / 100:,.2f}; {result['students']} "
+            f"balance(s) updated in {time.perf_counter() - started:.2f} s."
         )
-        new_debt = st.number_input(
-            "Debt amount",
-            min_value=0.0,
-            step=10.0,
-            key="inst_debt_amount",
+    students, billed, paid, outstanding, updated_at = fee_term_totals(institution_name, term)
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Billed", f"{billed / 100:,.2f}")
+    m2.metric("Paid", f"{paid / 100:,.2f}")
+    m3.metric("Outstanding", f"{outstanding / 100:,.2f}")
+    if not students:
+        st.info("No balances for this term yet. Bill a fee and reconcile.")
+        return
+    st.caption(f"Last reconciled {updated_at}")
+    search = st.text_input("Search student", key="inst_fee_search")
+    page = current_page("inst_fee_balances", (term, search.strip()))
+    rows, total = select_page(
+        "fee_balances",
+        columns=["student_id", "full_name", "email", "department", "billed", "paid", "balance", "last_payment_date"],
+        filters={"institution_name": institution_name, "term": term},
+        search=search,
+        sort="balance",
+        descending=True,
+        page=page,
+        page_size=INST_PAGE_SIZE,
+    )
+    st.dataframe(
+        {
+            "student_id": [r[0] for r in rows],
+            "name": [r[1] for r in rows],
+            "email": [r[2] for r in rows],
+            "department": [r[3] for r in rows],
+            "billed": [r[4] for r in rows],
+            "paid": [r[5] for r in rows],
+            "balance": [r[6] for r in rows],
+            "last payment": [r[7] or "" for r in rows],
+        },
+        use_container_width=True,
+        hide_index=True,
+    )
+    pager("inst_fee_balances", page, total, INST_PAGE_SIZE)
+
+
+def inst_teacher_debts():
+    institution_name = (st.session_state.get("current_user") or {}).get("institution_name", "")
+    notice = st.session_state.pop("inst_debt_notice", None)
+    if notice:
+        st.success(notice)
+
+    # Exposure comes from the incrementally maintained aging table.
+    aging = debt_aging_report(institution_name)
+    totals = [sum(r[i] for r in aging) for i in range(1, 6)]
+    cols = st.columns(5)
+    cols[0].metric("Outstanding", f"{totals[4] / 100:,.2f}")
+    for col, label, cents in zip(cols[1:], DEBT_AGING_BUCKETS, totals):
+        col.metric(label, f"{cents / 100:,.2f}")
+    if aging:
+        st.dataframe(
+            {
+                "department": [r[0] for r in aging],
+                **{label: [r[i + 1] / 100 for r in aging] for i, label in enumerate(DEBT_AGING_BUCKETS)},
+                "total": [r[5] / 100 for r in aging],
+                "open debts": [r[6] for r in aging],
+            },
+            use_container_width=True,
+            hide_index=True,
         )
-        if st.button("Save / mark debt", key="inst_debt_save_btn"):
-            st.warning(
-                "Create a teacher_debts table in db.py and update it here to store real amounts and statuses."
-            )
+    else:
+        st.info("No outstanding teacher debts.")
+
+    c1, c2 = st.columns(2)
+    with c1:
+        st.markdown("#### Record debt")
+        with st.form("inst_debt_add_form", clear_on_submit=True):
+            teacher_id = st.number_input("Teacher user ID", min_value=1, step=1)
+            amount = st.number_input("Debt amount", min_value=0.0, step=10.0)
+            reason = st.text_input("Reason", placeholder="e.g. Salary advance")
+            incurred_on = st.date_input("Incurred on")
+            if st.form_submit_button("Save debt"):
+                try:
+                    debt_id = add_teacher_debt(
+                        institution_name, int(teacher_id), round(amount * 100), reason.strip(), incurred_on.isoformat()
+                    )
+                    st.session_state["inst_debt_notice"] = f"Debt #{debt_id} recorded."
+                    st.rerun()
+                except ValueError as exc:
+                    st.error(str(exc))
+    with c2:
+        st.markdown("#### Record settlement")
+        with st.form("inst_debt_settle_form", clear_on_submit=True):
+            debt_id = st.number_input("Debt ID", min_value=1, step=1)
+            amount = st.number_input("Amount settled", min_value=0.0, step=10.0)
+            reference = st.text_input("Reference", placeholder="e.g. payroll deduction")
+            if st.form_submit_button("Save settlement"):
+                try:
+                    remaining = settle_teacher_debt(
+                        institution_name, int(debt_id), round(amount * 100), reference.strip()
+                    )
+                    st.session_state["inst_debt_notice"] = (
+                        f"Settlement recorded; {remaining / 100:,.2f} still outstanding."
+                    )
+                    st.rerun()
+                except ValueError as exc:
+                    st.error(str(exc))
+
+    st.markdown("#### Open debts")
+    teacher_filter = st.number_input(
+        "Teacher user ID (0 = all teachers)", min_value=0, step=1, key="inst_debt_teacher_filter"
+    )
+    rows = list_teacher_debts(institution_name, teacher_id=int(teacher_filter) or None)
+    if rows:
+        st.dataframe(
+            {
+                "debt_id": [r[0] for r in rows],
+                "teacher_id": [r[1] for r in rows],
+                "teacher": [r[2] for r in rows],
+                "department": [r[3] for r in rows],
+                "amount": [r[4] / 100 for r in rows],
+                "outstanding": [r[5] / 100 for r in rows],
+                "reason": [r[6] or "" for r in rows],
+                "incurred_on": [r[7] for r in rows],
+            },
+            use_container_width=True,
+            hide_index=True,
+        )
+    else:
+        st.caption("No open debts for this selection.")
 
-    st.markdown("</div>", unsafe_allow_html=True)
 
 # -------------------------------------------------------------------
 # HOME: PROFILE + PERSONALIZED WELCOME
@@ -976,9 +1324,16 @@ def show_login_panel():
 # -------------------------------------------------------------------
 # MAIN
 # -------------------------------------------------------------------
-def main():
+@st.cache_resource(show_spinner=False)
+def init_db_once():
+    """Schema setup runs once per server process, not on every rerun."""
     init_db()
 
+
+def main():
+    init_db_once()
+    apply_theme()
+
     if "lang" not in st.session_state:
         st.session_state["lang"] = "en"
     if "current_role" not in st.session_state:
@@ -998,6 +1353,8 @@ def main():
     if "profile_login_choice" not in st.session_state:
         st.session_state["profile_login_choice"] = None
 
+    enforce_user_status()
+
     lang = st.session_state["lang"]
 
     show_top_nav()
@@ -1062,42 +1419,12 @@ def main():
         st.markdown('<div class="szt-sidebar-section">', unsafe_allow_html=True)
         st.markdown("<div class='szt-sidebar-title'>SANZAD Wings</div>", unsafe_allow_html=True)
 
-        module_list = [
-            "Home",
-            "Sanzad Campus Hub",
-            "Knowledge Hub",
-            "Community Hub",
-            "Gamification",
-            "Analytics",
-            "Career",
-            "Innovation Lab",
-            "Finance",
-            "Wellbeing",
-            "EnviroTech",
-        ]
-
-        icon_map = {
-            "Home": "🏠",
-            "Sanzad Campus Hub": "🎓",
-            "Knowledge Hub": "📚",
-            "Community Hub": "🌐",
-            "Gamification": "🎯",
-            "Analytics": "📊",
-            "Career": "💼",
-            "Innovation Lab": "🧪",
-            "Finance": "💰",
-            "Wellbeing": "🩺",
-            "EnviroTech": "♻️",
-        }
-
-        label_to_module = {f"{icon_map[m]}  {m}": m for m in module_list}
-        current_label = f"{icon_map[st.session_state['current_module']]}  {st.session_state['current_module']}"
         module_label = st.selectbox(
             "Navigation",
-            list(label_to_module.keys()),
-            index=list(label_to_module.keys()).index(current_label),
+            NAV_LABELS,
+            index=NAV_LABELS.index(MODULE_TO_LABEL[st.session_state["current_module"]]),
         )
-        module = label_to_module[module_label]
+        module = LABEL_TO_MODULE[module_label]
         st.session_state["current_module"] = module
 
         st.markdown("</div>", unsafe_allow_html=True)
@@ -1144,30 +1471,10 @@ def main():
                 st.caption("Loaded as part of SANZAD 1.0 global platform shell.")
                 st.markdown("</div>", unsafe_allow_html=True)
 
-            module_map = {
-                "Home": "modules.home",
-                "Sanzad Campus Hub": "modules.campus_hub",
-                "Knowledge Hub": "modules.knowledge_hub",
-                "Community Hub": "modules.community_hub",
-                "Gamification": "modules.gamification",
-                "Analytics": "modules.analytics",
-                "Career": "modules.career",
-                "Innovation Lab": "modules.innovation_lab",
-                "Finance": "modules.finance",
-                "Wellbeing": "modules.wellbeing",
-                "EnviroTech": "modules.envirotech",
-            }
-
-            if module in module_map:
-                module_path = module_map[module]
-                try:
-                    imported_module = importlib.import_module(module_path)
-                    if hasattr(imported_module, "render"):
-                        imported_module.render(effective_role)
-                    else:
-                        st.warning(f"Module {module} loaded but has no render(role) function.")
-                except ModuleNotFoundError:
-                    st.warning(f"Module file for {module} not found yet.")
+            if module in WING_MODULES:
+                entry = get_registry().render(WING_MODULES[module], effective_role)
+                if not entry.ok:
+                    st.warning(f"Module {module} is not available yet ({entry.error}).")
             else:
                 st.info("Select a module from the sidebar.")
 
@@ -1181,3 +1488,6 @@ def main():
 # -------------------------------------------------------------------
 if __name__ == "__main__":
     main()
+    # Start importing the wings in the background only once the page is out.
+    get_registry()
+    session_memory.account_session()
@@ -0,0 +1,242 @@
+# src/attendance.py
+"""
+QR attendance check-in with signed, time-boxed session tokens.
+
+A lecturer opens a session for a class; the token shown as a QR code is
+
+    base64url(json [session_id, expires_at, institution, class]) "." base64url(hmac)
+
+signed with HMAC-SHA256. check_in() validates a token without touching the
+database (signature, expiry, institution and class of the student; for a
+course with seats, enrollment in the course instead, from a per-session
+member list loaded once and refreshed on a miss), drops
+repeats through an in-memory set per session, and appends the check-in to
+a BufferedWriter. A background thread inserts check-ins in batches with
+one executemany per batch; the (session_id, student_id) primary key is the
+backstop for repeats the in-memory set cannot see (other processes,
+restarts). A full lecture hall checking in within a minute therefore costs
+a handful of commits, not one per student.
+
+The signing key comes from SANZAD_ATTENDANCE_KEY, or is generated once and
+kept in ATTENDANCE_KEY_FILE so every process of a deployment shares it.
+
+Attendance is also kept as one bitset per session over the course roster
+(bit i = the student at roster position i). attendance_rates() turns an
+institution's bitsets into per-course and per-student rates with numpy:
+one matrix per course, popcounts per session, column sums per student.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Set
+
+from buffered_writer import BufferedWriter
+from db import (
+    create_attendance_session,
+    insert_attendance_checkins,
+    list_attendance_bitsets,
+    list_course_members,
+    list_course_rosters,
+)
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+ATTENDANCE_KEY_FILE = BASE_DIR / "attendance.key"
+DEFAULT_SESSION_MINUTES = 15
+# Tolerated clock difference between the lecturer's and the student's request.
+CLOCK_SKEW_SECONDS = 30
+# A course's member list is reloaded on a miss at most this often, so
+# students who enroll during a session can still check in.
+MEMBERS_REFRESH_SECONDS = 30
+
+_key = None
+_key_lock = threading.Lock()
+
+
+def _signing_key() -> bytes:
+    global _key
+    if _key is None:
+        with _key_lock:
+            if _key is None:
+                env = os.environ.get("SANZAD_ATTENDANCE_KEY")
+                if env:
+                    _key = env.encode()
+                else:
+                    if not ATTENDANCE_KEY_FILE.exists():
+                        ATTENDANCE_KEY_FILE.write_text(secrets.token_hex(32))
+                    _key = ATTENDANCE_KEY_FILE.read_text().strip().encode()
+    return _key
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _sign(payload: str) -> str:
+    return _b64(hmac.new(_signing_key(), payload.encode(), hashlib.sha256).digest()[:16])
+
+
+def make_token(session_id: int, expires_at: int, institution_name: str, class_name: str) -> str:
+    payload = _b64(json.dumps([session_id, expires_at, institution_name, class_name], separators=(",", ":")).encode())
+    return f"{payload}.{_sign(payload)}"
+
+
+def read_token(token: str):
+    """(session_id, expires_at, institution, class) of a correctly signed token; ValueError otherwise."""
+    try:
+        payload, signature = token.strip().split(".")
+        valid = hmac.compare_digest(signature, _sign(payload))
+        claims = json.loads(_unb64(payload)) if valid else None
+    except (ValueError, UnicodeDecodeError):
+        valid = False
+    if not valid:
+        raise ValueError("This attendance code is not valid.")
+    session_id, expires_at, institution_name, class_name = claims
+    return int(session_id), int(expires_at), institution_name, class_name
+
+
+def open_session(institution_name, class_name, lecturer_id, minutes: int = DEFAULT_SESSION_MINUTES):
+    """Create an attendance session; returns (session_id, token, expires_at)."""
+    now = int(time.time())
+    expires_at = now + int(minutes) * 60
+    session_id, class_name = create_attendance_session(institution_name, class_name, lecturer_id, now, expires_at)
+    return session_id, make_token(session_id, expires_at, institution_name, class_name), expires_at
+
+
+class CheckInDesk:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # session_id -> (expires_at, student ids already accepted)
+        self._seen: Dict[int, tuple] = {}
+        # session_id -> (expires_at, loaded_at, enrolled student ids or None for a class label)
+        self._members: Dict[int, tuple] = {}
+        self._writer = BufferedWriter(
+            "attendance", insert_attendance_checkins, capacity=50_000, batch_size=1_000, flush_interval=0.5
+        )
+
+    def check_in(self, token: str, student_id: int, institution_name: str, class_name: str) -> bool:
+        """
+        Validate the token for this student and queue the check-in.
+        A session for a course with seats accepts the students enrolled in
+        it, any other session the students of its class (class_name).
+        Returns False if the student had already checked in; raises
+        ValueError for invalid, expired or foreign tokens.
+        """
+        session_id, expires_at, token_institution, token_class = read_token(token)
+        now = time.time()
+        if now > expires_at + CLOCK_SKEW_SECONDS:
+            raise ValueError("This attendance session has closed.")
+        if token_institution != institution_name or not self._admits(
+            session_id, expires_at, institution_name, token_class, int(student_id), class_name, now
+        ):
+            raise ValueError("This attendance code is for a different class.")
+        with self._lock:
+            self._forget_closed(now)
+            seen: Set[int] = self._seen.setdefault(session_id, (expires_at, set()))[1]
+            if student_id in seen:
+                return False
+            seen.add(student_id)
+        stamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        if not self._writer.append((session_id, int(student_id), stamp)):
+            with self._lock:
+                seen.discard(student_id)
+            raise ValueError("Check-in is busy, please try again in a moment.")
+        return True
+
+    def _admits(self, session_id, expires_at, institution_name, course, student_id, class_name, now) -> bool:
+        with self._lock:
+            cached = self._members.get(session_id)
+        stale = cached is not None and cached[2] is not None and student_id not in cached[2]
+        if cached is None or (stale and now - cached[1] > MEMBERS_REFRESH_SECONDS):
+            cached = (expires_at, now, list_course_members(institution_name, course))
+            with self._lock:
+                self._members[session_id] = cached
+        members = cached[2]
+        if members is None:
+            return course.strip().lower() == (class_name or "").strip().lower()
+        return student_id in members
+
+    def _forget_closed(self, now: float):
+        for cache in (self._seen, self._members):
+            closed = [sid for sid, entry in cache.items() if now > entry[0] + CLOCK_SKEW_SECONDS]
+            for sid in closed:
+                del cache[sid]
+
+    def flush(self):
+        self._writer.flush()
+
+    def stats(self):
+        return self._writer.stats()
+
+
+_desk = None
+_desk_lock = threading.Lock()
+
+
+def get_check_in_desk() -> CheckInDesk:
+    """Process-wide check-in desk."""
+    global _desk
+    if _desk is None:
+        with _desk_lock:
+            if _desk is None:
+                _desk = CheckInDesk()
+    return _desk
+
+
+def _popcount_rows(matrix):
+    import numpy as np
+
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(matrix).sum(axis=1, dtype=np.int64)
+    table = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    return table[matrix].sum(axis=1, dtype=np.int64)
+
+
+def attendance_rates(institution_name: str):
+    """
+    {"courses": [(course, sessions, students, present, possible)],
+     "students": [(course, student_id, full_name, attended, eligible)]}
+
+    A student is eligible for the sessions held while they were on the
+    roster (roster_size > position).
+    """
+    import numpy as np
+
+    names = {}
+    for course, position, student_id, full_name in list_course_rosters(institution_name):
+        names.setdefault(course, []).append((position, student_id, full_name))
+
+    by_course = {}
+    for course, _, roster_size, bits in list_attendance_bitsets(institution_name):
+        by_course.setdefault(course, []).append((roster_size, bits))
+
+    courses, students = [], []
+    for course, sessions in by_course.items():
+        roster = names.get(course, [])
+        n = max([size for size, _ in sessions] + [position + 1 for position, _, _ in roster])
+        width = (n + 7) // 8
+        matrix = np.zeros((len(sessions), width), dtype=np.uint8)
+        for row, (_, bits) in enumerate(sessions):
+            matrix[row, : len(bits)] = np.frombuffer(bits, dtype=np.uint8)
+        sizes = np.array([size for size, _ in sessions], dtype=np.int64)
+
+        present = _popcount_rows(matrix)
+        attended = np.unpackbits(matrix, axis=1, bitorder="little")[:, :n].sum(axis=0, dtype=np.int64)
+        eligible = (sizes[:, None] > np.arange(n)).sum(axis=0)
+        courses.append((course, len(sessions), len(roster), int(present.sum()), int(sizes.sum())))
+        students.extend(
+            (course, student_id, full_name, int(attended[position]), int(eligible[position]))
+            for position, student_id, full_name in roster
+        )
+    return {"courses": courses, "students": students}
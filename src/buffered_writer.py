@@ -0,0 +1,120 @@
+# src/buffered_writer.py
+"""
+Bounded in-memory buffer drained in batches by a background thread.
+
+Request code calls append(), which only takes a lock and appends to a
+deque: no I/O, no commit. A daemon thread wakes every flush_interval
+seconds, or as soon as the buffer passes its high-water mark, and hands
+batches of up to batch_size items to flush_batch(items) (typically one
+executemany in one transaction).
+
+Backpressure: while the buffer is full, append() drops the new item and
+counts it in stats()["dropped"], so a slow or failing sink costs memory
+only up to `capacity` items. A failed batch is put back at the front of
+the buffer and retried after a back-off.
+"""
+
+import atexit
+import threading
+import time
+from collections import deque
+
+
+class BufferedWriter:
+    def __init__(
+        self,
+        name: str,
+        flush_batch,
+        capacity: int = 10_000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        retry_delay: float = 5.0,
+    ):
+        self.name = name
+        self._flush_batch = flush_batch
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_delay = retry_delay
+        self._buffer = deque()
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._high_water = max(batch_size, capacity // 2)
+        self._thread = None
+        self._stats = {"appended": 0, "flushed": 0, "dropped": 0, "failed_batches": 0}
+        self._last_error = ""
+
+    def append(self, item) -> bool:
+        """Queue one item; returns False (and counts a drop) if the buffer is full."""
+        with self._cond:
+            if len(self._buffer) >= self.capacity:
+                self._stats["dropped"] += 1
+                return False
+            self._buffer.append(item)
+            self._stats["appended"] += 1
+            if len(self._buffer) >= self._high_water:
+                self._cond.notify()
+        self._ensure_thread()
+        return True
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._cond:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name=f"{self.name}-flush", daemon=True
+                    )
+                    self._thread.start()
+                    atexit.register(self.flush)
+
+    def _take(self):
+        with self._cond:
+            n = min(self.batch_size, len(self._buffer))
+            return [self._buffer.popleft() for _ in range(n)]
+
+    def _flush_once(self) -> bool:
+        """Write one batch; False if there was nothing to write or the sink failed."""
+        with self._flush_lock:
+            batch = self._take()
+            if not batch:
+                return False
+            try:
+                self._flush_batch(batch)
+            except Exception as exc:
+                with self._cond:
+                    # Put the batch back in front, as far as capacity allows.
+                    room = self.capacity - len(self._buffer)
+                    keep = batch[:room] if room > 0 else []
+                    self._buffer.extendleft(reversed(keep))
+                    self._stats["dropped"] += len(batch) - len(keep)
+                    self._stats["failed_batches"] += 1
+                    self._last_error = f"{type(exc).__name__}: {exc}"
+                return False
+            with self._cond:
+                self._stats["flushed"] += len(batch)
+            return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if len(self._buffer) < self._high_water:
+                    self._cond.wait(self.flush_interval)
+            failed_before = self._stats["failed_batches"]
+            while self._flush_once():
+                pass
+            if self._stats["failed_batches"] != failed_before:
+                time.sleep(self.retry_delay)
+
+    def flush(self):
+        """Synchronously write everything buffered so far (best effort)."""
+        while self._flush_once():
+            pass
+
+    def stats(self):
+        with self._cond:
+            return {
+                **self._stats,
+                "pending": len(self._buffer),
+                "capacity": self.capacity,
+                "last_error": self._last_error,
+            }
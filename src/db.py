@@ -1,6 +1,8 @@
 import sqlite3
 from pathlib import Path
 import hashlib
+import json
+import threading
 
 # Anchor DB file at project root (one level above src)
 BASE_DIR = Path(__file__).resolve().parents[1]
@@ -130,12 +132,560 @@ def init_db():
     );
     """)
 
+    # Smart Teacher: class message board + per-user read cursors
+    cur.executescript("""
+    CREATE TABLE IF NOT EXISTS class_messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        institution_name TEXT NOT NULL,
+        class_name TEXT NOT NULL,
+        sender_id INTEGER NOT NULL,
+        sender_name TEXT,
+        sender_role TEXT,
+        text TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (sender_id) REFERENCES users(id)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_class_messages_class
+        ON class_messages (institution_name, class_name, id);
+
+    CREATE TABLE IF NOT EXISTS class_message_cursors (
+        user_id INTEGER NOT NULL,
+        institution_name TEXT NOT NULL,
+        class_name TEXT NOT NULL,
+        last_read_id INTEGER NOT NULL DEFAULT 0,  -- highest class_messages.id seen
+        PRIMARY KEY (user_id, institution_name, class_name)
+    );
+    """)
+
+    # Smart Teacher: deadline reminders (one row per student per reminder offset)
+    cur.executescript("""
+    CREATE TABLE IF NOT EXISTS assignment_reminders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        assignment_id INTEGER NOT NULL,
+        student_id INTEGER NOT NULL,
+        offset_minutes INTEGER NOT NULL,   -- minutes before the deadline
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        read_at TIMESTAMP,
+        UNIQUE (assignment_id, student_id, offset_minutes),
+        FOREIGN KEY (assignment_id) REFERENCES assignments(id),
+        FOREIGN KEY (student_id) REFERENCES users(id)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_assignment_reminders_student
+        ON assignment_reminders (student_id, id);
+    CREATE INDEX IF NOT EXISTS idx_assignments_status_due
+        ON assignments (status, due_date);
+    CREATE INDEX IF NOT EXISTS idx_assignments_teacher_class
+        ON assignments (teacher_id, class_name);
+    CREATE INDEX IF NOT EXISTS idx_submissions_assignment_student
+        ON submissions (assignment_id, student_id, submitted_at);
+    CREATE INDEX IF NOT EXISTS idx_users_institution_role
+        ON users (institution_name, role, student_id);
+    """)
+
+    # Super Admin user queries: role/status filters and facet counts
+    cur.executescript("""
+    CREATE INDEX IF NOT EXISTS idx_users_role_status ON users (role, status);
+    CREATE INDEX IF NOT EXISTS idx_users_status ON users (status);
+    """)
+
+    # Campus event log (append-only; written in batches by event_log)
+    cur.executescript("""
+    CREATE TABLE IF NOT EXISTS events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        created_at TEXT NOT NULL,
+        tenant_id TEXT,
+        actor_id TEXT,
+        event_type TEXT NOT NULL,
+        payload TEXT
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_events_type_created
+        ON events (event_type, created_at);
+    """)
+
+    # Notifications: one outbox row per send, expanded into per-user inbox rows
+    cur.executescript("""
+    CREATE TABLE IF NOT EXISTS notification_outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        tenant_id TEXT,
+        sender_id TEXT,
+        audience TEXT NOT NULL,
+        title TEXT NOT NULL,
+        body TEXT,
+        tags TEXT,
+        status TEXT NOT NULL DEFAULT 'queued',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        cursor_user_id INTEGER NOT NULL DEFAULT 0,
+        recipients INTEGER NOT NULL DEFAULT 0,
+        last_error TEXT,
+        delivered_at TEXT,
+        claimed_at TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS notification_inbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        outbox_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        read_at TEXT,
+        UNIQUE (outbox_id, user_id),
+        FOREIGN KEY (outbox_id) REFERENCES notification_outbox(id),
+        FOREIGN KEY (user_id) REFERENCES users(id)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_notification_inbox_user
+        ON notification_inbox (user_id, id);
+    CREATE INDEX IF NOT EXISTS idx_notification_outbox_status
+        ON notification_outbox (status);
+    """)
+
+    # Threaded inbox (campus_hub.send_inbox_message). User ids are the Campus
+    # Hub identity strings. thread_messages is clustered by (thread_key, seq)
+    # and thread_members holds each member's summary of a thread, kept
+    # current on every write, so an inbox is one index range scan.
+    cur.executescript("""
+    CREATE TABLE IF NOT EXISTS message_threads (
+        thread_key TEXT PRIMARY KEY,
+        tenant_id TEXT,
+        title TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        last_seq INTEGER NOT NULL DEFAULT 0
+    );
+
+    CREATE TABLE IF NOT EXISTS thread_messages (
+        thread_key TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        sender_id TEXT NOT NULL,
+        text TEXT NOT NULL,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (thread_key, seq)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS thread_members (
+        user_id TEXT NOT NULL,
+        thread_key TEXT NOT NULL,
+        last_seq INTEGER NOT NULL DEFAULT 0,
+        last_read_seq INTEGER NOT NULL DEFAULT 0,
+        unread INTEGER NOT NULL DEFAULT 0,
+        last_sender_id TEXT,
+        last_text TEXT,
+        last_message_at TEXT,
+        PRIMARY KEY (user_id, thread_key)
+    ) WITHOUT ROWID;
+
+    CREATE INDEX IF NOT EXISTS idx_thread_members_recent
+        ON thread_members (user_id, last_message_at DESC, thread_key DESC);
+    CREATE INDEX IF NOT EXISTS idx_thread_members_thread
+        ON thread_members (thread_key);
+    """)
+
+    # Local SANZAD Pay: payment requests + double-entry ledger (integer cents)
+    cur.executescript("""
+    CREATE TABLE IF NOT EXISTS payment_requests (
+        payment_id TEXT PRIMARY KEY,
+        tenant_id TEXT NOT NULL,
+        payer_id TEXT NOT NULL,
+        idempotency_key TEXT NOT NULL,
+        amount_cents INTEGER NOT NULL CHECK (amount_cents > 0),
+        currency TEXT NOT NULL,
+        description TEXT,
+        metadata TEXT,
+        status TEXT NOT NULL DEFAULT 'PENDING',
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        confirmed_by TEXT,                 -- who confirmed it; NULL for the wallet / QR callback
+        UNIQUE (tenant_id, payer_id, idempotency_key)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_payment_requests_payer
+        ON payment_requests (tenant_id, payer_id, created_at);
+
+    CREATE TABLE IF NOT EXISTS ledger_accounts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        tenant_id TEXT NOT NULL,
+        name TEXT NOT NULL,
+        currency TEXT NOT NULL,
+        balance_cents INTEGER NOT NULL DEFAULT 0,
+        UNIQUE (tenant_id, name, currency)
+    );
+
+    CREATE TABLE IF NOT EXISTS ledger_entries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        payment_id TEXT NOT NULL,
+        account_id INTEGER NOT NULL,
+        amount_cents INTEGER NOT NULL,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (payment_id) REFERENCES payment_requests(payment_id),
+        FOREIGN KEY (account_id) REFERENCES ledger_accounts(id)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_ledger_entries_payment
+        ON ledger_entries (payment_id);
+    CREATE INDEX IF NOT EXISTS idx_ledger_entries_account
+        ON ledger_entries (account_id);
+    """)
+
+    # Fees: fee lines, received payments, their allocations and the
+    # materialized per-student, per-term balances the dashboard reads
+    cur.executescript("""
+    CREATE TABLE IF NOT EXISTS student_fees (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        institution_name TEXT NOT NULL,
+        student_id INTEGER NOT NULL,
+        term TEXT NOT NULL,
+        item TEXT NOT NULL,
+        amount_cents INTEGER NOT NULL CHECK (amount_cents > 0),
+        paid_cents INTEGER NOT NULL DEFAULT 0,
+        due_date TEXT NOT NULL,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE (institution_name, student_id, term, item),
+        FOREIGN KEY (student_id) REFERENCES users(id)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_student_fees_term
+        ON student_fees (institution_name, term, student_id, due_date, id);
+
+    CREATE TABLE IF NOT EXISTS fee_payments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        institution_name TEXT NOT NULL,
+        student_id INTEGER NOT NULL,
+        term TEXT NOT NULL,
+        reference TEXT NOT NULL,           -- payment_id, or receipt no. for cash / bank
+        amount_cents INTEGER NOT NULL CHECK (amount_cents > 0),
+        applied_cents INTEGER NOT NULL DEFAULT 0,
+        paid_at TEXT NOT NULL,
+        UNIQUE (institution_name, reference),
+        FOREIGN KEY (student_id) REFERENCES users(id)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_fee_payments_term
+        ON fee_payments (institution_name, term, student_id, paid_at, id);
+
+    CREATE TABLE IF NOT EXISTS fee_allocations (
+        fee_payment_id INTEGER NOT NULL,
+        fee_id INTEGER NOT NULL,
+        amount_cents INTEGER NOT NULL,
+        PRIMARY KEY (fee_payment_id, fee_id),
+        FOREIGN KEY (fee_payment_id) REFERENCES fee_payments(id),
+        FOREIGN KEY (fee_id) REFERENCES student_fees(id)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS fee_balances (
+        institution_name TEXT NOT NULL,
+        student_id INTEGER NOT NULL,
+        term TEXT NOT NULL,
+        billed_cents INTEGER NOT NULL,
+        paid_cents INTEGER NOT NULL,
+        balance_cents INTEGER NOT NULL,    -- negative = credit
+        last_payment_date TEXT,
+        updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (institution_name, term, student_id)
+    ) WITHOUT ROWID;
+
+    CREATE INDEX IF NOT EXISTS idx_fee_balances_student
+        ON fee_balances (institution_name, student_id);
+    """)
+
+    # Teacher debts: entries, settlements and the aging aggregate (one row per
+    # institution, department and day incurred) maintained on every posting
+    cur.executescript("""
+    CREATE TABLE IF NOT EXISTS teacher_debts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        institution_name TEXT NOT NULL,
+        teacher_id INTEGER NOT NULL,
+        department TEXT NOT NULL,          -- teacher's department when the debt was posted
+        amount_cents INTEGER NOT NULL CHECK (amount_cents > 0),
+        outstanding_cents INTEGER NOT NULL,
+        reason TEXT,
+        incurred_on TEXT NOT NULL,         -- YYYY-MM-DD
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (teacher_id) REFERENCES users(id)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_teacher_debts_teacher
+        ON teacher_debts (institution_name, teacher_id, outstanding_cents);
+
+    CREATE TABLE IF NOT EXISTS teacher_debt_settlements (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        debt_id INTEGER NOT NULL,
+        amount_cents INTEGER NOT NULL CHECK (amount_cents > 0),
+        reference TEXT,
+        settled_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (debt_id) REFERENCES teacher_debts(id)
+    );
+
+    CREATE TABLE IF NOT EXISTS teacher_debt_aging (
+        institution_name TEXT NOT NULL,
+        department TEXT NOT NULL,
+        incurred_on TEXT NOT NULL,
+        outstanding_cents INTEGER NOT NULL DEFAULT 0,
+        open_debts INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (institution_name, department, incurred_on)
+    ) WITHOUT ROWID;
+    """)
+
+    # Attendance: lecturer-opened sessions and student check-ins
+    cur.executescript("""
+    CREATE TABLE IF NOT EXISTS attendance_sessions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        institution_name TEXT NOT NULL,
+        class_name TEXT NOT NULL,
+        lecturer_id INTEGER NOT NULL,
+        opens_at INTEGER NOT NULL,         -- unix seconds
+        expires_at INTEGER NOT NULL,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (lecturer_id) REFERENCES users(id)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_attendance_sessions_class
+        ON attendance_sessions (institution_name, class_name, opens_at);
+
+    CREATE TABLE IF NOT EXISTS attendance_checkins (
+        session_id INTEGER NOT NULL,
+        student_id INTEGER NOT NULL,
+        checked_in_at TEXT NOT NULL,
+        PRIMARY KEY (session_id, student_id),
+        FOREIGN KEY (session_id) REFERENCES attendance_sessions(id),
+        FOREIGN KEY (student_id) REFERENCES users(id)
+    ) WITHOUT ROWID;
+    """)
+
+    # Course rosters (stable position per student) and one attendance bitset
+    # per session: bit i set = the student at roster position i attended
+    cur.executescript("""
+    CREATE TABLE IF NOT EXISTS course_roster (
+        institution_name TEXT NOT NULL,
+        course TEXT NOT NULL,
+        student_id INTEGER NOT NULL,
+        position INTEGER NOT NULL,
+        joined_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (institution_name, course, student_id),
+        UNIQUE (institution_name, course, position),
+        FOREIGN KEY (student_id) REFERENCES users(id)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS attendance_bitsets (
+        session_id INTEGER PRIMARY KEY,
+        institution_name TEXT NOT NULL,
+        course TEXT NOT NULL,
+        roster_size INTEGER NOT NULL,      -- students on the roster when the session ran
+        present INTEGER NOT NULL,          -- popcount of bits
+        bits BLOB NOT NULL,                -- little-endian bit order, bit i = roster position i
+        FOREIGN KEY (session_id) REFERENCES attendance_sessions(id)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_attendance_bitsets_course
+        ON attendance_bitsets (institution_name, course, session_id);
+    """)
+
+    # Timetable solver input (rooms, courses, week shape) and the saved timetable
+    cur.executescript("""
+    CREATE TABLE IF NOT EXISTS timetable_settings (
+        institution_name TEXT PRIMARY KEY,
+        days TEXT NOT NULL,                -- JSON list of day names
+        periods INTEGER NOT NULL,
+        first_period TEXT NOT NULL,        -- 'HH:MM'
+        period_minutes INTEGER NOT NULL,
+        solved_at TEXT,
+        clashes INTEGER,
+        same_day INTEGER
+    );
+
+    CREATE TABLE IF NOT EXISTS timetable_rooms (
+        institution_name TEXT NOT NULL,
+        name TEXT NOT NULL,
+        capacity INTEGER NOT NULL CHECK (capacity > 0),
+        PRIMARY KEY (institution_name, name)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS timetable_courses (
+        institution_name TEXT NOT NULL,
+        code TEXT NOT NULL,
+        title TEXT,
+        lecturer TEXT,
+        class_name TEXT,
+        students INTEGER NOT NULL DEFAULT 0,
+        sessions INTEGER NOT NULL DEFAULT 1 CHECK (sessions > 0),
+        PRIMARY KEY (institution_name, code)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS timetable_entries (
+        institution_name TEXT NOT NULL,
+        course_code TEXT NOT NULL,
+        session INTEGER NOT NULL,          -- 0-based session of the week
+        slot INTEGER NOT NULL,             -- day index * periods + period index
+        room TEXT NOT NULL,
+        locked INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (institution_name, course_code, session)
+    ) WITHOUT ROWID;
+    """)
+
+    # Academic calendar: semesters, exams, breaks and events (dates inclusive)
+    cur.executescript("""
+    CREATE TABLE IF NOT EXISTS academic_calendar (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        institution_name TEXT NOT NULL,
+        title TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        starts_on TEXT NOT NULL,
+        ends_on TEXT NOT NULL,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        CHECK (ends_on >= starts_on)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_academic_calendar_institution
+        ON academic_calendar (institution_name, starts_on);
+    """)
+
+    # Hostel inventory, applications and bed allocations per term
+    cur.executescript("""
+    CREATE TABLE IF NOT EXISTS hostel_rooms (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        institution_name TEXT NOT NULL,
+        hostel TEXT NOT NULL,
+        floor INTEGER NOT NULL DEFAULT 0,
+        room TEXT NOT NULL,
+        room_type TEXT NOT NULL,
+        beds INTEGER NOT NULL CHECK (beds > 0),
+        accessible INTEGER NOT NULL DEFAULT 0,
+        UNIQUE (institution_name, hostel, room)
+    );
+
+    CREATE TABLE IF NOT EXISTS hostel_applications (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        institution_name TEXT NOT NULL,
+        term TEXT NOT NULL,
+        student_id INTEGER NOT NULL,
+        preferences TEXT NOT NULL,         -- JSON [[hostel, room_type], ...], '' = any
+        tier INTEGER NOT NULL,             -- 0 accessibility needs, 1 first-year, 2 returning
+        accessible INTEGER NOT NULL DEFAULT 0,
+        accept_any INTEGER NOT NULL DEFAULT 1,
+        -- What the student asked for; tier and accessible above only change
+        -- when the hostel office or registry confirms it.
+        requested_tier INTEGER NOT NULL DEFAULT 2,
+        requested_accessible INTEGER NOT NULL DEFAULT 0,
+        status TEXT NOT NULL DEFAULT 'pending',   -- pending / allocated / waitlisted
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE (institution_name, term, student_id),
+        FOREIGN KEY (student_id) REFERENCES users(id)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_hostel_applications_queue
+        ON hostel_applications (institution_name, term, status, tier, id);
+
+    CREATE TABLE IF NOT EXISTS hostel_allocations (
+        institution_name TEXT NOT NULL,
+        term TEXT NOT NULL,
+        room_id INTEGER NOT NULL,
+        bed INTEGER NOT NULL,
+        student_id INTEGER NOT NULL,
+        application_id INTEGER NOT NULL,
+        allocated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (institution_name, term, room_id, bed),
+        UNIQUE (institution_name, term, student_id),
+        FOREIGN KEY (room_id) REFERENCES hostel_rooms(id),
+        FOREIGN KEY (application_id) REFERENCES hostel_applications(id)
+    );
+    """)
+
+    # Course enrollment: seat inventory (optimistic version column),
+    # enrollments with waitlist order, and idempotent enrollment requests
+    cur.executescript("""
+    CREATE TABLE IF NOT EXISTS course_seats (
+        institution_name TEXT NOT NULL,
+        code TEXT NOT NULL,
+        title TEXT,
+        lecturer TEXT,
+        capacity INTEGER NOT NULL CHECK (capacity >= 0),
+        enrolled INTEGER NOT NULL DEFAULT 0,
+        waitlisted INTEGER NOT NULL DEFAULT 0,
+        version INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (institution_name, code),
+        CHECK (enrolled <= capacity)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS course_enrollments (
+        institution_name TEXT NOT NULL,
+        code TEXT NOT NULL,
+        student_id INTEGER NOT NULL,
+        status TEXT NOT NULL,              -- enrolled / waitlisted / dropped
+        waitlist_seq INTEGER,              -- queue order while waitlisted
+        updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (institution_name, code, student_id),
+        FOREIGN KEY (student_id) REFERENCES users(id)
+    ) WITHOUT ROWID;
+
+    CREATE INDEX IF NOT EXISTS idx_course_enrollments_waitlist
+        ON course_enrollments (institution_name, code, status, waitlist_seq);
+    CREATE INDEX IF NOT EXISTS idx_course_enrollments_student
+        ON course_enrollments (student_id, status);
+
+    CREATE TABLE IF NOT EXISTS enrollment_requests (
+        institution_name TEXT NOT NULL,
+        request_key TEXT NOT NULL,
+        code TEXT NOT NULL,
+        student_id INTEGER NOT NULL,
+        status TEXT NOT NULL,              -- outcome returned to every retry
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (institution_name, request_key)
+    ) WITHOUT ROWID;
+    """)
+
+    # Bulk status changes: one audit row per batch
+    cur.executescript("""
+    CREATE TABLE IF NOT EXISTS user_status_audit (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        actor TEXT,
+        status TEXT NOT NULL,
+        scope TEXT NOT NULL,
+        affected INTEGER NOT NULL
+    );
+    """)
+
+    # Columns added after the table first shipped
+    cur.execute("PRAGMA table_info('payment_requests')")
+    if "confirmed_by" not in [row[1] for row in cur.fetchall()]:
+        cur.execute("ALTER TABLE payment_requests ADD COLUMN confirmed_by TEXT")
+    cur.execute("PRAGMA table_info('hostel_applications')")
+    columns = [row[1] for row in cur.fetchall()]
+    if "requested_tier" not in columns:
+        cur.execute("ALTER TABLE hostel_applications ADD COLUMN requested_tier INTEGER NOT NULL DEFAULT 2")
+        cur.execute("ALTER TABLE hostel_applications ADD COLUMN requested_accessible INTEGER NOT NULL DEFAULT 0")
+        cur.execute("UPDATE hostel_applications SET requested_tier = tier, requested_accessible = accessible")
+    cur.execute("PRAGMA table_info('notification_outbox')")
+    if "claimed_at" not in [row[1] for row in cur.fetchall()]:
+        cur.execute("ALTER TABLE notification_outbox ADD COLUMN claimed_at TEXT")
+
     conn.commit()
     conn.close()
 
 
 
 # ---------- Institution helpers ----------
+#
+# Writes that change an institution row or its user counts record the
+# institution name in a process-wide dirty set; ecosystem.EcosystemSnapshot
+# drains it and re-reads only those institutions.
+
+_ecosystem_dirty = set()
+_ecosystem_dirty_lock = threading.Lock()
+
+
+def _mark_ecosystem_dirty(*names):
+    with _ecosystem_dirty_lock:
+        _ecosystem_dirty.update(n for n in names if n)
+
+
+def take_ecosystem_changes():
+    """Institution names changed since the last call (and clear them)."""
+    global _ecosystem_dirty
+    with _ecosystem_dirty_lock:
+        changed, _ecosystem_dirty = _ecosystem_dirty, set()
+    return changed
+
 
 def add_institution_application(name, country, city, details, code=""):
     conn = _get_connection()
@@ -149,6 +699,7 @@ def add_institution_application(name, country, city, details, code=""):
     )
     conn.commit()
     conn.close()
+    _mark_ecosystem_dirty(name)
 
 
 def approve_institution_db(name, code=None):
@@ -166,6 +717,7 @@ def approve_institution_db(name, code=None):
         )
     conn.commit()
     conn.close()
+    _mark_ecosystem_dirty(name)
 
 
 def delete_institution_application(name):
@@ -174,6 +726,7 @@ def delete_institution_application(name):
     cur.execute("DELETE FROM institutions WHERE name=? AND status='pending'", (name,))
     conn.commit()
     conn.close()
+    _mark_ecosystem_dirty(name)
 
 
 def list_institutions(status=None):
@@ -193,6 +746,48 @@ def list_institutions(status=None):
     return rows
 
 
+def ecosystem_rows(names=None):
+    """
+    Institutions with their user counts, for all institutions or only `names`:
+    [(name, code, status, country, city, details,
+      students, teachers, parents, [department labels])]
+    Two queries: the institution rows, and users grouped by
+    (institution_name, student_id) via idx_users_institution_role.
+    """
+    names = None if names is None else sorted(names)
+    if names == []:
+        return []
+    where = "" if names is None else f"WHERE name IN ({', '.join('?' * len(names))})"
+    user_where = "" if names is None else f"WHERE institution_name IN ({', '.join('?' * len(names))})"
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        f"SELECT name, code, status, country, city, details FROM institutions {where} ORDER BY name",
+        names or (),
+    )
+    institutions = cur.fetchall()
+    cur.execute(
+        f"""
+        SELECT institution_name, COALESCE(student_id, ''),
+               SUM(role = 'Student'), SUM(role = 'Teacher'), SUM(role = 'Parent')
+        FROM users
+        {user_where}
+        GROUP BY institution_name, COALESCE(student_id, '')
+        """,
+        names or (),
+    )
+    counts = {}
+    for inst, dept, students, teachers, parents in cur.fetchall():
+        c = counts.setdefault(inst, [0, 0, 0, []])
+        c[0] += students
+        c[1] += teachers
+        c[2] += parents
+        if dept:
+            c[3].append(dept)
+    conn.close()
+    return [row + tuple(counts.get(row[0], (0, 0, 0, []))) for row in institutions]
+
+
 # ---------- User account helpers ----------
 
 def _hash_password(raw_password: str) -> str:
@@ -273,6 +868,7 @@ def create_user(
         )
         conn.commit()
         user_id = cur.lastrowid
+        _mark_ecosystem_dirty(institution_name.strip())
     except sqlite3.IntegrityError:
         # UNIQUE constraint failed (likely email or user_code)
         conn.rollback()
@@ -297,55 +893,48 @@ def create_user(
         }
 
 
-def get_user_by_email(email: str):
+_USER_FIELDS = (
+    "id",
+    "user_code",
+    "full_name",
+    "email",
+    "password_hash",
+    "role",
+    "phone",
+    "student_id",
+    "institution_name",
+    "teacher_reg_no",
+    "student_reg_no",
+    "parent_child_name",
+    "parent_child_reg_no",
+    "status",
+)
+
+
+def _fetch_user(where_sql: str, params):
     conn = _get_connection()
     cur = conn.cursor()
     cur.execute(
-        """
-        SELECT id, user_code, full_name, email, password_hash, role, phone,
-               student_id, institution_name, teacher_reg_no, student_reg_no,
-               parent_child_name, parent_child_reg_no, status
-        FROM users
-        WHERE email = ?
-        """,
-        (email.strip().lower(),),
+        f"SELECT {', '.join(_USER_FIELDS)} FROM users WHERE {where_sql}",
+        params,
     )
     row = cur.fetchone()
     conn.close()
     if row is None:
         return None
-    (
-        id_,
-        user_code,
-        full_name,
-        email,
-        password_hash,
-        role,
-        phone,
-        student_id,
-        institution_name,
-        teacher_reg_no,
-        student_reg_no,
-        parent_child_name,
-        parent_child_reg_no,
-        status,
-    ) = row
-    return {
-        "id": id_,
-        "user_code": user_code,
-        "full_name": full_name,
-        "email": email,
-        "password_hash": password_hash,
-        "role": role,
-        "phone": phone,
-        "student_id": student_id,
-        "institution_name": institution_name,
-        "teacher_reg_no": teacher_reg_no,
-        "student_reg_no": student_reg_no,
-        "parent_child_name": parent_child_name,
-        "parent_child_reg_no": parent_child_reg_no,
-        "status": status,
-    }
+    return dict(zip(_USER_FIELDS, row))
+
+
+def get_user_by_email(email: str):
+    return _fetch_user("email = ?", (email.strip().lower(),))
+
+
+def find_student_by_reg_no(institution_name: str, student_reg_no: str):
+    """Student of `institution_name` with this registration number (served by idx_users_institution_role)."""
+    return _fetch_user(
+        "role = 'Student' AND institution_name = ? AND student_reg_no = ?",
+        (institution_name, student_reg_no),
+    )
 
 
 def verify_login(email: str, raw_password: str):
@@ -368,6 +957,16 @@ def set_user_status(user_id: int, status: str):
     )
     conn.commit()
     conn.close()
+    _bump_status_epoch()
+
+
+def get_user_status(user_id: int):
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT status FROM users WHERE id = ?", (user_id,))
+    row = cur.fetchone()
+    conn.close()
+    return row[0] if row else None
 
 
 def list_users():
@@ -591,3 +1190,3033 @@ def list_student_grades(student_id: int):
     rows = cur.fetchall()
     conn.close()
     return rows
+
+
+# ---------- Class message board helpers ----------
+
+def post_class_message(
+    institution_name: str,
+    class_name: str,
+    sender_id: int,
+    sender_name: str,
+    sender_role: str,
+    text: str,
+):
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        INSERT INTO class_messages
+        (institution_name, class_name, sender_id, sender_name, sender_role, text)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        (
+            institution_name.strip(),
+            class_name.strip(),
+            sender_id,
+            sender_name,
+            sender_role,
+            text.strip(),
+        ),
+    )
+    conn.commit()
+    message_id = cur.lastrowid
+    conn.close()
+    return message_id
+
+
+def list_class_messages_since(
+    institution_name: str,
+    class_name: str,
+    since_id: int = 0,
+    limit: int = 200,
+):
+    """
+    Return messages of a class with id > since_id, oldest first.
+    At most the newest `limit` messages are returned, so a first visit
+    (since_id=0) only transfers the recent tail of the board.
+    """
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT id, sender_id, sender_name, sender_role, text, created_at
+        FROM class_messages
+        WHERE institution_name = ?
+          AND class_name = ?
+          AND id > ?
+        ORDER BY id DESC
+        LIMIT ?
+        """,
+        (institution_name.strip(), class_name.strip(), int(since_id), int(limit)),
+    )
+    rows = cur.fetchall()
+    conn.close()
+    rows.reverse()
+    return rows
+
+
+def get_class_message_cursor(user_id: int, institution_name: str, class_name: str) -> int:
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT last_read_id
+        FROM class_message_cursors
+        WHERE user_id = ? AND institution_name = ? AND class_name = ?
+        """,
+        (user_id, institution_name.strip(), class_name.strip()),
+    )
+    row = cur.fetchone()
+    conn.close()
+    return row[0] if row else 0
+
+
+def mark_class_messages_read(
+    user_id: int,
+    institution_name: str,
+    class_name: str,
+    last_read_id: int,
+):
+    """Move the user's read cursor forward (never backwards)."""
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        INSERT INTO class_message_cursors (user_id, institution_name, class_name, last_read_id)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (user_id, institution_name, class_name)
+        DO UPDATE SET last_read_id = MAX(last_read_id, excluded.last_read_id)
+        """,
+        (user_id, institution_name.strip(), class_name.strip(), int(last_read_id)),
+    )
+    conn.commit()
+    conn.close()
+
+
+# ---------- Deadline helpers ----------
+#
+# due_date is stored as 'YYYY-MM-DD'; work is due by the end of that day
+# (UTC, like CURRENT_TIMESTAMP), i.e. before datetime(due_date, '+1 day').
+
+def list_upcoming_deadlines(today: str):
+    """Published assignments whose due day is today or later: (id, due_date)."""
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT id, due_date
+        FROM assignments
+        WHERE status = 'Published'
+          AND due_date >= ?
+        ORDER BY due_date ASC
+        """,
+        (today,),
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def create_assignment_reminders(batch):
+    """
+    Fan out reminders for a batch of (assignment_id, offset_minutes) events.
+
+    Each event is resolved with one INSERT ... SELECT over the students of the
+    assignment's class who have not submitted yet; the whole batch runs in a
+    single transaction. UNIQUE(assignment_id, student_id, offset_minutes)
+    makes re-firing an event harmless. Returns the number of reminder rows.
+    """
+    if not batch:
+        return 0
+    conn = _get_connection()
+    cur = conn.cursor()
+    before = conn.total_changes
+    cur.executemany(
+        """
+        INSERT OR IGNORE INTO assignment_reminders (assignment_id, student_id, offset_minutes)
+        SELECT a.id, u.id, ?
+        FROM assignments a
+        JOIN users t ON t.id = a.teacher_id
+        JOIN users u ON u.role = 'Student'
+                    AND u.status = 'active'
+                    AND u.institution_name = t.institution_name
+                    AND u.student_id = a.class_name
+        WHERE a.id = ?
+          AND a.status = 'Published'
+          AND NOT EXISTS (
+              SELECT 1 FROM submissions s
+              WHERE s.assignment_id = a.id AND s.student_id = u.id
+          )
+        """,
+        [(int(offset), int(assignment_id)) for assignment_id, offset in batch],
+    )
+    conn.commit()
+    created = conn.total_changes - before
+    conn.close()
+    return created
+
+
+def list_student_reminders(student_id: int, unread_only: bool = True):
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        f"""
+        SELECT r.id, r.assignment_id, a.title, a.subject, a.due_date,
+               r.offset_minutes, r.created_at
+        FROM assignment_reminders r
+        JOIN assignments a ON a.id = r.assignment_id
+        WHERE r.student_id = ?
+          {"AND r.read_at IS NULL" if unread_only else ""}
+        ORDER BY r.id DESC
+        """,
+        (student_id,),
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def mark_student_reminders_read(student_id: int):
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        UPDATE assignment_reminders
+        SET read_at = CURRENT_TIMESTAMP
+        WHERE student_id = ? AND read_at IS NULL
+        """,
+        (student_id,),
+    )
+    conn.commit()
+    conn.close()
+
+
+def class_deadline_status(teacher_id: int, class_name: str):
+    """
+    On-time / late / missing / pending status of every student of a class
+    for every assignment the teacher published to it, in one query.
+
+    Returns rows of
+    (assignment_id, title, due_date, student_id, student_name, first_submitted_at, status).
+    """
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        WITH class_assignments AS (
+            SELECT a.id, a.title, a.due_date, t.institution_name
+            FROM assignments a
+            JOIN users t ON t.id = a.teacher_id
+            WHERE a.teacher_id = ?
+              AND a.class_name = ?
+              AND a.status IN ('Published', 'Closed')
+        ),
+        roster AS (
+            SELECT id, full_name, institution_name
+            FROM users
+            WHERE role = 'Student' AND student_id = ?
+        ),
+        first_submission AS (
+            SELECT s.assignment_id, s.student_id, MIN(s.submitted_at) AS submitted_at
+            FROM submissions s
+            JOIN class_assignments ca ON ca.id = s.assignment_id
+            GROUP BY s.assignment_id, s.student_id
+        )
+        SELECT ca.id, ca.title, ca.due_date, r.id, r.full_name, fs.submitted_at,
+               CASE
+                   WHEN fs.submitted_at IS NOT NULL
+                        AND fs.submitted_at < datetime(ca.due_date, '+1 day') THEN 'on_time'
+                   WHEN fs.submitted_at IS NOT NULL THEN 'late'
+                   WHEN CURRENT_TIMESTAMP >= datetime(ca.due_date, '+1 day') THEN 'missing'
+                   ELSE 'pending'
+               END
+        FROM class_assignments ca
+        JOIN roster r ON r.institution_name = ca.institution_name
+        LEFT JOIN first_submission fs
+               ON fs.assignment_id = ca.id AND fs.student_id = r.id
+        ORDER BY ca.due_date DESC, ca.id, r.full_name
+        """,
+        (teacher_id, class_name.strip(), class_name.strip()),
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+# ---------- Paged table helpers ----------
+#
+# Sources the paged grid can read. Column names coming from the UI are only
+# ever looked up in these whitelists, never interpolated directly.
+#   columns      public column name -> SQL expression (projectable, sortable)
+#   filter_only  extra columns that may be filtered on but not shown
+#   search       columns matched by the free-text search (LIKE, case-insensitive)
+PAGED_SOURCES = {
+    "institutions": {
+        "from": "institutions",
+        "columns": {
+            "id": "id",
+            "name": "name",
+            "code": "code",
+            "status": "status",
+            "country": "country",
+            "city": "city",
+            "details": "details",
+        },
+        "filter_only": {},
+        "search": ("name", "country", "city"),
+        "key": "id",
+    },
+    "users": {
+        "from": "users",
+        "columns": {
+            "id": "id",
+            "user_code": "user_code",
+            "full_name": "full_name",
+            "email": "email",
+            "role": "role",
+            "phone": "phone",
+            "institution_name": "institution_name",
+            "status": "status",
+            "student_id": "student_id",
+            "department": "COALESCE(NULLIF(student_id, ''), 'No department')",
+        },
+        "filter_only": {},
+        "search": ("full_name", "email", "institution_name", "user_code"),
+        "key": "id",
+    },
+    "fee_balances": {
+        "from": "fee_balances b JOIN users u ON u.id = b.student_id",
+        "columns": {
+            "student_id": "b.student_id",
+            "full_name": "u.full_name",
+            "email": "u.email",
+            "department": "COALESCE(NULLIF(u.student_id, ''), 'No department')",
+            "billed": "b.billed_cents / 100.0",
+            "paid": "b.paid_cents / 100.0",
+            "balance": "b.balance_cents / 100.0",
+            "last_payment_date": "b.last_payment_date",
+        },
+        "filter_only": {"institution_name": "b.institution_name", "term": "b.term"},
+        "search": ("full_name", "email"),
+        "key": "b.student_id",
+    },
+    "teacher_assignments": {
+        "from": "assignments a",
+        "columns": {
+            "id": "a.id",
+            "title": "a.title",
+            "subject": "a.subject",
+            "class_name": "a.class_name",
+            "due_date": "a.due_date",
+            "max_points": "a.max_points",
+            "status": "a.status",
+            "created_at": "a.created_at",
+        },
+        "filter_only": {"teacher_id": "a.teacher_id"},
+        "search": ("title", "subject", "class_name"),
+        "key": "a.id",
+    },
+    "teacher_submissions": {
+        "from": """submissions s
+                   JOIN assignments a ON s.assignment_id = a.id
+                   JOIN users u ON s.student_id = u.id""",
+        "columns": {
+            "id": "s.id",
+            "assignment_id": "s.assignment_id",
+            "student_id": "s.student_id",
+            "filename": "s.filename",
+            "submitted_at": "s.submitted_at",
+            "title": "a.title",
+            "class_name": "a.class_name",
+            "student_name": "u.full_name",
+        },
+        "filter_only": {"teacher_id": "a.teacher_id"},
+        "search": ("title", "class_name", "student_name", "filename"),
+        "key": "s.id",
+    },
+}
+
+# Institution dashboards search people by name and email only: every row
+# already shares the institution name, which would match everyone. They
+# filter by department_key, as the headcounts do, so users with no
+# student_id (NULL or '') are listed under "No department".
+PAGED_SOURCES["institution_users"] = {
+    **PAGED_SOURCES["users"],
+    "filter_only": {"department_key": "COALESCE(student_id, '')"},
+    "search": ("full_name", "email"),
+}
+
+
+def _paged_where(spec, filters, search):
+    """WHERE clause + params for a paged source, or None if an IN list is empty."""
+    filterable = {**spec["columns"], **spec["filter_only"]}
+    where = []
+    params = []
+    for col, value in (filters or {}).items():
+        expr = filterable[col]
+        if isinstance(value, (list, tuple, set, frozenset)):
+            if not value:
+                return None
+            where.append(f"{expr} IN ({', '.join('?' * len(value))})")
+            params.extend(value)
+        else:
+            where.append(f"{expr} = ?")
+            params.append(value)
+    if search and search.strip():
+        like = f"%{search.strip()}%"
+        where.append("(" + " OR ".join(f"{filterable[c]} LIKE ?" for c in spec["search"]) + ")")
+        params.extend([like] * len(spec["search"]))
+    return ("WHERE " + " AND ".join(where)) if where else "", params
+
+
+def select_page(
+    source: str,
+    columns=None,
+    filters=None,
+    search: str = "",
+    sort=None,
+    descending: bool = False,
+    page: int = 1,
+    page_size: int = 50,
+):
+    """
+    Read one page of a PAGED_SOURCES entry.
+
+    filters maps column -> value (equality) or list/tuple/set (IN).
+    Returns (rows, total) where rows are tuples in `columns` order and
+    total is the number of rows matching the filters and search.
+    """
+    spec = PAGED_SOURCES[source]
+    shown = spec["columns"]
+    columns = [c for c in (columns or shown) if c in shown] or list(shown)
+
+    clause = _paged_where(spec, filters, search)
+    if clause is None:
+        return [], 0
+    where_sql, params = clause
+
+    sort_expr = shown.get(sort, spec["key"])
+    direction = "DESC" if descending else "ASC"
+    page = max(int(page), 1)
+    page_size = max(int(page_size), 1)
+
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(f"SELECT COUNT(*) FROM {spec['from']} {where_sql}", params)
+    total = cur.fetchone()[0]
+    cur.execute(
+        f"""
+        SELECT {', '.join(shown[c] for c in columns)}
+        FROM {spec['from']}
+        {where_sql}
+        ORDER BY {sort_expr} {direction}, {spec['key']} {direction}
+        LIMIT ? OFFSET ?
+        """,
+        params + [page_size, (page - 1) * page_size],
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows, total
+
+
+def count_rows(source: str, filters=None, search: str = "") -> int:
+    spec = PAGED_SOURCES[source]
+    clause = _paged_where(spec, filters, search)
+    if clause is None:
+        return 0
+    where_sql, params = clause
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(f"SELECT COUNT(*) FROM {spec['from']} {where_sql}", params)
+    total = cur.fetchone()[0]
+    conn.close()
+    return total
+
+
+def list_teacher_classes(teacher_id: int):
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT DISTINCT class_name
+        FROM assignments
+        WHERE teacher_id = ? AND class_name <> ''
+        ORDER BY class_name
+        """,
+        (teacher_id,),
+    )
+    rows = [r[0] for r in cur.fetchall()]
+    conn.close()
+    return rows
+
+
+# ---------- Super Admin user queries ----------
+
+USER_QUERY_COLUMNS = [
+    "id",
+    "user_code",
+    "full_name",
+    "email",
+    "role",
+    "phone",
+    "institution_name",
+    "status",
+]
+
+
+def query_users(
+    roles=None,
+    statuses=None,
+    institution=None,
+    text: str = "",
+    sort: str = "id",
+    descending: bool = False,
+    page: int = 1,
+    page_size: int = 50,
+    columns=None,
+):
+    """
+    One page of users matching every given predicate; None means "any".
+    Role, status and institution filters are served by indexes.
+    Returns (rows, total) like select_page.
+    """
+    filters = {}
+    if roles is not None:
+        filters["role"] = list(roles)
+    if statuses is not None:
+        filters["status"] = list(statuses)
+    if institution is not None:
+        filters["institution_name"] = institution
+    return select_page(
+        "users",
+        columns=columns or USER_QUERY_COLUMNS,
+        filters=filters,
+        search=text,
+        sort=sort,
+        descending=descending,
+        page=page,
+        page_size=page_size,
+    )
+
+
+def user_facets():
+    """Counts per role, per status and per institution: {facet: [(value, count), ...]}."""
+    conn = _get_connection()
+    cur = conn.cursor()
+    facets = {}
+    for facet, column in (("role", "role"), ("status", "status"), ("institution", "institution_name")):
+        cur.execute(
+            f"""
+            SELECT COALESCE({column}, ''), COUNT(*)
+            FROM users
+            GROUP BY {column}
+            ORDER BY {column}
+            """
+        )
+        facets[facet] = cur.fetchall()
+    conn.close()
+    return facets
+
+
+# ---------- Bulk user status ----------
+#
+# Every status write bumps a process-wide epoch. Sessions remember the
+# epoch they last checked their own user against and re-read the user's
+# status only when it moved, so a blocked user is signed out on their
+# next rerun without a query per rerun for everyone else.
+
+_status_epoch = 0
+_status_epoch_lock = threading.Lock()
+
+
+def _bump_status_epoch():
+    global _status_epoch
+    with _status_epoch_lock:
+        _status_epoch += 1
+
+
+def user_status_epoch() -> int:
+    return _status_epoch
+
+
+def _id_ranges(ids):
+    """Sorted ids -> [[first, last], ...] so audit rows stay small for big batches."""
+    ranges = []
+    for i in ids:
+        if ranges and i == ranges[-1][1] + 1:
+            ranges[-1][1] = i
+        else:
+            ranges.append([i, i])
+    return ranges
+
+
+def set_users_status_bulk(
+    status: str,
+    user_ids=None,
+    filters=None,
+    search: str = "",
+    actor: str = "",
+) -> int:
+    """
+    Set `status` on every user matching user_ids AND filters AND search,
+    as one UPDATE in one transaction with one user_status_audit row.
+
+    user_ids  iterable of ids (any length), or None for "any"
+    filters   column -> value / list, as for select_page("users", ...)
+    At least one of user_ids, filters or search is required, so a bulk
+    call can never touch the whole table by accident.
+    Returns the number of users whose status changed.
+    """
+    if user_ids is None and not filters and not (search and search.strip()):
+        raise ValueError("set_users_status_bulk needs ids, filters or a search")
+    clause = _paged_where(PAGED_SOURCES["users"], filters, search)
+    if clause is None:
+        return 0
+    where_sql, params = clause
+    where = [where_sql[len("WHERE "):]] if where_sql else []
+    if user_ids is not None:
+        ids = sorted({int(i) for i in user_ids})
+        if not ids:
+            return 0
+        # json_each keeps the statement to one bound parameter however many ids
+        where.append("id IN (SELECT value FROM json_each(?))")
+        params.append(json.dumps(ids))
+    where.append("status IS NOT ?")
+
+    scope = {"filters": filters or {}, "search": (search or "").strip()}
+    if user_ids is not None:
+        scope["user_ids"] = _id_ranges(ids)
+
+    conn = _get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute(
+            f"UPDATE users SET status = ? WHERE {' AND '.join(where)}",
+            [status] + params + [status],
+        )
+        affected = cur.rowcount
+        cur.execute(
+            """
+            INSERT INTO user_status_audit (actor, status, scope, affected)
+            VALUES (?, ?, ?, ?)
+            """,
+            (actor, status, json.dumps(scope, sort_keys=True), affected),
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    _bump_status_epoch()
+    return affected
+
+
+def set_institution_users_status(institution_name: str, status: str, actor: str = "") -> int:
+    """Block / unblock every user of one institution (served by idx_users_institution_role)."""
+    return set_users_status_bulk(
+        status, filters={"institution_name": institution_name}, actor=actor
+    )
+
+
+def list_user_status_audit(limit: int = 20):
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT id, created_at, actor, status, scope, affected
+        FROM user_status_audit
+        ORDER BY id DESC
+        LIMIT ?
+        """,
+        (limit,),
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+# ---------- Event log ----------
+
+def insert_events(rows):
+    """rows: [(created_at, tenant_id, actor_id, event_type, payload_json)] in one transaction."""
+    conn = _get_connection()
+    try:
+        with conn:
+            conn.executemany(
+                """
+                INSERT INTO events (created_at, tenant_id, actor_id, event_type, payload)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                rows,
+            )
+    finally:
+        conn.close()
+
+
+def count_events_by_type(since: str = ""):
+    """[(event_type, count)] for events created at or after `since` (ISO text)."""
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT event_type, COUNT(*)
+        FROM events
+        WHERE created_at >= ?
+        GROUP BY event_type
+        ORDER BY COUNT(*) DESC
+        """,
+        (since,),
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+# ---------- Notification helpers ----------
+#
+# An audience is a dict of AND-ed predicates over active users:
+#   institution -> users.institution_name
+#   role        -> users.role
+#   class       -> users.student_id (class / department label)
+#   user_ids    -> explicit list of user ids
+
+NOTIFICATION_MAX_ATTEMPTS = 5
+# A worker renews its claim on every chunk; a row 'expanding' without a
+# renewal for this long belongs to a dead worker and may be claimed again.
+NOTIFICATION_LEASE_SECONDS = 300
+
+# Rows a worker may claim: waiting, failed, or 'expanding' under an expired lease.
+_CLAIMABLE_NOTIFICATION = """
+    attempts < ? AND (
+        status IN ('queued', 'failed')
+        OR (status = 'expanding' AND (claimed_at IS NULL OR claimed_at < datetime('now', ?)))
+    )
+"""
+
+_AUDIENCE_COLUMNS = {"institution": "institution_name", "role": "role", "class": "student_id"}
+# Students currently enrolled in a course (see course_enrollments).
+_COURSE_AUDIENCE = "id IN (SELECT student_id FROM course_enrollments WHERE code = ? AND status = 'enrolled')"
+
+
+def _audience_where(audience):
+    where = ["status = 'active'"]
+    params = []
+    for key, value in audience.items():
+        if key == "user_ids":
+            where.append("id IN (SELECT value FROM json_each(?))")
+            params.append(json.dumps([int(i) for i in value]))
+        elif key in _AUDIENCE_COLUMNS:
+            where.append(f"{_AUDIENCE_COLUMNS[key]} = ?")
+            params.append(value)
+        elif key == "course":
+            where.append(_COURSE_AUDIENCE)
+            params.append(value)
+        else:
+            raise ValueError(f"Unknown audience key: {key}")
+    return " AND ".join(where), params
+
+
+def create_notification(tenant_id, sender_id, audience, title, body, tags=None) -> int:
+    """Queue one notification for `audience`; returns the outbox id."""
+    _audience_where(audience)  # validate before storing
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        INSERT INTO notification_outbox (tenant_id, sender_id, audience, title, body, tags)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        (tenant_id, sender_id, json.dumps(audience, sort_keys=True), title, body, json.dumps(tags or [])),
+    )
+    outbox_id = cur.lastrowid
+    conn.commit()
+    conn.close()
+    return outbox_id
+
+
+def claim_notification(outbox_id: int):
+    """
+    Move a queued / failed notification (or one whose worker's lease expired)
+    to 'expanding' for one worker. Returns (audience dict, cursor_user_id, attempts)
+    or None if another worker has it, it is finished, or it ran out of attempts.
+    """
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        f"""
+        UPDATE notification_outbox
+        SET status = 'expanding', attempts = attempts + 1, claimed_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND {_CLAIMABLE_NOTIFICATION}
+        """,
+        (outbox_id, NOTIFICATION_MAX_ATTEMPTS, f"-{NOTIFICATION_LEASE_SECONDS} seconds"),
+    )
+    claimed = cur.rowcount == 1
+    row = None
+    if claimed:
+        cur.execute(
+            "SELECT audience, cursor_user_id, attempts FROM notification_outbox WHERE id = ?",
+            (outbox_id,),
+        )
+        row = cur.fetchone()
+    conn.commit()
+    conn.close()
+    return (json.loads(row[0]), row[1], row[2]) if row else None
+
+
+def audience_user_ids(audience, after_id: int = 0, limit: int = 5000):
+    """Next `limit` active user ids of `audience` with id > after_id, ascending."""
+    where, params = _audience_where(audience)
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        f"SELECT id FROM users WHERE {where} AND id > ? ORDER BY id LIMIT ?",
+        params + [after_id, limit],
+    )
+    ids = [r[0] for r in cur.fetchall()]
+    conn.close()
+    return ids
+
+
+def count_audience(audience) -> int:
+    where, params = _audience_where(audience)
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(f"SELECT COUNT(*) FROM users WHERE {where}", params)
+    total = cur.fetchone()[0]
+    conn.close()
+    return total
+
+
+def deliver_notification_chunk(outbox_id: int, user_ids):
+    """
+    Insert inbox rows for one chunk and advance the outbox cursor (renewing
+    the worker's claim), in one transaction.
+    """
+    if not user_ids:
+        return
+    conn = _get_connection()
+    try:
+        with conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO notification_inbox (outbox_id, user_id) VALUES (?, ?)",
+                [(outbox_id, uid) for uid in user_ids],
+            )
+            inserted = conn.total_changes - before
+            conn.execute(
+                """
+                UPDATE notification_outbox
+                SET cursor_user_id = ?, recipients = recipients + ?, claimed_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+                """,
+                (user_ids[-1], inserted, outbox_id),
+            )
+    finally:
+        conn.close()
+
+
+def finish_notification(outbox_id: int, error: str = ""):
+    """Mark delivered, or failed with `error` (retried while attempts remain)."""
+    conn = _get_connection()
+    cur = conn.cursor()
+    if error:
+        cur.execute(
+            "UPDATE notification_outbox SET status = 'failed', last_error = ? WHERE id = ?",
+            (error, outbox_id),
+        )
+    else:
+        cur.execute(
+            """
+            UPDATE notification_outbox
+            SET status = 'delivered', delivered_at = CURRENT_TIMESTAMP, last_error = NULL
+            WHERE id = ?
+            """,
+            (outbox_id,),
+        )
+    conn.commit()
+    conn.close()
+
+
+def list_unfinished_notifications():
+    """
+    Outbox ids still to deliver (e.g. after a restart), oldest first. Rows
+    another process's worker is expanding are left to it until its lease expires.
+    """
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        f"SELECT id FROM notification_outbox WHERE {_CLAIMABLE_NOTIFICATION} ORDER BY id",
+        (NOTIFICATION_MAX_ATTEMPTS, f"-{NOTIFICATION_LEASE_SECONDS} seconds"),
+    )
+    ids = [r[0] for r in cur.fetchall()]
+    conn.close()
+    return ids
+
+
+def list_outbox(tenant_id=None, limit: int = 20):
+    conn = _get_connection()
+    cur = conn.cursor()
+    where = "WHERE tenant_id = ?" if tenant_id is not None else ""
+    cur.execute(
+        f"""
+        SELECT id, created_at, title, audience, status, attempts, recipients, last_error
+        FROM notification_outbox
+        {where}
+        ORDER BY id DESC
+        LIMIT ?
+        """,
+        ([tenant_id] if tenant_id is not None else []) + [limit],
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def list_inbox(user_id: int, unread_only: bool = False, limit: int = 50):
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        f"""
+        SELECT i.id, o.created_at, o.title, o.body, o.tags, o.sender_id, i.read_at
+        FROM notification_inbox i
+        JOIN notification_outbox o ON o.id = i.outbox_id
+        WHERE i.user_id = ? {"AND i.read_at IS NULL" if unread_only else ""}
+        ORDER BY i.id DESC
+        LIMIT ?
+        """,
+        (user_id, limit),
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def count_unread_inbox(user_id: int) -> int:
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT COUNT(*) FROM notification_inbox WHERE user_id = ? AND read_at IS NULL",
+        (user_id,),
+    )
+    total = cur.fetchone()[0]
+    conn.close()
+    return total
+
+
+def mark_inbox_read(user_id: int, inbox_ids=None):
+    conn = _get_connection()
+    cur = conn.cursor()
+    if inbox_ids is None:
+        cur.execute(
+            "UPDATE notification_inbox SET read_at = CURRENT_TIMESTAMP WHERE user_id = ? AND read_at IS NULL",
+            (user_id,),
+        )
+    else:
+        cur.executemany(
+            "UPDATE notification_inbox SET read_at = CURRENT_TIMESTAMP WHERE user_id = ? AND id = ? AND read_at IS NULL",
+            [(user_id, i) for i in inbox_ids],
+        )
+    conn.commit()
+    conn.close()
+
+
+# ---------- Threaded inbox helpers ----------
+
+INBOX_PREVIEW_CHARS = 120
+
+
+def _ensure_thread(cur, thread_key, tenant_id, title, member_ids):
+    cur.execute(
+        "INSERT OR IGNORE INTO message_threads (thread_key, tenant_id, title) VALUES (?, ?, ?)",
+        (thread_key, tenant_id, title),
+    )
+    # New members see the thread's latest message but start with nothing unread.
+    cur.executemany(
+        """
+        INSERT OR IGNORE INTO thread_members
+            (user_id, thread_key, last_seq, last_read_seq, last_sender_id, last_text, last_message_at)
+        SELECT ?, t.thread_key, t.last_seq, t.last_seq, m.sender_id, substr(m.text, 1, ?),
+               COALESCE(m.created_at, t.created_at)
+        FROM message_threads t
+        LEFT JOIN thread_messages m ON m.thread_key = t.thread_key AND m.seq = t.last_seq
+        WHERE t.thread_key = ?
+        """,
+        [(str(uid), INBOX_PREVIEW_CHARS, thread_key) for uid in member_ids],
+    )
+
+
+def add_thread_members(thread_key: str, member_ids, tenant_id: str = "", title: str = ""):
+    """Create the thread if needed and add members (existing members are left as they are)."""
+    conn = _get_connection()
+    cur = conn.cursor()
+    _ensure_thread(cur, thread_key, tenant_id, title or thread_key, member_ids)
+    conn.commit()
+    conn.close()
+
+
+def post_thread_message(thread_key: str, sender_id: str, text: str, tenant_id: str = "") -> int:
+    """
+    Append a message and return its per-thread sequence number.
+
+    The sequence is taken from message_threads.last_seq under BEGIN
+    IMMEDIATE, so it is gap-free and monotonic per thread; every member's
+    summary row is updated in the same transaction. The sender is added
+    to the thread if not yet a member.
+    """
+    sender_id = str(sender_id)
+    text = text.strip()
+    conn = _get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        _ensure_thread(cur, thread_key, tenant_id, thread_key, [sender_id])
+        cur.execute(
+            "UPDATE message_threads SET last_seq = last_seq + 1 WHERE thread_key = ? RETURNING last_seq",
+            (thread_key,),
+        )
+        seq = cur.fetchone()[0]
+        cur.execute(
+            "INSERT INTO thread_messages (thread_key, seq, sender_id, text) VALUES (?, ?, ?, ?)",
+            (thread_key, seq, sender_id, text),
+        )
+        cur.execute(
+            """
+            UPDATE thread_members
+            SET last_seq = ?,
+                last_sender_id = ?,
+                last_text = ?,
+                last_message_at = strftime('%Y-%m-%d %H:%M:%f', 'now'),
+                unread = CASE WHEN user_id = ? THEN 0 ELSE unread + 1 END,
+                last_read_seq = CASE WHEN user_id = ? THEN ? ELSE last_read_seq END
+            WHERE thread_key = ?
+            """,
+            (seq, sender_id, text[:INBOX_PREVIEW_CHARS], sender_id, sender_id, seq, thread_key),
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return seq
+
+
+def list_message_threads(user_id: str, limit: int = 20, before=None):
+    """
+    One page of a user's thread summaries, most recent first:
+    [(thread_key, title, last_seq, unread, last_sender_id, last_text, last_message_at)].
+    Pass the last row's (last_message_at, thread_key) as `before` for the next page.
+    """
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        f"""
+        SELECT s.thread_key, t.title, s.last_seq, s.unread, s.last_sender_id, s.last_text, s.last_message_at
+        FROM thread_members s
+        JOIN message_threads t ON t.thread_key = s.thread_key
+        WHERE s.user_id = ? {"AND (s.last_message_at, s.thread_key) < (?, ?)" if before else ""}
+        ORDER BY s.last_message_at DESC, s.thread_key DESC
+        LIMIT ?
+        """,
+        [str(user_id)] + (list(before) if before else []) + [limit],
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def count_unread_threads(user_id: str) -> int:
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT COUNT(*) FROM thread_members WHERE user_id = ? AND unread > 0",
+        (str(user_id),),
+    )
+    total = cur.fetchone()[0]
+    conn.close()
+    return total
+
+
+def is_thread_member(user_id: str, thread_key: str) -> bool:
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT 1 FROM thread_members WHERE user_id = ? AND thread_key = ?",
+        (str(user_id), thread_key),
+    )
+    found = cur.fetchone() is not None
+    conn.close()
+    return found
+
+
+def list_thread_messages(thread_key: str, before_seq: int = 0, limit: int = 50):
+    """
+    The newest `limit` messages with seq < before_seq (0 = latest), oldest
+    first: [(seq, sender_id, text, created_at)]. Page backwards by passing
+    the first row's seq as the next before_seq.
+    """
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        f"""
+        SELECT seq, sender_id, text, created_at
+        FROM thread_messages
+        WHERE thread_key = ? {"AND seq < ?" if before_seq else ""}
+        ORDER BY seq DESC
+        LIMIT ?
+        """,
+        [thread_key] + ([int(before_seq)] if before_seq else []) + [int(limit)],
+    )
+    rows = cur.fetchall()
+    conn.close()
+    rows.reverse()
+    return rows
+
+
+def mark_thread_read(user_id: str, thread_key: str, seq: int = 0):
+    """Move the member's read position up to `seq` (0 = latest); never backwards."""
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        UPDATE thread_members
+        SET last_read_seq = MAX(last_read_seq, CASE WHEN ? > 0 THEN MIN(?, last_seq) ELSE last_seq END)
+        WHERE user_id = ? AND thread_key = ?
+        """,
+        (int(seq), int(seq), str(user_id), thread_key),
+    )
+    cur.execute(
+        "UPDATE thread_members SET unread = last_seq - last_read_seq WHERE user_id = ? AND thread_key = ?",
+        (str(user_id), thread_key),
+    )
+    conn.commit()
+    conn.close()
+
+
+# ---------- Payment and ledger helpers ----------
+#
+# Amounts are integer cents. A payment moves PENDING -> SUCCESS | FAILED
+# exactly once: the transition is a conditional UPDATE inside BEGIN
+# IMMEDIATE, and a SUCCESS posts its balanced ledger entries (and the
+# account balances) in the same transaction.
+
+PAYMENT_PENDING = "PENDING"
+PAYMENT_FINAL_STATUSES = ("SUCCESS", "FAILED")
+
+_PAYMENT_FIELDS = (
+    "payment_id, tenant_id, payer_id, idempotency_key, amount_cents, currency, "
+    "description, metadata, status, created_at, updated_at"
+)
+
+
+def _payment_row(row):
+    if row is None:
+        return None
+    keys = [k.strip() for k in _PAYMENT_FIELDS.split(",")]
+    payment = dict(zip(keys, row))
+    payment["metadata"] = json.loads(payment["metadata"] or "{}")
+    return payment
+
+
+def insert_payment_request(
+    payment_id, tenant_id, payer_id, idempotency_key, amount_cents, currency, description, metadata
+):
+    """
+    Insert a PENDING payment request, or return the one already stored
+    under (tenant_id, payer_id, idempotency_key). Reusing a key for a
+    different amount or currency raises ValueError.
+    """
+    key = (tenant_id, payer_id, idempotency_key)
+    select_by_key = f"""
+        SELECT {_PAYMENT_FIELDS} FROM payment_requests
+        WHERE tenant_id = ? AND payer_id = ? AND idempotency_key = ?
+    """
+    conn = _get_connection()
+    cur = conn.cursor()
+    try:
+        # A retried request is answered by a read, without a write transaction.
+        cur.execute(select_by_key, key)
+        payment = _payment_row(cur.fetchone())
+        if payment is None:
+            # On conflict a concurrent request with the same key won the race.
+            cur.execute(
+                f"""
+                INSERT INTO payment_requests ({_PAYMENT_FIELDS})
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, '{PAYMENT_PENDING}', CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+                ON CONFLICT (tenant_id, payer_id, idempotency_key) DO NOTHING
+                """,
+                (
+                    payment_id,
+                    tenant_id,
+                    payer_id,
+                    idempotency_key,
+                    int(amount_cents),
+                    currency,
+                    description,
+                    json.dumps(metadata or {}, sort_keys=True, default=str),
+                ),
+            )
+            cur.execute(select_by_key, key)
+            payment = _payment_row(cur.fetchone())
+            conn.commit()
+    finally:
+        conn.close()
+    if payment["amount_cents"] != int(amount_cents) or payment["currency"] != currency:
+        raise ValueError("Idempotency key already used for a different payment.")
+    return payment
+
+
+def get_payment_request(payment_id: str):
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(f"SELECT {_PAYMENT_FIELDS} FROM payment_requests WHERE payment_id = ?", (payment_id,))
+    payment = _payment_row(cur.fetchone())
+    conn.close()
+    return payment
+
+
+def _ledger_account_id(cur, tenant_id, name, currency):
+    cur.execute(
+        "INSERT OR IGNORE INTO ledger_accounts (tenant_id, name, currency) VALUES (?, ?, ?)",
+        (tenant_id, name, currency),
+    )
+    cur.execute(
+        "SELECT id FROM ledger_accounts WHERE tenant_id = ? AND name = ? AND currency = ?",
+        (tenant_id, name, currency),
+    )
+    return cur.fetchone()[0]
+
+
+def transition_payment(payment_id: str, status: str, postings=(), confirmed_by=None):
+    """
+    Move a PENDING payment to `status`, posting `postings` [(account name,
+    cents)] to the ledger in the same transaction. postings must sum to
+    zero. confirmed_by records the user who confirmed it (None for the
+    wallet / QR callback). Returns the payment's status afterwards; a
+    payment that already left PENDING is returned unchanged.
+    """
+    if status not in PAYMENT_FINAL_STATUSES:
+        raise ValueError(f"Invalid payment status: {status}")
+    if sum(cents for _, cents in postings) != 0:
+        raise ValueError("Ledger postings must balance.")
+    conn = _get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute(
+            f"""
+            UPDATE payment_requests
+            SET status = ?, confirmed_by = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE payment_id = ? AND status = '{PAYMENT_PENDING}'
+            RETURNING tenant_id, currency
+            """,
+            (status, None if confirmed_by is None else str(confirmed_by), payment_id),
+        )
+        row = cur.fetchone()
+        if row is not None:
+            tenant_id, currency = row
+            for name, cents in postings:
+                account_id = _ledger_account_id(cur, tenant_id, name, currency)
+                cur.execute(
+                    "INSERT INTO ledger_entries (payment_id, account_id, amount_cents) VALUES (?, ?, ?)",
+                    (payment_id, account_id, cents),
+                )
+                cur.execute(
+                    "UPDATE ledger_accounts SET balance_cents = balance_cents + ? WHERE id = ?",
+                    (cents, account_id),
+                )
+        cur.execute("SELECT status FROM payment_requests WHERE payment_id = ?", (payment_id,))
+        current = cur.fetchone()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    if current is None:
+        raise KeyError(payment_id)
+    return current[0]
+
+
+def list_payer_payments(tenant_id: str, payer_id: str, limit: int = 20):
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        f"""
+        SELECT {_PAYMENT_FIELDS} FROM payment_requests
+        WHERE tenant_id = ? AND payer_id = ?
+        ORDER BY created_at DESC, payment_id
+        LIMIT ?
+        """,
+        (tenant_id, payer_id, limit),
+    )
+    rows = [_payment_row(r) for r in cur.fetchall()]
+    conn.close()
+    return rows
+
+
+def ledger_balances(tenant_id: str):
+    """[(account name, currency, balance_cents)] of one tenant."""
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT name, currency, balance_cents FROM ledger_accounts
+        WHERE tenant_id = ?
+        ORDER BY name, currency
+        """,
+        (tenant_id,),
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def ledger_check():
+    """
+    (sum of all entries per currency, accounts whose stored balance differs
+    from the sum of their entries). A healthy ledger gives all zero sums
+    and no mismatched accounts.
+    """
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT a.currency, SUM(e.amount_cents)
+        FROM ledger_entries e JOIN ledger_accounts a ON a.id = e.account_id
+        GROUP BY a.currency
+        """
+    )
+    sums = dict(cur.fetchall())
+    cur.execute(
+        """
+        SELECT a.tenant_id, a.name, a.currency, a.balance_cents, COALESCE(SUM(e.amount_cents), 0)
+        FROM ledger_accounts a LEFT JOIN ledger_entries e ON e.account_id = a.id
+        GROUP BY a.id
+        HAVING a.balance_cents <> COALESCE(SUM(e.amount_cents), 0)
+        """
+    )
+    mismatched = cur.fetchall()
+    conn.close()
+    return sums, mismatched
+
+
+def payment_status_counts():
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT status, COUNT(*), COALESCE(SUM(amount_cents), 0) FROM payment_requests GROUP BY status")
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+# ---------- Fee helpers ----------
+#
+# Fee lines (student_fees) are billed per term; money received is a
+# fee_payments row, either imported from successful SANZAD Pay fee
+# payments (revenue:finance entries whose metadata kind is 'fee') or
+# recorded by the institution for cash / bank payments. reconcile_fees() allocates a term's unapplied payments to the
+# outstanding fee lines and rebuilds the term's fee_balances in one
+# transaction; the allocation itself is fees.allocate_fifo.
+
+FEE_REVENUE_ACCOUNT = "revenue:finance"
+
+
+def bill_term_fee(institution_name, term, item, amount_cents, due_date, department=None) -> int:
+    """Add one fee line per active student (optionally one department); returns lines added."""
+    params = [term, item, int(amount_cents), due_date, institution_name]
+    dept_sql = ""
+    if department is not None:
+        dept_sql = "AND COALESCE(student_id, '') = ?"
+        params.append(_department_key(department))
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        f"""
+        INSERT OR IGNORE INTO student_fees
+            (institution_name, student_id, term, item, amount_cents, due_date)
+        SELECT institution_name, id, ?, ?, ?, ?
+        FROM users
+        WHERE institution_name = ? AND role = 'Student' AND status = 'active' {dept_sql}
+        """,
+        params,
+    )
+    added = cur.rowcount
+    conn.commit()
+    conn.close()
+    return added
+
+
+def record_fee_payment(institution_name, student_id, term, amount_cents, reference, paid_at=None) -> bool:
+    """Record a cash / bank payment; False if the reference was already recorded."""
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        INSERT OR IGNORE INTO fee_payments
+            (institution_name, student_id, term, reference, amount_cents, paid_at)
+        VALUES (?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+        """,
+        (institution_name, int(student_id), term, reference, int(amount_cents), paid_at),
+    )
+    added = cur.rowcount == 1
+    conn.commit()
+    conn.close()
+    return added
+
+
+def _import_ledger_fee_payments(cur, institution_name) -> int:
+    """
+    Copy new successful fee payments from the ledger into fee_payments.
+    Only payments made as fees (metadata kind 'fee') count, under the term
+    in their metadata or else the term of the payment date (as
+    fees.current_term). Payments confirmed by their own payer are not
+    proof of payment and are left out.
+    """
+    cur.execute(
+        """
+        INSERT OR IGNORE INTO fee_payments
+            (institution_name, student_id, term, reference, amount_cents, paid_at)
+        SELECT a.tenant_id, CAST(p.payer_id AS INTEGER),
+               COALESCE(
+                   json_extract(p.metadata, '$.term'),
+                   strftime('%Y', p.updated_at) || '-T'
+                       || ((CAST(strftime('%m', p.updated_at) AS INTEGER) - 1) / 4 + 1)
+               ),
+               p.payment_id, e.amount_cents, p.updated_at
+        FROM ledger_accounts a
+        JOIN ledger_entries e ON e.account_id = a.id
+        JOIN payment_requests p ON p.payment_id = e.payment_id
+        WHERE a.tenant_id = ? AND a.name = ?
+          AND e.amount_cents > 0
+          AND p.payer_id GLOB '[0-9]*'
+          AND json_extract(p.metadata, '$.kind') = 'fee'
+          AND (p.confirmed_by IS NULL OR p.confirmed_by <> p.payer_id)
+        """,
+        (institution_name, FEE_REVENUE_ACCOUNT),
+    )
+    return cur.rowcount
+
+
+def reconcile_fees(institution_name: str, term: str, allocate):
+    """
+    Reconcile one term: import new ledger payments, allocate unapplied
+    payments to outstanding fee lines with allocate(fees, payments), and
+    rebuild the term's fee_balances, all in one transaction.
+
+    allocate receives both inputs sorted by student:
+        fees      [(student_id, fee_id, outstanding_cents)] by due_date, id
+        payments  [(student_id, payment_id, unapplied_cents)] by paid_at, id
+    and returns [(payment_id, fee_id, cents)].
+
+    Returns {"imported", "allocations", "allocated_cents", "students"}.
+    """
+    conn = _get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        imported = _import_ledger_fee_payments(cur, institution_name)
+        cur.execute(
+            """
+            SELECT student_id, id, amount_cents - paid_cents
+            FROM student_fees
+            WHERE institution_name = ? AND term = ? AND paid_cents < amount_cents
+            ORDER BY student_id, due_date, id
+            """,
+            (institution_name, term),
+        )
+        fees = cur.fetchall()
+        cur.execute(
+            """
+            SELECT student_id, id, amount_cents - applied_cents
+            FROM fee_payments
+            WHERE institution_name = ? AND term = ? AND applied_cents < amount_cents
+            ORDER BY student_id, paid_at, id
+            """,
+            (institution_name, term),
+        )
+        payments = cur.fetchall()
+        allocations = allocate(fees, payments)
+
+        cur.executemany(
+            """
+            INSERT INTO fee_allocations (fee_payment_id, fee_id, amount_cents) VALUES (?, ?, ?)
+            ON CONFLICT (fee_payment_id, fee_id) DO UPDATE SET amount_cents = amount_cents + excluded.amount_cents
+            """,
+            allocations,
+        )
+        cur.executemany(
+            "UPDATE student_fees SET paid_cents = paid_cents + ? WHERE id = ?",
+            [(cents, fee_id) for _, fee_id, cents in allocations],
+        )
+        cur.executemany(
+            "UPDATE fee_payments SET applied_cents = applied_cents + ? WHERE id = ?",
+            [(cents, payment_id) for payment_id, _, cents in allocations],
+        )
+
+        # Materialized balances: one set-based rebuild of the term.
+        cur.execute(
+            "DELETE FROM fee_balances WHERE institution_name = ? AND term = ?",
+            (institution_name, term),
+        )
+        cur.execute(
+            """
+            INSERT INTO fee_balances
+                (institution_name, student_id, term, billed_cents, paid_cents, balance_cents, last_payment_date)
+            SELECT ?, student_id, ?, SUM(billed), SUM(paid), SUM(billed) - SUM(paid), MAX(paid_at)
+            FROM (
+                SELECT student_id, amount_cents AS billed, 0 AS paid, NULL AS paid_at
+                FROM student_fees WHERE institution_name = ? AND term = ?
+                UNION ALL
+                SELECT student_id, 0, amount_cents, paid_at
+                FROM fee_payments WHERE institution_name = ? AND term = ?
+            )
+            GROUP BY student_id
+            """,
+            (institution_name, term, institution_name, term, institution_name, term),
+        )
+        students = cur.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return {
+        "imported": imported,
+        "allocations": len(allocations),
+        "allocated_cents": sum(cents for _, _, cents in allocations),
+        "students": students,
+    }
+
+
+def list_fee_terms(institution_name: str):
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT DISTINCT term FROM student_fees WHERE institution_name = ?
+        UNION
+        SELECT DISTINCT term FROM fee_payments WHERE institution_name = ?
+        ORDER BY term DESC
+        """,
+        (institution_name, institution_name),
+    )
+    rows = [r[0] for r in cur.fetchall()]
+    conn.close()
+    return rows
+
+
+def fee_term_totals(institution_name: str, term: str):
+    """(students, billed_cents, paid_cents, outstanding_cents, updated_at) from fee_balances."""
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT COUNT(*), COALESCE(SUM(billed_cents), 0), COALESCE(SUM(paid_cents), 0),
+               COALESCE(SUM(MAX(balance_cents, 0)), 0), MAX(updated_at)
+        FROM fee_balances
+        WHERE institution_name = ? AND term = ?
+        """,
+        (institution_name, term),
+    )
+    row = cur.fetchone()
+    conn.close()
+    return row
+
+
+def student_fee_summaries(institution_name: str, student_ids):
+    """{student_id: (balance_cents, last_payment_date)} over all terms, from fee_balances."""
+    if not student_ids:
+        return {}
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT student_id, SUM(balance_cents), MAX(last_payment_date)
+        FROM fee_balances
+        WHERE institution_name = ? AND student_id IN (SELECT value FROM json_each(?))
+        GROUP BY student_id
+        """,
+        (institution_name, json.dumps([int(i) for i in student_ids])),
+    )
+    rows = {r[0]: (r[1], r[2]) for r in cur.fetchall()}
+    conn.close()
+    return rows
+
+
+# ---------- Teacher debt helpers ----------
+#
+# teacher_debt_aging holds, per department and day incurred, the amount
+# still outstanding. Every debt and settlement adjusts it in the same
+# transaction, so the aging report reads a few rows per department and
+# never scans the debts themselves; buckets are assigned from the day
+# at read time, so debts age without any rewrite.
+
+DEBT_AGING_BUCKETS = ("0–30 days", "31–60 days", "61–90 days", "90+ days")
+
+
+def _adjust_debt_aging(cur, institution_name, department, incurred_on, cents, open_delta):
+    cur.execute(
+        """
+        INSERT INTO teacher_debt_aging (institution_name, department, incurred_on, outstanding_cents, open_debts)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (institution_name, department, incurred_on) DO UPDATE SET
+            outstanding_cents = outstanding_cents + excluded.outstanding_cents,
+            open_debts = open_debts + excluded.open_debts
+        """,
+        (institution_name, department, incurred_on, cents, open_delta),
+    )
+    cur.execute(
+        """
+        DELETE FROM teacher_debt_aging
+        WHERE institution_name = ? AND department = ? AND incurred_on = ? AND open_debts = 0
+        """,
+        (institution_name, department, incurred_on),
+    )
+
+
+def add_teacher_debt(institution_name, teacher_id, amount_cents, reason, incurred_on) -> int:
+    """Post a debt for a teacher of this institution; returns the debt id."""
+    if int(amount_cents) <= 0:
+        raise ValueError("Debt amount must be greater than zero.")
+    conn = _get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute(
+            """
+            SELECT COALESCE(NULLIF(student_id, ''), ?)
+            FROM users
+            WHERE id = ? AND institution_name = ? AND role = 'Teacher'
+            """,
+            (NO_DEPARTMENT, int(teacher_id), institution_name),
+        )
+        row = cur.fetchone()
+        if row is None:
+            raise ValueError(f"No teacher with ID {teacher_id} in {institution_name}.")
+        department = row[0]
+        cur.execute(
+            """
+            INSERT INTO teacher_debts
+                (institution_name, teacher_id, department, amount_cents, outstanding_cents, reason, incurred_on)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (institution_name, int(teacher_id), department, int(amount_cents), int(amount_cents), reason, incurred_on),
+        )
+        debt_id = cur.lastrowid
+        _adjust_debt_aging(cur, institution_name, department, incurred_on, int(amount_cents), 1)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return debt_id
+
+
+def settle_teacher_debt(institution_name, debt_id, amount_cents, reference="") -> int:
+    """Record a (partial) settlement; returns the amount still outstanding."""
+    amount_cents = int(amount_cents)
+    if amount_cents <= 0:
+        raise ValueError("Settlement amount must be greater than zero.")
+    conn = _get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute(
+            """
+            SELECT department, incurred_on, outstanding_cents
+            FROM teacher_debts
+            WHERE id = ? AND institution_name = ?
+            """,
+            (int(debt_id), institution_name),
+        )
+        row = cur.fetchone()
+        if row is None:
+            raise ValueError(f"No debt with ID {debt_id} in {institution_name}.")
+        department, incurred_on, outstanding = row
+        if amount_cents > outstanding:
+            raise ValueError(f"Only {outstanding / 100:,.2f} is outstanding on debt {debt_id}.")
+        cur.execute(
+            "INSERT INTO teacher_debt_settlements (debt_id, amount_cents, reference) VALUES (?, ?, ?)",
+            (int(debt_id), amount_cents, reference),
+        )
+        cur.execute(
+            "UPDATE teacher_debts SET outstanding_cents = outstanding_cents - ? WHERE id = ?",
+            (amount_cents, int(debt_id)),
+        )
+        remaining = outstanding - amount_cents
+        _adjust_debt_aging(
+            cur, institution_name, department, incurred_on, -amount_cents, -1 if remaining == 0 else 0
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return remaining
+
+
+def debt_aging_report(institution_name: str):
+    """
+    [(department, bucket0_cents, bucket1_cents, bucket2_cents, bucket3_cents,
+    total_cents, open_debts)] from teacher_debt_aging; buckets as in
+    DEBT_AGING_BUCKETS.
+    """
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        WITH aged AS (
+            SELECT department, outstanding_cents, open_debts,
+                   CAST(julianday('now', 'localtime', 'start of day') - julianday(incurred_on) AS INTEGER) AS age
+            FROM teacher_debt_aging
+            WHERE institution_name = ?
+        )
+        SELECT department,
+               SUM(CASE WHEN age <= 30 THEN outstanding_cents ELSE 0 END),
+               SUM(CASE WHEN age BETWEEN 31 AND 60 THEN outstanding_cents ELSE 0 END),
+               SUM(CASE WHEN age BETWEEN 61 AND 90 THEN outstanding_cents ELSE 0 END),
+               SUM(CASE WHEN age > 90 THEN outstanding_cents ELSE 0 END),
+               SUM(outstanding_cents),
+               SUM(open_debts)
+        FROM aged
+        GROUP BY department
+        ORDER BY department
+        """,
+        (institution_name,),
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def list_teacher_debts(institution_name: str, teacher_id=None, open_only: bool = True, limit: int = 50):
+    """[(id, teacher_id, full_name, department, amount_cents, outstanding_cents, reason, incurred_on)]."""
+    where = ["d.institution_name = ?"]
+    params = [institution_name]
+    if teacher_id is not None:
+        where.append("d.teacher_id = ?")
+        params.append(int(teacher_id))
+    if open_only:
+        where.append("d.outstanding_cents > 0")
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        f"""
+        SELECT d.id, d.teacher_id, u.full_name, d.department, d.amount_cents,
+               d.outstanding_cents, d.reason, d.incurred_on
+        FROM teacher_debts d
+        JOIN users u ON u.id = d.teacher_id
+        WHERE {' AND '.join(where)}
+        ORDER BY d.incurred_on, d.id
+        LIMIT ?
+        """,
+        params + [limit],
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def teacher_debt_summaries(institution_name: str, teacher_ids):
+    """{teacher_id: outstanding_cents} for the given teachers."""
+    if not teacher_ids:
+        return {}
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT teacher_id, SUM(outstanding_cents)
+        FROM teacher_debts
+        WHERE institution_name = ? AND teacher_id IN (SELECT value FROM json_each(?))
+          AND outstanding_cents > 0
+        GROUP BY teacher_id
+        """,
+        (institution_name, json.dumps([int(i) for i in teacher_ids])),
+    )
+    rows = dict(cur.fetchall())
+    conn.close()
+    return rows
+
+
+# ---------- Attendance helpers ----------
+
+# Class labels are matched like CheckInDesk.check_in does: trimmed and
+# case-insensitive ("cs101 " is CS101).
+_SAME_CLASS = "lower(trim(student_id)) = lower(trim(?))"
+
+
+def _class_label(cur, institution_name, class_name) -> str:
+    """
+    The course code as in course_seats, else the class label as the
+    students have it, so one class keeps one roster.
+    """
+    cur.execute(
+        "SELECT code FROM course_seats WHERE institution_name = ? AND lower(code) = lower(trim(?))",
+        (institution_name, class_name),
+    )
+    row = cur.fetchone()
+    if row:
+        return row[0]
+    cur.execute(
+        f"""
+        SELECT student_id FROM users
+        WHERE institution_name = ? AND role = 'Student' AND {_SAME_CLASS}
+        GROUP BY student_id ORDER BY COUNT(*) DESC LIMIT 1
+        """,
+        (institution_name, class_name),
+    )
+    row = cur.fetchone()
+    return row[0].strip() if row else class_name.strip()
+
+
+def create_attendance_session(institution_name, class_name, lecturer_id, opens_at: int, expires_at: int):
+    """Returns (session_id, class label stored for the session)."""
+    conn = _get_connection()
+    cur = conn.cursor()
+    class_name = _class_label(cur, institution_name, class_name)
+    cur.execute(
+        """
+        INSERT INTO attendance_sessions (institution_name, class_name, lecturer_id, opens_at, expires_at)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        (institution_name, class_name, int(lecturer_id), int(opens_at), int(expires_at)),
+    )
+    session_id = cur.lastrowid
+    # Every session gets a bitset, so absent students count even if nobody checks in.
+    _set_attendance_bits(cur, session_id, ())
+    conn.commit()
+    conn.close()
+    return session_id, class_name
+
+
+def _sync_course_roster(cur, institution_name, course) -> int:
+    """
+    Append the course's students missing from the roster (positions never
+    change); returns roster size. A course with seats (see course_seats)
+    takes its enrolled students, anything else is a class label and takes
+    the class's students.
+    """
+    cur.execute(
+        "SELECT 1 FROM course_seats WHERE institution_name = ? AND code = ?",
+        (institution_name, course),
+    )
+    if cur.fetchone():
+        members = """
+            SELECT student_id AS id FROM course_enrollments
+            WHERE institution_name = ? AND code = ? AND status = 'enrolled'
+        """
+    else:
+        members = f"""
+            SELECT id FROM users
+            WHERE institution_name = ? AND role = 'Student' AND {_SAME_CLASS}
+        """
+    cur.execute(
+        f"""
+        INSERT INTO course_roster (institution_name, course, student_id, position)
+        SELECT ?, ?, m.id,
+               (SELECT COALESCE(MAX(position), -1) FROM course_roster
+                WHERE institution_name = ? AND course = ?) + ROW_NUMBER() OVER (ORDER BY m.id)
+        FROM ({members}) m
+        WHERE NOT EXISTS (
+            SELECT 1 FROM course_roster r
+            WHERE r.institution_name = ? AND r.course = ? AND r.student_id = m.id
+        )
+        """,
+        (institution_name, course, institution_name, course, institution_name, course, institution_name, course),
+    )
+    cur.execute(
+        "SELECT COUNT(*) FROM course_roster WHERE institution_name = ? AND course = ?",
+        (institution_name, course),
+    )
+    return cur.fetchone()[0]
+
+
+def _set_attendance_bits(cur, session_id, student_ids):
+    cur.execute(
+        "SELECT institution_name, class_name FROM attendance_sessions WHERE id = ?",
+        (session_id,),
+    )
+    institution_name, course = cur.fetchone()
+    roster_size = _sync_course_roster(cur, institution_name, course)
+    cur.execute(
+        """
+        SELECT position FROM course_roster
+        WHERE institution_name = ? AND course = ? AND student_id IN (SELECT value FROM json_each(?))
+        """,
+        (institution_name, course, json.dumps(sorted(student_ids))),
+    )
+    positions = [r[0] for r in cur.fetchall()]
+    cur.execute("SELECT bits FROM attendance_bitsets WHERE session_id = ?", (session_id,))
+    row = cur.fetchone()
+    bits = bytearray((roster_size + 7) // 8)
+    if row:
+        bits[: len(row[0])] = row[0]
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    cur.execute(
+        """
+        INSERT INTO attendance_bitsets (session_id, institution_name, course, roster_size, present, bits)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (session_id) DO UPDATE SET
+            roster_size = excluded.roster_size, present = excluded.present, bits = excluded.bits
+        """,
+        (session_id, institution_name, course, roster_size, int.from_bytes(bits, "little").bit_count(), bytes(bits)),
+    )
+
+
+def insert_attendance_checkins(rows):
+    """
+    Batch insert of (session_id, student_id, checked_in_at); duplicates are
+    ignored. The sessions' attendance bitsets are updated in the same
+    transaction.
+    """
+    by_session = {}
+    for session_id, student_id, _ in rows:
+        by_session.setdefault(session_id, set()).add(int(student_id))
+    conn = _get_connection()
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO attendance_checkins (session_id, student_id, checked_in_at) VALUES (?, ?, ?)",
+                rows,
+            )
+            cur = conn.cursor()
+            for session_id, student_ids in by_session.items():
+                _set_attendance_bits(cur, session_id, student_ids)
+    finally:
+        conn.close()
+
+
+def list_attendance_bitsets(institution_name: str):
+    """[(course, session_id, roster_size, bits)] of an institution, by course and session."""
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT course, session_id, roster_size, bits
+        FROM attendance_bitsets
+        WHERE institution_name = ?
+        ORDER BY course, session_id
+        """,
+        (institution_name,),
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def list_course_rosters(institution_name: str):
+    """[(course, position, student_id, full_name)] of an institution, by course and position."""
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT r.course, r.position, r.student_id, u.full_name
+        FROM course_roster r
+        JOIN users u ON u.id = r.student_id
+        WHERE r.institution_name = ?
+        ORDER BY r.course, r.position
+        """,
+        (institution_name,),
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def list_lecturer_sessions(lecturer_id: int, limit: int = 10):
+    """[(id, class_name, opens_at, expires_at, checked_in)], newest first."""
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT s.id, s.class_name, s.opens_at, s.expires_at,
+               (SELECT COUNT(*) FROM attendance_checkins c WHERE c.session_id = s.id)
+        FROM attendance_sessions s
+        WHERE s.lecturer_id = ?
+        ORDER BY s.id DESC
+        LIMIT ?
+        """,
+        (int(lecturer_id), limit),
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+# ---------- Timetable helpers ----------
+
+TIMETABLE_DEFAULTS = {
+    "days": ["Mon", "Tue", "Wed", "Thu", "Fri"],
+    "periods": 8,
+    "first_period": "08:00",
+    "period_minutes": 60,
+}
+
+
+def get_timetable_settings(institution_name: str):
+    """Week shape of the institution's timetable plus the last solve's clash counts."""
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT days, periods, first_period, period_minutes, solved_at, clashes, same_day
+        FROM timetable_settings WHERE institution_name = ?
+        """,
+        (institution_name,),
+    )
+    row = cur.fetchone()
+    conn.close()
+    if row is None:
+        return dict(TIMETABLE_DEFAULTS, solved_at=None, clashes=None, same_day=None)
+    days, periods, first_period, period_minutes, solved_at, clashes, same_day = row
+    return {
+        "days": json.loads(days),
+        "periods": periods,
+        "first_period": first_period,
+        "period_minutes": period_minutes,
+        "solved_at": solved_at,
+        "clashes": clashes,
+        "same_day": same_day,
+    }
+
+
+def save_timetable_setup(institution_name: str, settings, rooms, courses):
+    """
+    Replace the solver input: settings {"days", "periods", "first_period",
+    "period_minutes"}, rooms [(name, capacity)] and courses [{"code",
+    "title", "lecturer", "class_name", "students", "sessions"}]. Saved
+    sessions keep their day and period when the week changes shape; those
+    of removed courses, removed sessions, removed days or periods and
+    removed rooms are dropped. The rest stay as a warm start for the next
+    solve. Returns the number of locked sessions dropped.
+    """
+    days = list(settings["days"])
+    periods = int(settings["periods"])
+    conn = _get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute("SELECT days, periods FROM timetable_settings WHERE institution_name = ?", (institution_name,))
+        row = cur.fetchone()
+        if row:
+            old_days, old_periods = json.loads(row[0]), row[1]
+        else:
+            old_days, old_periods = TIMETABLE_DEFAULTS["days"], TIMETABLE_DEFAULTS["periods"]
+        if (old_days, old_periods) != (days, periods):
+            # slot = day * periods + period: re-number by (day name, period);
+            # -1 marks sessions whose day or period is gone.
+            cur.execute(
+                "SELECT course_code, session, slot FROM timetable_entries WHERE institution_name = ?",
+                (institution_name,),
+            )
+            moves = []
+            for code, session, slot in cur.fetchall():
+                d, period = divmod(slot, old_periods)
+                day = old_days[d] if d < len(old_days) else None
+                new_slot = days.index(day) * periods + period if day in days and period < periods else -1
+                if new_slot != slot:
+                    moves.append((new_slot, institution_name, code, session))
+            cur.executemany(
+                "UPDATE timetable_entries SET slot = ? WHERE institution_name = ? AND course_code = ? AND session = ?",
+                moves,
+            )
+        cur.execute(
+            """
+            INSERT INTO timetable_settings (institution_name, days, periods, first_period, period_minutes)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (institution_name) DO UPDATE SET
+                days = excluded.days, periods = excluded.periods,
+                first_period = excluded.first_period, period_minutes = excluded.period_minutes
+            """,
+            (
+                institution_name,
+                json.dumps(list(settings["days"])),
+                int(settings["periods"]),
+                settings["first_period"],
+                int(settings["period_minutes"]),
+            ),
+        )
+        cur.execute("DELETE FROM timetable_rooms WHERE institution_name = ?", (institution_name,))
+        cur.executemany(
+            "INSERT INTO timetable_rooms (institution_name, name, capacity) VALUES (?, ?, ?)",
+            [(institution_name, name, int(capacity)) for name, capacity in rooms],
+        )
+        cur.execute("DELETE FROM timetable_courses WHERE institution_name = ?", (institution_name,))
+        cur.executemany(
+            """
+            INSERT INTO timetable_courses
+                (institution_name, code, title, lecturer, class_name, students, sessions)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (
+                    institution_name,
+                    c["code"],
+                    c.get("title") or "",
+                    c.get("lecturer") or "",
+                    c.get("class_name") or "",
+                    int(c.get("students") or 0),
+                    int(c.get("sessions") or 1),
+                )
+                for c in courses
+            ],
+        )
+        cur.execute(
+            """
+            DELETE FROM timetable_entries
+            WHERE institution_name = ?
+              AND (slot < 0
+                   OR room NOT IN (SELECT name FROM timetable_rooms WHERE institution_name = ?)
+                   OR NOT EXISTS (
+                       SELECT 1 FROM timetable_courses c
+                       WHERE c.institution_name = timetable_entries.institution_name
+                         AND c.code = timetable_entries.course_code
+                         AND c.sessions > timetable_entries.session
+                   ))
+            RETURNING locked
+            """,
+            (institution_name, institution_name),
+        )
+        locked_dropped = sum(1 for (locked,) in cur.fetchall() if locked)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return locked_dropped
+
+
+def list_timetable_rooms(institution_name: str):
+    """[(name, capacity)] by name."""
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT name, capacity FROM timetable_rooms WHERE institution_name = ? ORDER BY name",
+        (institution_name,),
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def list_timetable_courses(institution_name: str):
+    """[{"code", "title", "lecturer", "class_name", "students", "sessions"}] by code."""
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT code, title, lecturer, class_name, students, sessions
+        FROM timetable_courses WHERE institution_name = ? ORDER BY code
+        """,
+        (institution_name,),
+    )
+    keys = ("code", "title", "lecturer", "class_name", "students", "sessions")
+    rows = [dict(zip(keys, row)) for row in cur.fetchall()]
+    conn.close()
+    return rows
+
+
+def list_timetable_entries(institution_name: str):
+    """[(course_code, session, slot, room, locked)] by slot and room."""
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT course_code, session, slot, room, locked
+        FROM timetable_entries WHERE institution_name = ?
+        ORDER BY slot, room
+        """,
+        (institution_name,),
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def save_timetable_entries(institution_name: str, entries, clashes: int, same_day: int):
+    """Replace the saved timetable with [(course_code, session, slot, room, locked)]."""
+    conn = _get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute("DELETE FROM timetable_entries WHERE institution_name = ?", (institution_name,))
+        cur.executemany(
+            """
+            INSERT INTO timetable_entries (institution_name, course_code, session, slot, room, locked)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (institution_name, code, int(k), int(slot), room, int(bool(locked)))
+                for code, k, slot, room, locked in entries
+            ],
+        )
+        cur.execute(
+            """
+            UPDATE timetable_settings
+            SET solved_at = CURRENT_TIMESTAMP, clashes = ?, same_day = ?
+            WHERE institution_name = ?
+            """,
+            (int(clashes), int(same_day), institution_name),
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+# ---------- Academic calendar helpers ----------
+
+def add_calendar_entry(institution_name, title, kind, starts_on, ends_on) -> int:
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        INSERT INTO academic_calendar (institution_name, title, kind, starts_on, ends_on)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        (institution_name, title, kind, starts_on, ends_on),
+    )
+    entry_id = cur.lastrowid
+    conn.commit()
+    conn.close()
+    return entry_id
+
+
+def delete_calendar_entry(institution_name, entry_id) -> bool:
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        "DELETE FROM academic_calendar WHERE institution_name = ? AND id = ?",
+        (institution_name, int(entry_id)),
+    )
+    deleted = cur.rowcount > 0
+    conn.commit()
+    conn.close()
+    return deleted
+
+
+def list_calendar_entries(institution_name: str):
+    """[(id, title, kind, starts_on, ends_on)] by start date."""
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT id, title, kind, starts_on, ends_on
+        FROM academic_calendar WHERE institution_name = ?
+        ORDER BY starts_on, id
+        """,
+        (institution_name,),
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+# ---------- Hostel helpers ----------
+
+def upsert_hostel_rooms(institution_name: str, rows) -> int:
+    """Add or update rooms [(hostel, floor, room, room_type, beds, accessible)]; returns rows written."""
+    conn = _get_connection()
+    try:
+        with conn:
+            conn.executemany(
+                """
+                INSERT INTO hostel_rooms (institution_name, hostel, floor, room, room_type, beds, accessible)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (institution_name, hostel, room) DO UPDATE SET
+                    floor = excluded.floor, room_type = excluded.room_type,
+                    beds = excluded.beds, accessible = excluded.accessible
+                """,
+                [
+                    (institution_name, hostel, int(floor), room, room_type, int(beds), int(bool(accessible)))
+                    for hostel, floor, room, room_type, beds, accessible in rows
+                ],
+            )
+    finally:
+        conn.close()
+    return len(rows)
+
+
+def list_hostel_rooms(institution_name: str):
+    """[(id, hostel, floor, room, room_type, beds, accessible)] by hostel, floor and room."""
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT id, hostel, floor, room, room_type, beds, accessible
+        FROM hostel_rooms WHERE institution_name = ?
+        ORDER BY hostel, floor, room
+        """,
+        (institution_name,),
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+# Tier of an application whose priority claim is not confirmed (hostels.TIER_RETURNING).
+_UNCONFIRMED_TIER = 2
+
+
+def upsert_hostel_applications(institution_name: str, term: str, rows, confirmed: bool = True) -> int:
+    """
+    Add or update applications [(student_id, preferences, tier, accessible,
+    accept_any)]. Students who already have a bed this term are left alone;
+    returns the number of applications written.
+
+    confirmed=False is a student's own application: tier and accessibility
+    are recorded as requests only (see confirm_hostel_priority) and a new
+    application starts in the returning tier without accessibility.
+    confirmed=True (the hostel office's or registry's import) sets both.
+    """
+    if confirmed:
+        values = "?, ?, ?, ?"
+        on_conflict = "tier = excluded.tier, accessible = excluded.accessible,"
+    else:
+        values = f"{_UNCONFIRMED_TIER}, 0, ?, ?"
+        on_conflict = ""
+    params = []
+    for student_id, preferences, tier, accessible, accept_any in rows:
+        claim = (int(tier), int(bool(accessible)))
+        params.append(
+            (institution_name, term, int(student_id), json.dumps([list(p) for p in preferences]), int(bool(accept_any)))
+            + (claim + claim if confirmed else claim)
+        )
+    conn = _get_connection()
+    try:
+        with conn:
+            cur = conn.executemany(
+                f"""
+                INSERT INTO hostel_applications
+                    (institution_name, term, student_id, preferences, accept_any,
+                     tier, accessible, requested_tier, requested_accessible)
+                VALUES (?, ?, ?, ?, ?, {values})
+                ON CONFLICT (institution_name, term, student_id) DO UPDATE SET
+                    preferences = excluded.preferences, accept_any = excluded.accept_any,
+                    {on_conflict}
+                    requested_tier = excluded.requested_tier,
+                    requested_accessible = excluded.requested_accessible,
+                    status = 'pending'
+                WHERE hostel_applications.status != 'allocated'
+                """,
+                params,
+            )
+            written = cur.rowcount
+    finally:
+        conn.close()
+    return written
+
+
+def list_hostel_priority_requests(institution_name: str, term: str):
+    """
+    Applications asking for more than is confirmed, not yet allocated:
+    [(student_id, full_name, requested_tier, requested_accessible, tier, accessible)].
+    """
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT a.student_id, u.full_name, a.requested_tier, a.requested_accessible, a.tier, a.accessible
+        FROM hostel_applications a
+        LEFT JOIN users u ON u.id = a.student_id
+        WHERE a.institution_name = ? AND a.term = ? AND a.status != 'allocated'
+          AND (a.requested_tier < a.tier OR a.requested_accessible > a.accessible)
+        ORDER BY a.requested_tier, a.id
+        """,
+        (institution_name, term),
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def confirm_hostel_priority(institution_name: str, term: str, student_ids) -> int:
+    """Grant the requested tier and accessibility to these students' applications."""
+    conn = _get_connection()
+    try:
+        with conn:
+            cur = conn.execute(
+                """
+                UPDATE hostel_applications
+                SET tier = requested_tier, accessible = requested_accessible
+                WHERE institution_name = ? AND term = ? AND status != 'allocated'
+                  AND student_id IN (SELECT value FROM json_each(?))
+                """,
+                (institution_name, term, json.dumps(sorted({int(i) for i in student_ids}))),
+            )
+            updated = cur.rowcount
+    finally:
+        conn.close()
+    return updated
+
+
+def _hostel_allocation_input(cur, institution_name, term):
+    cur.execute(
+        """
+        SELECT id, hostel, floor, room, room_type, beds, accessible
+        FROM hostel_rooms WHERE institution_name = ?
+        ORDER BY hostel, floor, room
+        """,
+        (institution_name,),
+    )
+    rooms = cur.fetchall()
+    cur.execute(
+        "SELECT room_id, bed FROM hostel_allocations WHERE institution_name = ? AND term = ?",
+        (institution_name, term),
+    )
+    taken = cur.fetchall()
+    cur.execute(
+        """
+        SELECT id, student_id, preferences, accessible, accept_any
+        FROM hostel_applications
+        WHERE institution_name = ? AND term = ? AND status IN ('pending', 'waitlisted')
+        ORDER BY tier, id
+        """,
+        (institution_name, term),
+    )
+    queue = [
+        (app_id, student_id, json.loads(preferences), bool(accessible), bool(accept_any))
+        for app_id, student_id, preferences, accessible, accept_any in cur.fetchall()
+    ]
+    return rooms, taken, queue
+
+
+def load_hostel_allocation_input(institution_name: str, term: str):
+    """
+    (rooms [(id, hostel, floor, room, room_type, beds, accessible)], taken
+    [(room_id, bed)], queue [(application_id, student_id, preferences,
+    accessible, accept_any)]); the queue holds pending and waitlisted
+    applications by tier, then application order.
+    """
+    conn = _get_connection()
+    try:
+        return _hostel_allocation_input(conn.cursor(), institution_name, term)
+    finally:
+        conn.close()
+
+
+def allocate_hostel_beds(institution_name: str, term: str, allocate):
+    """
+    One allocation run in one write transaction: load the input as
+    load_hostel_allocation_input does, call allocate(rooms, taken, queue)
+    -> (allocations [(application_id, student_id, room_id, bed)],
+    waitlisted [application_id]), insert the allocations and update the
+    applications. The write lock is held from the read to the save, so an
+    overlapping run waits and then sees this run's beds as taken.
+    Returns (applications, allocations, waitlisted).
+    """
+    conn = _get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        rooms, taken, queue = _hostel_allocation_input(cur, institution_name, term)
+        allocations, waitlisted = allocate(rooms, taken, queue)
+        cur.executemany(
+            """
+            INSERT INTO hostel_allocations (institution_name, term, room_id, bed, student_id, application_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (institution_name, term, room_id, bed, student_id, app_id)
+                for app_id, student_id, room_id, bed in allocations
+            ],
+        )
+        cur.executemany(
+            "UPDATE hostel_applications SET status = 'allocated' WHERE id = ?",
+            [(app_id,) for app_id, _, _, _ in allocations],
+        )
+        cur.executemany(
+            "UPDATE hostel_applications SET status = 'waitlisted' WHERE id = ?",
+            [(app_id,) for app_id in waitlisted],
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return len(queue), allocations, waitlisted
+
+
+def release_hostel_bed(institution_name: str, term: str, student_id: int) -> bool:
+    """Free a student's bed; their application goes back to pending."""
+    conn = _get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute(
+            """
+            DELETE FROM hostel_allocations
+            WHERE institution_name = ? AND term = ? AND student_id = ?
+            RETURNING application_id
+            """,
+            (institution_name, term, int(student_id)),
+        )
+        row = cur.fetchone()
+        if row:
+            cur.execute("UPDATE hostel_applications SET status = 'pending' WHERE id = ?", (row[0],))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return row is not None
+
+
+def get_hostel_application(institution_name: str, term: str, student_id: int):
+    """A student's application this term with their bed, or None."""
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT a.status, a.preferences, a.tier, a.accessible, a.accept_any,
+               r.hostel, r.floor, r.room, r.room_type, h.bed, a.requested_tier, a.requested_accessible
+        FROM hostel_applications a
+        LEFT JOIN hostel_allocations h ON h.application_id = a.id
+        LEFT JOIN hostel_rooms r ON r.id = h.room_id
+        WHERE a.institution_name = ? AND a.term = ? AND a.student_id = ?
+        """,
+        (institution_name, term, int(student_id)),
+    )
+    row = cur.fetchone()
+    conn.close()
+    if row is None:
+        return None
+    keys = (
+        "status", "preferences", "tier", "accessible", "accept_any",
+        "hostel", "floor", "room", "room_type", "bed", "requested_tier", "requested_accessible",
+    )
+    application = dict(zip(keys, row))
+    application["preferences"] = json.loads(application["preferences"])
+    return application
+
+
+def hostel_occupancy(institution_name: str, term: str):
+    """[(hostel, room_type, rooms, beds, occupied)] by hostel and room type."""
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT r.hostel, r.room_type, COUNT(*), SUM(r.beds), COALESCE(SUM(o.occupied), 0)
+        FROM hostel_rooms r
+        LEFT JOIN (
+            SELECT room_id, COUNT(*) AS occupied FROM hostel_allocations
+            WHERE institution_name = ? AND term = ?
+            GROUP BY room_id
+        ) o ON o.room_id = r.id
+        WHERE r.institution_name = ?
+        GROUP BY r.hostel, r.room_type
+        ORDER BY r.hostel, r.room_type
+        """,
+        (institution_name, term, institution_name),
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def hostel_application_counts(institution_name: str, term: str):
+    """[(tier, status, applications)]"""
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT tier, status, COUNT(*) FROM hostel_applications
+        WHERE institution_name = ? AND term = ?
+        GROUP BY tier, status ORDER BY tier, status
+        """,
+        (institution_name, term),
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def list_hostel_allocations(institution_name: str, term: str, limit: int = 200):
+    """[(student_id, full_name, hostel, floor, room, room_type, bed, allocated_at)], newest first."""
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT h.student_id, u.full_name, r.hostel, r.floor, r.room, r.room_type, h.bed, h.allocated_at
+        FROM hostel_allocations h
+        JOIN hostel_rooms r ON r.id = h.room_id
+        LEFT JOIN users u ON u.id = h.student_id
+        WHERE h.institution_name = ? AND h.term = ?
+        ORDER BY h.allocated_at DESC, r.hostel, r.room, h.bed
+        LIMIT ?
+        """,
+        (institution_name, term, int(limit)),
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+# ---------- Enrollment helpers ----------
+
+ENROLLED = "enrolled"
+WAITLISTED = "waitlisted"
+DROPPED = "dropped"
+
+
+class VersionConflict(Exception):
+    """The course's seats changed between read and write; read again and retry."""
+
+
+def _promote_waitlisted(cur, institution_name, code, seats) -> list:
+    """Move up to `seats` waitlisted students into seats; returns their ids."""
+    if seats <= 0:
+        return []
+    cur.execute(
+        """
+        UPDATE course_enrollments
+        SET status = 'enrolled', waitlist_seq = NULL, updated_at = CURRENT_TIMESTAMP
+        WHERE institution_name = ? AND code = ? AND student_id IN (
+            SELECT student_id FROM course_enrollments
+            WHERE institution_name = ? AND code = ? AND status = 'waitlisted'
+            ORDER BY waitlist_seq
+            LIMIT ?
+        )
+        RETURNING student_id
+        """,
+        (institution_name, code, institution_name, code, int(seats)),
+    )
+    promoted = [r[0] for r in cur.fetchall()]
+    if promoted:
+        cur.execute(
+            """
+            UPDATE course_seats
+            SET enrolled = enrolled + ?, waitlisted = waitlisted - ?, version = version + 1
+            WHERE institution_name = ? AND code = ?
+            """,
+            (len(promoted), len(promoted), institution_name, code),
+        )
+    return promoted
+
+
+def upsert_course_seats(institution_name: str, rows):
+    """
+    Add courses or change their capacity, [(code, title, lecturer,
+    capacity)]. Capacity never drops below the students already enrolled;
+    extra seats go to the waitlist. Returns {code: [promoted student ids]}.
+    """
+    conn = _get_connection()
+    cur = conn.cursor()
+    promoted = {}
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        for code, title, lecturer, capacity in rows:
+            cur.execute(
+                """
+                INSERT INTO course_seats (institution_name, code, title, lecturer, capacity)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (institution_name, code) DO UPDATE SET
+                    title = excluded.title, lecturer = excluded.lecturer,
+                    capacity = MAX(excluded.capacity, course_seats.enrolled),
+                    version = course_seats.version + 1
+                RETURNING capacity - enrolled
+                """,
+                (institution_name, code, title or "", lecturer or "", max(int(capacity), 0)),
+            )
+            free = cur.fetchone()[0]
+            moved = _promote_waitlisted(cur, institution_name, code, free)
+            if moved:
+                promoted[code] = moved
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return promoted
+
+
+def read_course_seats(institution_name: str, codes):
+    """{code: [capacity, enrolled, waitlisted, version]} for the courses that exist."""
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT code, capacity, enrolled, waitlisted, version FROM course_seats
+        WHERE institution_name = ? AND code IN (SELECT value FROM json_each(?))
+        """,
+        (institution_name, json.dumps(sorted(set(codes)))),
+    )
+    seats = {code: [capacity, enrolled, waitlisted, version] for code, capacity, enrolled, waitlisted, version in cur}
+    conn.close()
+    return seats
+
+
+def get_enrollment_request(institution_name: str, request_key: str):
+    """(code, student_id, status) recorded for a request key, or None."""
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT code, student_id, status FROM enrollment_requests WHERE institution_name = ? AND request_key = ?",
+        (institution_name, request_key),
+    )
+    row = cur.fetchone()
+    conn.close()
+    return row
+
+
+def _apply_enrollment(cur, institution_name, code, student_id, request_key, seats) -> str:
+    """
+    Enroll or waitlist one student against a `seats` snapshot [capacity,
+    enrolled, waitlisted, version], which is updated in place. The seat
+    counter only changes if the course is still at the snapshot's version;
+    VersionConflict otherwise.
+    """
+    cur.execute(
+        "SELECT status FROM enrollment_requests WHERE institution_name = ? AND request_key = ?",
+        (institution_name, request_key),
+    )
+    row = cur.fetchone()
+    if row:
+        return row[0]
+    cur.execute(
+        "SELECT status FROM course_enrollments WHERE institution_name = ? AND code = ? AND student_id = ?",
+        (institution_name, code, student_id),
+    )
+    row = cur.fetchone()
+    if row and row[0] != DROPPED:
+        # Already enrolled or waitlisted: keep the place.
+        status = row[0]
+    else:
+        capacity, enrolled, _, version = seats
+        status = ENROLLED if enrolled < capacity else WAITLISTED
+        counter = "enrolled" if status == ENROLLED else "waitlisted"
+        cur.execute(
+            f"""
+            UPDATE course_seats SET {counter} = {counter} + 1, version = version + 1
+            WHERE institution_name = ? AND code = ? AND version = ?
+            """,
+            (institution_name, code, version),
+        )
+        if cur.rowcount == 0:
+            raise VersionConflict(code)
+        seats[1 if status == ENROLLED else 2] += 1
+        seats[3] += 1
+        # The course version this change created orders the waitlist.
+        cur.execute(
+            """
+            INSERT INTO course_enrollments (institution_name, code, student_id, status, waitlist_seq)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (institution_name, code, student_id) DO UPDATE SET
+                status = excluded.status, waitlist_seq = excluded.waitlist_seq,
+                updated_at = CURRENT_TIMESTAMP
+            """,
+            (institution_name, code, student_id, status, seats[3] if status == WAITLISTED else None),
+        )
+    cur.execute(
+        """
+        INSERT INTO enrollment_requests (institution_name, request_key, code, student_id, status)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        (institution_name, request_key, code, student_id, status),
+    )
+    return status
+
+
+def apply_enrollments(institution_name: str, requests, seats):
+    """
+    Apply [(code, student_id, request_key)] in order in one transaction
+    (one commit for the whole batch) against `seats` from
+    read_course_seats(). Returns one status per request, None where the
+    course changed since `seats` was read; those requests are rolled back
+    to their savepoint and should be retried with fresh seats.
+    """
+    conn = _get_connection()
+    conn.isolation_level = None
+    cur = conn.cursor()
+    results = []
+    stale = set()
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        for code, student_id, request_key in requests:
+            if code in stale:
+                results.append(None)
+                continue
+            cur.execute("SAVEPOINT enrollment")
+            try:
+                results.append(
+                    _apply_enrollment(cur, institution_name, code, int(student_id), request_key, seats[code])
+                )
+            except VersionConflict:
+                cur.execute("ROLLBACK TO enrollment")
+                stale.add(code)
+                results.append(None)
+            cur.execute("RELEASE enrollment")
+        cur.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            cur.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return results
+
+
+def drop_enrollment(institution_name: str, code: str, student_id: int):
+    """
+    Drop a student from a course or its waitlist. A freed seat goes to the
+    head of the waitlist in the same transaction. Returns (previous status
+    or None, [promoted student ids]).
+    """
+    conn = _get_connection()
+    cur = conn.cursor()
+    promoted = []
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute(
+            "SELECT status FROM course_enrollments WHERE institution_name = ? AND code = ? AND student_id = ?",
+            (institution_name, code, int(student_id)),
+        )
+        row = cur.fetchone()
+        previous = row[0] if row and row[0] != DROPPED else None
+        if previous:
+            cur.execute(
+                """
+                UPDATE course_enrollments
+                SET status = 'dropped', waitlist_seq = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE institution_name = ? AND code = ? AND student_id = ?
+                """,
+                (institution_name, code, int(student_id)),
+            )
+        if previous == ENROLLED:
+            cur.execute(
+                """
+                UPDATE course_seats SET enrolled = enrolled - 1, version = version + 1
+                WHERE institution_name = ? AND code = ?
+                RETURNING capacity - enrolled
+                """,
+                (institution_name, code),
+            )
+            promoted = _promote_waitlisted(cur, institution_name, code, cur.fetchone()[0])
+        elif previous == WAITLISTED:
+            cur.execute(
+                """
+                UPDATE course_seats SET waitlisted = waitlisted - 1, version = version + 1
+                WHERE institution_name = ? AND code = ?
+                """,
+                (institution_name, code),
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return previous, promoted
+
+
+def list_course_seats(institution_name: str, search: str = "", limit: int = 50):
+    """[(code, title, lecturer, capacity, enrolled, waitlisted)] by code."""
+    conn = _get_connection()
+    cur = conn.cursor()
+    like = f"%{search.strip()}%"
+    cur.execute(
+        """
+        SELECT code, title, lecturer, capacity, enrolled, waitlisted
+        FROM course_seats
+        WHERE institution_name = ? AND (code LIKE ? OR title LIKE ?)
+        ORDER BY code
+        LIMIT ?
+        """,
+        (institution_name, like, like, int(limit)),
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def list_lecturer_courses(institution_name: str, lecturer: str):
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT code FROM course_seats
+        WHERE institution_name = ? AND lower(lecturer) = lower(?)
+        ORDER BY code
+        """,
+        (institution_name, lecturer.strip()),
+    )
+    rows = [r[0] for r in cur.fetchall()]
+    conn.close()
+    return rows
+
+
+def list_course_members(institution_name: str, code: str):
+    """Ids of the students enrolled in a course with seats, or None if `code` is no such course."""
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM course_seats WHERE institution_name = ? AND code = ?", (institution_name, code))
+    if cur.fetchone() is None:
+        conn.close()
+        return None
+    cur.execute(
+        """
+        SELECT student_id FROM course_enrollments
+        WHERE institution_name = ? AND code = ? AND status = 'enrolled'
+        """,
+        (institution_name, code),
+    )
+    members = {r[0] for r in cur.fetchall()}
+    conn.close()
+    return members
+
+
+def list_student_enrollments(institution_name: str, student_id: int):
+    """[(code, title, status, waitlist position or None)] excluding dropped courses."""
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT e.code, s.title, e.status,
+               CASE WHEN e.status = 'waitlisted' THEN (
+                   SELECT COUNT(*) FROM course_enrollments w
+                   WHERE w.institution_name = e.institution_name AND w.code = e.code
+                     AND w.status = 'waitlisted' AND w.waitlist_seq <= e.waitlist_seq
+               ) END
+        FROM course_enrollments e
+        JOIN course_seats s ON s.institution_name = e.institution_name AND s.code = e.code
+        WHERE e.institution_name = ? AND e.student_id = ? AND e.status != 'dropped'
+        ORDER BY e.code
+        """,
+        (institution_name, int(student_id)),
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def enrollment_check(institution_name: str):
+    """Courses whose seat counters disagree with their enrollments, or that are overbooked: [(code, ...)]."""
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT s.code, s.capacity, s.enrolled, s.waitlisted,
+               COALESCE(SUM(e.status = 'enrolled'), 0), COALESCE(SUM(e.status = 'waitlisted'), 0)
+        FROM course_seats s
+        LEFT JOIN course_enrollments e ON e.institution_name = s.institution_name AND e.code = s.code
+        WHERE s.institution_name = ?
+        GROUP BY s.code
+        HAVING s.enrolled > s.capacity
+            OR s.enrolled != COALESCE(SUM(e.status = 'enrolled'), 0)
+            OR s.waitlisted != COALESCE(SUM(e.status = 'waitlisted'), 0)
+        """,
+        (institution_name,),
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+# ---------- Institution dashboard queries ----------
+#
+# Departments are the student_id labels of an institution's users
+# ('' -> 'No department'). Every query below is bounded by the
+# institution's own rows via idx_users_institution_role.
+
+NO_DEPARTMENT = "No department"
+
+
+def _department_key(department):
+    return "" if department == NO_DEPARTMENT else department
+
+
+def list_institution_departments(institution_name: str):
+    """[(department, teachers, students)] for one institution, one GROUP BY."""
+    conn = _get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT COALESCE(NULLIF(student_id, ''), ?) AS department,
+               SUM(role = 'Teacher'),
+               SUM(role = 'Student')
+        FROM users
+        WHERE institution_name = ?
+        GROUP BY COALESCE(student_id, '')
+        ORDER BY department
+        """,
+        (NO_DEPARTMENT, institution_name),
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def institution_overview(
+    institution_name: str,
+    department=None,
+    search: str = "",
+    teacher_page: int = 1,
+    student_page: int = 1,
+    page_size: int = 25,
+):
+    """
+    Institution dashboard figures for one department, from indexed queries:
+
+    headcounts   {role: count} for the selected department (all if None)
+    teachers     (rows, total) of (id, full_name, email, role, department)
+    students     (rows, total) of (id, full_name, email, student_id, department)
+    """
+    conn = _get_connection()
+    cur = conn.cursor()
+    dept_sql = ""
+    params = [institution_name]
+    if department is not None:
+        dept_sql = "AND COALESCE(student_id, '') = ?"
+        params.append(_department_key(department))
+    cur.execute(
+        f"""
+        SELECT role, COUNT(*)
+        FROM users
+        WHERE institution_name = ? {dept_sql}
+        GROUP BY role
+        """,
+        params,
+    )
+    headcounts = dict(cur.fetchall())
+    conn.close()
+
+    filters = {"institution_name": institution_name}
+    if department is not None:
+        filters["department_key"] = _department_key(department)
+    teachers = select_page(
+        "institution_users",
+        columns=["id", "full_name", "email", "role", "department"],
+        filters={**filters, "role": "Teacher"},
+        search=search,
+        sort="full_name",
+        page=teacher_page,
+        page_size=page_size,
+    )
+    students = select_page(
+        "institution_users",
+        columns=["id", "full_name", "email", "student_id", "department"],
+        filters={**filters, "role": "Student"},
+        search=search,
+        sort="full_name",
+        page=student_page,
+        page_size=page_size,
+    )
+    return {
+        "headcounts": headcounts,
+        "teachers": teachers,
+        "students": students,
+    }
@@ -0,0 +1,158 @@
+# src/deadlines.py
+"""
+Assignment deadline reminders.
+
+A single process-wide ReminderScheduler keeps the upcoming reminder events in
+a min-heap ordered by fire time. A background thread sleeps until the earliest
+event is due, pops every event that is due by then and fans the batch out with
+one db call (see db.create_assignment_reminders). Page reruns never scan the
+assignments table; creating an assignment only pushes its events on the heap.
+"""
+
+import heapq
+import threading
+from datetime import date, datetime, timedelta
+
+from db import list_upcoming_deadlines, create_assignment_reminders
+
+# Reminders are sent this long before the deadline (end of the due day, UTC).
+REMINDER_OFFSETS = (timedelta(days=2), timedelta(hours=12))
+
+# Events due within this window of each other are fired as one batch.
+BATCH_WINDOW = timedelta(seconds=30)
+
+
+def deadline_of(due_date) -> datetime:
+    """Moment an assignment becomes late: the end of its due day."""
+    if isinstance(due_date, str):
+        due_date = date.fromisoformat(due_date.strip()[:10])
+    return datetime(due_date.year, due_date.month, due_date.day) + timedelta(days=1)
+
+
+class ReminderScheduler:
+    def __init__(self, offsets=REMINDER_OFFSETS, batch_window=BATCH_WINDOW):
+        self.offsets = tuple(offsets)
+        self.batch_window = batch_window
+        self._heap = []        # (fire_at, assignment_id, offset_minutes)
+        self._queued = set()   # (assignment_id, offset_minutes) currently on the heap
+        self._cv = threading.Condition()
+        self._thread = None
+        self.fired_events = 0
+        self.sent_reminders = 0
+
+    # ----- scheduling -----
+
+    def schedule(self, assignment_id: int, due_date, now=None) -> int:
+        """Push the reminder events of one assignment. O(log n) per event."""
+        now = now or datetime.utcnow()
+        deadline = deadline_of(due_date)
+        if deadline <= now:
+            return 0
+        pushed = 0
+        with self._cv:
+            for offset in self.offsets:
+                offset_minutes = int(offset.total_seconds() // 60)
+                key = (int(assignment_id), offset_minutes)
+                if key in self._queued:
+                    continue
+                # An offset that already passed fires right away (catch-up after restart).
+                fire_at = max(deadline - offset, now)
+                heapq.heappush(self._heap, (fire_at, key[0], offset_minutes))
+                self._queued.add(key)
+                pushed += 1
+            if pushed:
+                self._cv.notify()
+        return pushed
+
+    def load(self, now=None) -> int:
+        """Seed the heap from the database (once per process)."""
+        now = now or datetime.utcnow()
+        pushed = 0
+        for assignment_id, due_date in list_upcoming_deadlines(now.date().isoformat()):
+            try:
+                pushed += self.schedule(assignment_id, due_date, now=now)
+            except ValueError:
+                continue  # unparsable legacy due_date
+        return pushed
+
+    def next_fire_at(self):
+        with self._cv:
+            return self._heap[0][0] if self._heap else None
+
+    # ----- firing -----
+
+    def pop_due(self, now=None):
+        """Pop every event due by now (+ batch window)."""
+        now = now or datetime.utcnow()
+        horizon = now + self.batch_window
+        batch = []
+        with self._cv:
+            while self._heap and self._heap[0][0] <= horizon:
+                _, assignment_id, offset_minutes = heapq.heappop(self._heap)
+                self._queued.discard((assignment_id, offset_minutes))
+                batch.append((assignment_id, offset_minutes))
+        return batch
+
+    def fire_due(self, now=None) -> int:
+        batch = self.pop_due(now)
+        if not batch:
+            return 0
+        try:
+            created = create_assignment_reminders(batch)
+        except Exception:
+            # Put the batch back and retry a minute later.
+            retry_at = (now or datetime.utcnow()) + timedelta(minutes=1)
+            with self._cv:
+                for assignment_id, offset_minutes in batch:
+                    if (assignment_id, offset_minutes) not in self._queued:
+                        heapq.heappush(self._heap, (retry_at, assignment_id, offset_minutes))
+                        self._queued.add((assignment_id, offset_minutes))
+            raise
+        self.fired_events += len(batch)
+        self.sent_reminders += created
+        return created
+
+    # ----- background loop -----
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="sanzad-reminders", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cv:
+                next_at = self._heap[0][0] if self._heap else None
+                if next_at is None:
+                    self._cv.wait()
+                    continue
+                delay = (next_at - datetime.utcnow()).total_seconds()
+                if delay > 0:
+                    # Woken early by schedule() when an earlier event arrives.
+                    self._cv.wait(timeout=delay)
+                    continue
+            try:
+                self.fire_due()
+            except Exception:
+                # fire_due() already re-queued the batch; keep the loop alive.
+                pass
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> ReminderScheduler:
+    """Process-wide scheduler, loaded from the database and started on first use."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                scheduler = ReminderScheduler()
+                scheduler.load()
+                scheduler.start()
+                _scheduler = scheduler
+    return _scheduler
@@ -0,0 +1,90 @@
+# src/ecosystem.py
+"""
+Process-wide snapshot of the institutions and their user counts.
+
+Every session reads the same EcosystemSnapshot. On a read it drains
+db.take_ecosystem_changes() (a set swap, no query) and re-reads only the
+institutions whose rows or users were written since; a plain rerun with
+no writes costs no query at all. A full reload every FULL_REFRESH_SECONDS
+picks up writes made by other processes (e.g. migrate_users.py).
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+from db import ecosystem_rows, take_ecosystem_changes
+
+FULL_REFRESH_SECONDS = 600
+
+
+@dataclass(frozen=True)
+class InstitutionSummary:
+    name: str
+    code: str
+    status: str
+    country: str
+    city: str
+    details: str
+    students: int
+    teachers: int
+    parents: int
+    departments: Tuple[str, ...]
+
+    @property
+    def location(self) -> str:
+        return f"{self.city}, {self.country} {self.details}".strip(", ")
+
+
+def _summary(row) -> InstitutionSummary:
+    name, code, status, country, city, details, students, teachers, parents, departments = row
+    return InstitutionSummary(
+        name=name,
+        code=code or "",
+        status=status or "pending",
+        country=country or "",
+        city=city or "",
+        details=details or "",
+        students=students,
+        teachers=teachers,
+        parents=parents,
+        departments=tuple(sorted(departments)),
+    )
+
+
+class EcosystemSnapshot:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Replaced, never mutated, so readers can keep a reference safely.
+        self._institutions: Dict[str, InstitutionSummary] = {}
+        self._loaded_at = None
+
+    def institutions(self) -> Dict[str, InstitutionSummary]:
+        """{name: InstitutionSummary}, refreshed for any institutions written since the last read."""
+        with self._lock:
+            changed = take_ecosystem_changes()
+            if self._loaded_at is None or time.time() - self._loaded_at > FULL_REFRESH_SECONDS:
+                self._institutions = {row[0]: _summary(row) for row in ecosystem_rows()}
+                self._loaded_at = time.time()
+            elif changed:
+                institutions = dict(self._institutions)
+                for name in changed:
+                    institutions.pop(name, None)
+                institutions.update({row[0]: _summary(row) for row in ecosystem_rows(changed)})
+                self._institutions = dict(sorted(institutions.items()))
+            return self._institutions
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def get_ecosystem() -> EcosystemSnapshot:
+    """Process-wide ecosystem snapshot."""
+    global _snapshot
+    if _snapshot is None:
+        with _snapshot_lock:
+            if _snapshot is None:
+                _snapshot = EcosystemSnapshot()
+    return _snapshot
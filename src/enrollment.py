@@ -0,0 +1,174 @@
+# src/enrollment.py
+"""
+Course enrollment against a seat inventory.
+
+enroll() hands the request to the process-wide EnrollmentDesk and waits
+for its outcome. The desk's thread takes every request queued so far,
+reads the seat counters and versions of their courses, and applies them
+in order in one transaction (db.apply_enrollments): each enroll-or-
+waitlist is one UPDATE that only applies if the course is still at the
+version the desk read. A course changed in between (by another
+process) fails the version check; those requests are rolled back to their
+savepoint and go round again with fresh counters. On registration day the
+cost of a commit is shared by everyone who clicked in the same few
+milliseconds, instead of each request queuing for its own. The CHECK
+(enrolled <= capacity) on course_seats is the backstop: a course can
+never be overbooked, whatever the interleaving.
+
+Requests are idempotent: the request key (a double click or a retried
+request sends the same one) is recorded with its outcome in the same
+transaction, and a repeated key returns that outcome. Dropping a seat,
+or adding capacity, promotes the head of the waitlist in the same
+transaction; promoted students get a notification.
+"""
+
+import queue
+import threading
+import uuid
+from concurrent.futures import Future
+from typing import Optional
+
+from db import (
+    apply_enrollments,
+    drop_enrollment,
+    get_enrollment_request,
+    read_course_seats,
+    upsert_course_seats,
+)
+
+BATCH_SIZE = 500
+MAX_ATTEMPTS = 20
+TIMEOUT_SECONDS = 30
+
+# Writers of this process queue here instead of in SQLite's busy handler,
+# which sleeps in steps of up to 100 ms and dominates tail latency.
+_write_lock = threading.Lock()
+
+
+class EnrollmentDesk:
+    def __init__(self, batch_size: int = BATCH_SIZE):
+        self.batch_size = batch_size
+        # (institution, code, student_id, request_key, attempt, future)
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._stats = {"requests": 0, "batches": 0, "retries": 0}
+        self._thread = threading.Thread(target=self._run, name="enrollment-desk", daemon=True)
+        self._thread.start()
+
+    def submit(self, institution_name: str, code: str, student_id: int, request_key: str) -> Future:
+        future: Future = Future()
+        self._queue.put((institution_name, code, int(student_id), request_key, 1, future))
+        return future
+
+    def _take(self):
+        batch = [self._queue.get()]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._take()
+            by_institution = {}
+            for request in batch:
+                by_institution.setdefault(request[0], []).append(request)
+            for institution_name, requests in by_institution.items():
+                try:
+                    self._apply(institution_name, requests)
+                except Exception as exc:
+                    for *_, future in requests:
+                        if not future.done():
+                            future.set_exception(exc)
+
+    def _apply(self, institution_name, requests):
+        with _write_lock:
+            # Read after taking the lock so writers of this process cannot
+            # move the versions in between; only other processes can.
+            seats = read_course_seats(institution_name, [r[1] for r in requests])
+            known = []
+            for request in requests:
+                if request[1] in seats:
+                    known.append(request)
+                else:
+                    request[5].set_exception(KeyError(request[1]))
+            if not known:
+                return
+            results = apply_enrollments(
+                institution_name, [(code, student_id, key) for _, code, student_id, key, _, _ in known], seats
+            )
+        self._stats["batches"] += 1
+        for (_, code, student_id, key, attempt, future), status in zip(known, results):
+            if status is not None:
+                self._stats["requests"] += 1
+                future.set_result({"status": status, "attempts": attempt})
+            elif attempt >= MAX_ATTEMPTS:
+                future.set_exception(RuntimeError(f"{code} is very busy, please try again."))
+            else:
+                self._stats["retries"] += 1
+                self._queue.put((institution_name, code, student_id, key, attempt + 1, future))
+
+    def stats(self):
+        return {**self._stats, "pending": self._queue.qsize()}
+
+
+_desk = None
+_desk_lock = threading.Lock()
+
+
+def get_enrollment_desk() -> EnrollmentDesk:
+    """Process-wide enrollment desk."""
+    global _desk
+    if _desk is None:
+        with _desk_lock:
+            if _desk is None:
+                _desk = EnrollmentDesk()
+    return _desk
+
+
+def enroll(institution_name: str, code: str, student_id: int, request_key: Optional[str] = None) -> dict:
+    """
+    Enroll a student, or put them on the waitlist when the course is full.
+    Returns {"status", "attempts"}; raises KeyError for an unknown course.
+    """
+    request_key = request_key or uuid.uuid4().hex
+    recorded = get_enrollment_request(institution_name, request_key)
+    if recorded:
+        if (recorded[0], recorded[1]) != (code, int(student_id)):
+            raise ValueError("This request key was already used for another enrollment.")
+        return {"status": recorded[2], "attempts": 0}
+    future = get_enrollment_desk().submit(institution_name, code, student_id, request_key)
+    return future.result(timeout=TIMEOUT_SECONDS)
+
+
+def drop(institution_name: str, code: str, student_id: int, sender_id: str = "system") -> Optional[str]:
+    """Leave a course or its waitlist; returns the status the student had, or None."""
+    with _write_lock:
+        previous, promoted = drop_enrollment(institution_name, code, student_id)
+    _notify_promoted(institution_name, sender_id, code, promoted)
+    return previous
+
+
+def set_capacities(institution_name: str, rows, sender_id: str = "system") -> int:
+    """Add courses or change capacities, [(code, title, lecturer, capacity)]; returns students promoted."""
+    with _write_lock:
+        promoted = upsert_course_seats(institution_name, rows)
+    for code, student_ids in promoted.items():
+        _notify_promoted(institution_name, sender_id, code, student_ids)
+    return sum(len(ids) for ids in promoted.values())
+
+
+def _notify_promoted(institution_name, sender_id, code, student_ids):
+    if not student_ids:
+        return
+    from notifications import send_to_audience
+
+    send_to_audience(
+        tenant_id=institution_name,
+        sender_id=str(sender_id),
+        audience={"institution": institution_name, "user_ids": list(student_ids)},
+        title=f"You're enrolled in {code}",
+        body=f"A seat opened in {code} and you have moved off the waitlist.",
+        tags=["academic", "enrollment"],
+    )
@@ -0,0 +1,57 @@
+# src/event_log.py
+"""
+Local analytics event sink.
+
+log_event() has the signature of sanzad_core.analytics.log_event and is
+what campus_hub uses when SANZAD Core is not installed. It only appends a
+tuple to a BufferedWriter; a background thread JSON-encodes the payloads
+and inserts them in batches into the append-only `events` table.
+"""
+
+import json
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from buffered_writer import BufferedWriter
+from db import insert_events
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _flush(batch):
+    insert_events(
+        [
+            (created_at, tenant_id, actor_id, event_type, json.dumps(payload, default=str))
+            for created_at, tenant_id, actor_id, event_type, payload in batch
+        ]
+    )
+
+
+def get_event_writer() -> BufferedWriter:
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = BufferedWriter("event-log", _flush, capacity=50_000, batch_size=1_000)
+    return _writer
+
+
+def log_event(
+    *,
+    tenant_id: str,
+    actor_id: str,
+    event_type: str,
+    payload: Optional[Dict[str, Any]] = None,
+) -> None:
+    get_event_writer().append(
+        (
+            # UTC, same text form as SQLite's CURRENT_TIMESTAMP (plus milliseconds)
+            datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+            tenant_id,
+            actor_id,
+            event_type,
+            dict(payload) if payload else {},
+        )
+    )
@@ -0,0 +1,63 @@
+# src/fees.py
+"""
+Term fee reconciliation.
+
+reconcile_term() runs db.reconcile_fees with allocate_fifo: a sorted-merge
+of a term's outstanding fee lines and unapplied payments, both ordered by
+student. Within a student, each payment pays the oldest outstanding lines
+first (by due date). Money left over stays unapplied on the payment and
+shows as a credit in fee_balances; the next reconciliation applies it to
+newly billed lines.
+"""
+
+from datetime import date
+from typing import List, Optional, Sequence, Tuple
+
+from db import reconcile_fees
+
+
+def current_term(today: Optional[date] = None) -> str:
+    """Default term label, e.g. '2026-T3' (three four-month terms a year)."""
+    today = today or date.today()
+    return f"{today.year}-T{(today.month - 1) // 4 + 1}"
+
+
+def allocate_fifo(
+    fees: Sequence[Tuple[int, int, int]],
+    payments: Sequence[Tuple[int, int, int]],
+) -> List[Tuple[int, int, int]]:
+    """
+    fees [(student_id, fee_id, outstanding)] and payments
+    [(student_id, payment_id, unapplied)], both sorted by student_id ->
+    [(payment_id, fee_id, cents)]. One linear pass over both lists.
+    """
+    allocations = []
+    i = j = 0
+    fee_left = fees[0][2] if fees else 0
+    pay_left = payments[0][2] if payments else 0
+    while i < len(fees) and j < len(payments):
+        fee_student, fee_id, _ = fees[i]
+        pay_student, payment_id, _ = payments[j]
+        if fee_student < pay_student:
+            i += 1
+            fee_left = fees[i][2] if i < len(fees) else 0
+        elif pay_student < fee_student:
+            j += 1
+            pay_left = payments[j][2] if j < len(payments) else 0
+        else:
+            cents = min(fee_left, pay_left)
+            allocations.append((payment_id, fee_id, cents))
+            fee_left -= cents
+            pay_left -= cents
+            if not fee_left:
+                i += 1
+                fee_left = fees[i][2] if i < len(fees) else 0
+            if not pay_left:
+                j += 1
+                pay_left = payments[j][2] if j < len(payments) else 0
+    return allocations
+
+
+def reconcile_term(institution_name: str, term: str):
+    """Reconcile one term of one institution; see db.reconcile_fees for the result."""
+    return reconcile_fees(institution_name, term, allocate_fifo)
@@ -0,0 +1,121 @@
+# src/grid.py
+"""
+Server-side paginated data grid.
+
+The grid never holds a full table: every interaction asks a `fetch` callable
+for exactly one page (with sort, search and column projection applied in
+SQL), so the payload sent to the browser is bounded by the page size no
+matter how large the table grows.
+"""
+
+import streamlit as st
+
+from db import select_page
+
+PAGE_SIZES = [25, 50, 100]
+
+
+def source_fetch(source: str, filters=None):
+    """fetch callable for a db.PAGED_SOURCES entry with fixed filters."""
+
+    def fetch(columns, search, sort, descending, page, page_size):
+        return select_page(
+            source,
+            columns=columns,
+            filters=filters,
+            search=search,
+            sort=sort,
+            descending=descending,
+            page=page,
+            page_size=page_size,
+        )
+
+    return fetch
+
+
+def paged_grid(
+    key: str,
+    fetch,
+    columns,
+    labels=None,
+    sortable=None,
+    default_sort=None,
+    descending: bool = False,
+    searchable: bool = True,
+    search_label: str = "Search",
+    reset_on=(),
+):
+    """
+    Render one page of a table and return it as a list of row dicts.
+
+    fetch(columns, search, sort, descending, page, page_size) -> (rows, total)
+    columns    column names requested from the source (projection)
+    labels     display names, same order as columns
+    sortable   columns offered in the sort selector (default: all)
+    reset_on   extra values (e.g. outside filters) that send the grid back to page 1
+    """
+    labels = list(labels or columns)
+    sortable = list(sortable or columns)
+    size_key = f"{key}_page_size"
+
+    col_search, col_sort, col_dir = st.columns([3, 2, 1])
+    with col_search:
+        search = st.text_input(search_label, key=f"{key}_search") if searchable else ""
+    with col_sort:
+        sort = st.selectbox(
+            "Sort by",
+            sortable,
+            index=sortable.index(default_sort) if default_sort in sortable else 0,
+            format_func=lambda c: labels[columns.index(c)] if c in columns else c,
+            key=f"{key}_sort",
+        )
+    with col_dir:
+        desc = st.toggle("Descending", value=descending, key=f"{key}_desc")
+
+    page_size = st.session_state.get(size_key, PAGE_SIZES[0])
+    page = current_page(key, (search, sort, desc, page_size, tuple(reset_on)))
+    rows, total = fetch(columns, search, sort, desc, page, page_size)
+    if page > last_page(total, page_size):
+        page = last_page(total, page_size)
+        rows, total = fetch(columns, search, sort, desc, page, page_size)
+
+    if rows:
+        import pandas as pd
+
+        st.dataframe(pd.DataFrame(rows, columns=labels), use_container_width=True, hide_index=True)
+    else:
+        st.write("No rows match this selection.")
+
+    pager(key, page, total, page_size, show_page_size=True)
+
+    return [dict(zip(columns, r)) for r in rows]
+
+
+def last_page(total: int, page_size: int) -> int:
+    return max((total + page_size - 1) // page_size, 1)
+
+
+def current_page(key: str, signature) -> int:
+    """Page requested for grid `key`; a new query signature starts again on page 1."""
+    page_key = f"{key}_page"
+    if st.session_state.get(f"{key}_signature") != signature:
+        st.session_state[f"{key}_signature"] = signature
+        st.session_state[page_key] = 1
+    return max(int(st.session_state.get(page_key, 1)), 1)
+
+
+def pager(key: str, page: int, total: int, page_size: int, show_page_size: bool = False):
+    """Row range caption + page selector (+ optional page size) under a table."""
+    page_key = f"{key}_page"
+    st.session_state[page_key] = page
+    col_info, col_page, col_size = st.columns([3, 1, 1])
+    with col_info:
+        first = (page - 1) * page_size + 1 if total else 0
+        st.caption(f"Rows {first}–{min(page * page_size, total)} of {total}")
+    with col_page:
+        st.number_input(
+            "Page", min_value=1, max_value=last_page(total, page_size), step=1, key=page_key
+        )
+    if show_page_size:
+        with col_size:
+            st.selectbox("Rows per page", PAGE_SIZES, key=f"{key}_page_size")
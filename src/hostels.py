@@ -0,0 +1,177 @@
+# src/hostels.py
+"""
+Hostel bed allocation.
+
+BedIndex numbers every bed of an institution (by hostel, floor, room) and
+keeps the inventory as bitmaps, Python ints with bit i = bed i: one per
+hostel, per (hostel, floor), per room type, one for accessible rooms and
+one for free beds. "A free accessible double in Block A" is the AND of
+four bitmaps and the first such bed is its lowest set bit, so a lookup
+costs a few word-level operations instead of a scan of the rooms.
+
+allocate() assigns applicants to beds in priority order: tier 0
+(accessibility needs), tier 1 (first-years), tier 2 (returning students),
+earlier applications first within a tier. Tiers and accessibility
+are the confirmed ones: what students tick on their application stays a
+request until the hostel office confirms it. Each applicant gets the first
+free bed of their most preferred choice that still has one. All beds rank
+applicants by the same tiers, so this is exactly the outcome of
+student-proposing deferred acceptance: stable (no applicant would rather
+have a bed that went to someone of lower priority) and preference-aware.
+Applicants with accessibility needs only get accessible rooms; applicants
+who accept any room fall back to the first free bed anywhere. Lowest bed
+first fills rooms one at a time, keeping rooms whole for later groups.
+
+allocate_term() runs one batch for a term inside one write transaction,
+from reading the free beds to saving the result, so overlapping runs
+cannot hand out the same bed.
+"""
+
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from db import allocate_hostel_beds, load_hostel_allocation_input
+
+TIER_ACCESSIBILITY = 0
+TIER_FIRST_YEAR = 1
+TIER_RETURNING = 2
+TIER_LABELS = {
+    TIER_ACCESSIBILITY: "Accessibility needs",
+    TIER_FIRST_YEAR: "First-year",
+    TIER_RETURNING: "Returning",
+}
+
+
+def priority_tier(accessible: bool, first_year: bool) -> int:
+    if accessible:
+        return TIER_ACCESSIBILITY
+    return TIER_FIRST_YEAR if first_year else TIER_RETURNING
+
+
+class BedIndex:
+    def __init__(self, rooms: Iterable[tuple], taken: Iterable[Tuple[int, int]] = ()):
+        """rooms [(id, hostel, floor, room, room_type, beds, accessible)], taken [(room_id, bed)]."""
+        self.beds: List[Tuple[int, int]] = []  # bed number -> (room_id, bed in room)
+        number: Dict[Tuple[int, int], int] = {}
+        # Collect bit numbers first and build each bitmap once.
+        by_hostel: Dict[str, List[int]] = {}
+        by_floor: Dict[Tuple[str, int], List[int]] = {}
+        by_type: Dict[str, List[int]] = {}
+        accessible: List[int] = []
+        for room_id, hostel, floor, _, room_type, beds, is_accessible in rooms:
+            for bed in range(int(beds)):
+                i = len(self.beds)
+                self.beds.append((room_id, bed))
+                number[(room_id, bed)] = i
+                by_hostel.setdefault(hostel, []).append(i)
+                by_floor.setdefault((hostel, int(floor)), []).append(i)
+                by_type.setdefault(room_type, []).append(i)
+                if is_accessible:
+                    accessible.append(i)
+        self.all = (1 << len(self.beds)) - 1
+        self.by_hostel = {k: _bitmap(v) for k, v in by_hostel.items()}
+        self.by_floor = {k: _bitmap(v) for k, v in by_floor.items()}
+        self.by_type = {k: _bitmap(v) for k, v in by_type.items()}
+        self.accessible = _bitmap(accessible)
+        self.free = self.all & ~_bitmap(number[key] for key in taken if key in number)
+        self._masks: Dict[tuple, int] = {}
+
+    def mask(self, hostel: str = "", room_type: str = "", floor: Optional[int] = None, accessible: bool = False):
+        """Beds matching a choice; '' / None match anything. Cached, the inventory does not change."""
+        key = (hostel, room_type, floor, accessible)
+        cached = self._masks.get(key)
+        if cached is None:
+            cached = self.all
+            if hostel:
+                cached &= self.by_hostel.get(hostel, 0)
+            if floor is not None:
+                cached &= self.by_floor.get((hostel, floor), 0) if hostel else 0
+            if room_type:
+                cached &= self.by_type.get(room_type, 0)
+            if accessible:
+                cached &= self.accessible
+            self._masks[key] = cached
+        return cached
+
+    def first_free(self, mask: int) -> Optional[int]:
+        candidates = self.free & mask
+        if not candidates:
+            return None
+        return (candidates & -candidates).bit_length() - 1
+
+    def take(self, i: int) -> Tuple[int, int]:
+        self.free &= ~(1 << i)
+        return self.beds[i]
+
+    def count_free(self, mask: int = -1) -> int:
+        return (self.free & mask).bit_count()
+
+
+def _bitmap(bits: Iterable[int]) -> int:
+    # int.from_bytes over a bytearray is linear; OR-ing bits one by one into
+    # a growing int would be quadratic.
+    bits = list(bits)
+    if not bits:
+        return 0
+    buf = bytearray(max(bits) // 8 + 1)
+    for i in bits:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, "little")
+
+
+def allocate(
+    index: BedIndex,
+    queue: Sequence[Tuple[int, int, Sequence[Sequence[str]], bool, bool]],
+):
+    """
+    queue [(application_id, student_id, [[hostel, room_type], ...],
+    accessible, accept_any)] in priority order -> (allocations
+    [(application_id, student_id, room_id, bed)], waitlisted
+    [application_id]).
+    """
+    allocations, waitlisted = [], []
+    for app_id, student_id, preferences, accessible, accept_any in queue:
+        choices = [
+            index.mask(hostel or "", room_type or "", accessible=accessible) for hostel, room_type in preferences
+        ]
+        if accept_any or not choices:
+            choices.append(index.mask(accessible=accessible))
+        for mask in choices:
+            i = index.first_free(mask)
+            if i is not None:
+                room_id, bed = index.take(i)
+                allocations.append((app_id, student_id, room_id, bed))
+                break
+        else:
+            waitlisted.append(app_id)
+    return allocations, waitlisted
+
+
+def allocate_term(institution_name: str, term: str) -> dict:
+    """Allocate every pending and waitlisted application of the term in one batch."""
+    started = time.perf_counter()
+    index = None
+
+    def run(rooms, taken, queue):
+        nonlocal index
+        index = BedIndex(rooms, taken)
+        return allocate(index, queue)
+
+    applications, allocations, waitlisted = allocate_hostel_beds(institution_name, term, run)
+    return {
+        "applications": applications,
+        "allocated": len(allocations),
+        "waitlisted": len(waitlisted),
+        "free_beds": index.count_free(),
+        "elapsed": time.perf_counter() - started,
+    }
+
+
+def floor_occupancy(institution_name: str, term: str):
+    """[(hostel, floor, beds, free)] from the bitmaps."""
+    rooms, taken, _ = load_hostel_allocation_input(institution_name, term)
+    index = BedIndex(rooms, taken)
+    return [
+        (hostel, floor, bitmap.bit_count(), index.count_free(bitmap))
+        for (hostel, floor), bitmap in sorted(index.by_floor.items())
+    ]
@@ -0,0 +1,296 @@
+# src/intervals.py
+"""
+Interval trees for clash detection.
+
+IntervalTree keeps half-open intervals [start, end) in a treap ordered by
+start and augmented with the largest end in each subtree, so
+
+    clashes_with(start, end)  whether any interval overlaps, O(log n)
+    overlapping(start, end)   the k that do, by start, O(log n + k) for
+                              timetable-like data, O(k log n) at worst
+    free_windows(start, end)  the gaps between them, same cost
+
+and add / remove are O(log n) expected. Endpoints can be any ordered
+values: minutes of the week, date ordinals, timestamps.
+
+ScheduleIndex keeps one tree per resource, e.g. ("room", "LT1"),
+("lecturer", "Dr Achieng") or ("class", "CS1"). A booking is an item (any
+hashable id) holding one interval on several resources; book() moves an
+existing booking, so an edit costs one remove and one add per resource
+instead of a rebuild.
+"""
+
+import random
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+Interval = Tuple[Any, Any, Hashable]
+
+
+class _Node:
+    __slots__ = ("start", "end", "seq", "item", "priority", "left", "right", "max_end")
+
+    def __init__(self, start, end, seq, item, priority):
+        self.start = start
+        self.end = end
+        self.seq = seq
+        self.item = item
+        self.priority = priority
+        self.left = None
+        self.right = None
+        self.max_end = end
+
+    def key(self):
+        return (self.start, self.end, self.seq)
+
+
+def _update(node):
+    m = node.end
+    if node.left is not None and node.left.max_end > m:
+        m = node.left.max_end
+    if node.right is not None and node.right.max_end > m:
+        m = node.right.max_end
+    node.max_end = m
+
+
+def _merge(a, b):
+    """Treap of a's and b's nodes; every key in a is below every key in b."""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    if a.priority > b.priority:
+        a.right = _merge(a.right, b)
+        _update(a)
+        return a
+    b.left = _merge(a, b.left)
+    _update(b)
+    return b
+
+
+def _split(node, key):
+    """(keys < key, keys >= key)"""
+    if node is None:
+        return None, None
+    if node.key() < key:
+        left, right = _split(node.right, key)
+        node.right = left
+        _update(node)
+        return node, right
+    left, right = _split(node.left, key)
+    node.left = right
+    _update(node)
+    return left, node
+
+
+def _remove(node, key):
+    if node is None:
+        return None
+    node_key = node.key()
+    if key == node_key:
+        return _merge(node.left, node.right)
+    if key < node_key:
+        node.left = _remove(node.left, key)
+    else:
+        node.right = _remove(node.right, key)
+    _update(node)
+    return node
+
+
+def _build(nodes, lo, hi):
+    """Balanced subtree of the sorted nodes[lo:hi]."""
+    if lo >= hi:
+        return None
+    mid = (lo + hi) // 2
+    node = nodes[mid]
+    node.left = _build(nodes, lo, mid)
+    node.right = _build(nodes, mid + 1, hi)
+    _update(node)
+    return node
+
+
+class IntervalTree:
+    def __init__(self, intervals: Iterable[Interval] = ()):
+        """Bulk-loads `intervals` [(start, end, item)] in O(n log n)."""
+        self._root = None
+        self._seq = 0
+        # (start, end, item) -> seq, to find the node again on remove()
+        self._keys: Dict[tuple, int] = {}
+        self._rng = random.Random()
+        nodes = []
+        for start, end, item in intervals:
+            if not start < end:
+                raise ValueError(f"Empty interval [{start}, {end}).")
+            if (start, end, item) in self._keys:
+                raise ValueError(f"{item!r} already holds [{start}, {end}).")
+            self._seq += 1
+            self._keys[(start, end, item)] = self._seq
+            nodes.append(_Node(start, end, self._seq, item, 0.0))
+        if nodes:
+            nodes.sort(key=_Node.key)
+            self._root = _build(nodes, 0, len(nodes))
+            # Random priorities handed out level by level keep the heap
+            # order, so later adds and removes stay balanced.
+            priorities = sorted((self._rng.random() for _ in nodes), reverse=True)
+            level, i = [self._root], 0
+            while level:
+                following = []
+                for node in level:
+                    node.priority = priorities[i]
+                    i += 1
+                    following.extend(child for child in (node.left, node.right) if child is not None)
+                level = following
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, start, end, item: Hashable = None):
+        if not start < end:
+            raise ValueError(f"Empty interval [{start}, {end}).")
+        if (start, end, item) in self._keys:
+            raise ValueError(f"{item!r} already holds [{start}, {end}).")
+        self._seq += 1
+        self._keys[(start, end, item)] = self._seq
+        node = _Node(start, end, self._seq, item, self._rng.random())
+        left, right = _split(self._root, node.key())
+        self._root = _merge(_merge(left, node), right)
+
+    def remove(self, start, end, item: Hashable = None) -> bool:
+        seq = self._keys.pop((start, end, item), None)
+        if seq is None:
+            return False
+        self._root = _remove(self._root, (start, end, seq))
+        return True
+
+    def overlapping(self, start, end) -> List[Interval]:
+        """Intervals overlapping [start, end), by start."""
+        found: List[Interval] = []
+        stack, node = [], self._root
+        # In-order walk that skips subtrees ending before `start` and
+        # everything starting at or after `end`.
+        while stack or node is not None:
+            while node is not None:
+                if node.max_end <= start:
+                    node = None
+                    break
+                stack.append(node)
+                node = node.left
+            if not stack:
+                break
+            node = stack.pop()
+            if node.start >= end:
+                break
+            if node.end > start:
+                found.append((node.start, node.end, node.item))
+            node = node.right
+        return found
+
+    def clashes_with(self, start, end) -> bool:
+        node = self._root
+        while node is not None:
+            if node.start < end and node.end > start:
+                return True
+            if node.left is not None and node.left.max_end > start:
+                node = node.left
+            elif node.start < end:
+                node = node.right
+            else:
+                return False
+        return False
+
+    def free_windows(self, start, end) -> List[Tuple[Any, Any]]:
+        """Gaps of at least one unit between the intervals inside [start, end)."""
+        windows = []
+        cursor = start
+        for s, e, _ in self.overlapping(start, end):
+            if s > cursor:
+                windows.append((cursor, s))
+            if e > cursor:
+                cursor = e
+        if cursor < end:
+            windows.append((cursor, end))
+        return windows
+
+
+Resource = Tuple[str, Hashable]
+
+
+class ScheduleIndex:
+    def __init__(self, bookings: Iterable[Tuple[Hashable, Iterable[Resource], Any, Any]] = ()):
+        """Bulk-loads `bookings` [(item, resources, start, end)]."""
+        # item -> (resources, start, end)
+        self._bookings: Dict[Hashable, Tuple[Tuple[Resource, ...], Any, Any]] = {}
+        per_resource: Dict[Resource, List[Interval]] = {}
+        for item, resources, start, end in bookings:
+            if item in self._bookings:
+                raise ValueError(f"{item!r} is booked twice.")
+            resources = tuple(r for r in resources if r[1] not in (None, ""))
+            self._bookings[item] = (resources, start, end)
+            for resource in resources:
+                per_resource.setdefault(resource, []).append((start, end, item))
+        self._trees: Dict[Resource, IntervalTree] = {
+            resource: IntervalTree(intervals) for resource, intervals in per_resource.items()
+        }
+
+    def __len__(self):
+        return len(self._bookings)
+
+    def __contains__(self, item):
+        return item in self._bookings
+
+    def booking(self, item):
+        """(resources, start, end) of an item, or None."""
+        return self._bookings.get(item)
+
+    def book(self, item: Hashable, resources: Iterable[Resource], start, end):
+        """Book (or move) `item` on every resource for [start, end)."""
+        resources = tuple(r for r in resources if r[1] not in (None, ""))
+        if self._bookings.get(item) == (resources, start, end):
+            return
+        self.cancel(item)
+        for resource in resources:
+            self._trees.setdefault(resource, IntervalTree()).add(start, end, item)
+        self._bookings[item] = (resources, start, end)
+
+    def cancel(self, item: Hashable) -> bool:
+        booking = self._bookings.pop(item, None)
+        if booking is None:
+            return False
+        resources, start, end = booking
+        for resource in resources:
+            self._trees[resource].remove(start, end, item)
+        return True
+
+    def clashes(
+        self, resources: Iterable[Resource], start, end, ignore: Optional[Hashable] = None
+    ) -> List[Tuple[Resource, Any, Any, Hashable]]:
+        """[(resource, start, end, item)] already booked on `resources` during [start, end)."""
+        found = []
+        for resource in resources:
+            tree = self._trees.get(resource)
+            if tree is None:
+                continue
+            found.extend((resource, s, e, item) for s, e, item in tree.overlapping(start, end) if item != ignore)
+        return found
+
+    def is_free(self, resource: Resource, start, end) -> bool:
+        tree = self._trees.get(resource)
+        return tree is None or not tree.clashes_with(start, end)
+
+    def free_windows(self, resources: Iterable[Resource], start, end):
+        """Gaps inside [start, end) during which every one of `resources` is free."""
+        busy = sorted(
+            (s, e)
+            for resource in resources
+            if resource in self._trees
+            for s, e, _ in self._trees[resource].overlapping(start, end)
+        )
+        windows = []
+        cursor = start
+        for s, e in busy:
+            if s > cursor:
+                windows.append((cursor, s))
+            if e > cursor:
+                cursor = e
+        if cursor < end:
+            windows.append((cursor, end))
+        return windows
@@ -0,0 +1,144 @@
+# src/media_store.py
+"""
+Shared, disk-backed store for uploaded media (photos, audio, PDFs).
+
+Views keep only a MediaHandle in st.session_state; the bytes are written
+once to MEDIA_DIR under their SHA-256 digest, so the same upload from many
+sessions is stored once. The store is bounded by a byte quota and evicts
+least-recently-used files when it is exceeded. Views read the bytes back
+only when they are displayed or downloaded:
+
+    handle = get_media_store().put(upload.read(), upload.name, upload.type)
+    st.image(get_media_store().path(handle))
+    st.download_button("Download", data=get_media_store().reader(handle), ...)
+
+A handle whose file has been evicted resolves to None; views show the
+metadata and say the file is no longer available.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+MEDIA_DIR = BASE_DIR / "media_cache"
+MEDIA_QUOTA_BYTES = 512 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class MediaHandle:
+    digest: str
+    name: str
+    mime: str
+    size: int
+
+
+class MediaStore:
+    def __init__(self, root: Path = MEDIA_DIR, quota_bytes: int = MEDIA_QUOTA_BYTES):
+        self.root = Path(root)
+        self.quota_bytes = quota_bytes
+        self._lock = threading.Lock()
+        # digest -> size, least recently used first
+        self._lru = OrderedDict()
+        self._total = 0
+        self._load_index()
+
+    def _file(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def _load_index(self):
+        """Rebuild the LRU order from the files left by previous processes (oldest access first)."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        files = []
+        for path in self.root.glob("??/*"):
+            if path.is_file() and not path.name.startswith("."):
+                stat = path.stat()
+                files.append((stat.st_mtime, path.name, stat.st_size))
+        for _, digest, size in sorted(files):
+            self._lru[digest] = size
+            self._total += size
+
+    def put(self, data: bytes, name: str = "", mime: str = "") -> MediaHandle:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._file(digest)
+        with self._lock:
+            if digest in self._lru:
+                self._touch(digest, path)
+            else:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                # Write under a temporary name so readers never see a partial file.
+                fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".part-")
+                with os.fdopen(fd, "wb") as fh:
+                    fh.write(data)
+                os.replace(tmp, path)
+                self._lru[digest] = len(data)
+                self._total += len(data)
+                self._evict(keep=digest)
+        return MediaHandle(digest, name, mime, len(data))
+
+    def _touch(self, digest: str, path: Path):
+        self._lru.move_to_end(digest)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+    def _evict(self, keep: str):
+        while self._total > self.quota_bytes and len(self._lru) > 1:
+            digest, size = next(iter(self._lru.items()))
+            if digest == keep:
+                break
+            del self._lru[digest]
+            self._total -= size
+            try:
+                self._file(digest).unlink()
+            except FileNotFoundError:
+                pass
+
+    def path(self, handle: Optional[MediaHandle]) -> Optional[str]:
+        """Path of the stored file (marks it recently used), or None if missing/evicted."""
+        if handle is None:
+            return None
+        path = self._file(handle.digest)
+        with self._lock:
+            if handle.digest not in self._lru:
+                return None
+            self._touch(handle.digest, path)
+        return str(path) if path.exists() else None
+
+    def read(self, handle: Optional[MediaHandle]) -> Optional[bytes]:
+        path = self.path(handle)
+        if path is None:
+            return None
+        try:
+            return Path(path).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def reader(self, handle: MediaHandle):
+        """Zero-argument callable for st.download_button(data=...): reads on click."""
+        return lambda: self.read(handle) or b""
+
+    def usage(self):
+        """(files, bytes stored, quota bytes)."""
+        with self._lock:
+            return len(self._lru), self._total, self.quota_bytes
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_media_store() -> MediaStore:
+    """Process-wide media store."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = MediaStore()
+    return _store
@@ -0,0 +1,160 @@
+# src/module_registry.py
+"""
+Registry of the Wings modules under src/modules.
+
+Modules are discovered from the directory listing once per process, imported
+in a background thread right after startup and validated once: each must
+expose render(role). The shell asks the registry for a module instead of
+calling importlib on every rerun, so the first visit to a wing finds it
+already imported, and a module that fails to import or has no usable
+render(role) is known (and logged) at boot rather than when a user clicks it.
+
+Per module the registry keeps the import time and the time of its first
+render, shown in the Super Admin diagnostics.
+"""
+
+import importlib
+import inspect
+import logging
+import threading
+import time
+import traceback
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+MODULES_DIR = Path(__file__).parent / "modules"
+PACKAGE = "modules"
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class ModuleEntry:
+    name: str
+    module: object = None
+    error: str = ""
+    import_seconds: Optional[float] = None
+    first_render_seconds: Optional[float] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.module is not None
+
+
+class ModuleRegistry:
+    def __init__(self, modules_dir: Path = MODULES_DIR):
+        self._dir = modules_dir
+        self._lock = threading.RLock()
+        self._entries = {
+            path.stem: ModuleEntry(path.stem)
+            for path in sorted(modules_dir.glob("*.py"))
+            if not path.stem.startswith("_")
+        }
+        self._warm_thread = None
+
+    def names(self):
+        return list(self._entries)
+
+    def entry(self, name: str) -> ModuleEntry:
+        """Entry for `name`, importing it on first request; unknown names get an error entry."""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                return ModuleEntry(name, error=f"No module file {name}.py in {self._dir.name}/")
+            if entry.module is None and not entry.error:
+                self._import(entry)
+            return entry
+
+    def _import(self, entry: ModuleEntry):
+        started = time.perf_counter()
+        try:
+            module = importlib.import_module(f"{PACKAGE}.{entry.name}")
+            render = getattr(module, "render", None)
+            if not callable(render):
+                raise TypeError("has no render(role) function")
+            # Must be callable as render(role); extra parameters need defaults.
+            inspect.signature(render).bind("Student")
+        except Exception as exc:
+            entry.error = f"{type(exc).__name__}: {exc}"
+            log.warning("Module %s is unavailable: %s\n%s", entry.name, entry.error, traceback.format_exc())
+        else:
+            entry.module = module
+        entry.import_seconds = time.perf_counter() - started
+
+    def warm(self):
+        """Import and validate every module in a background thread (once)."""
+        with self._lock:
+            if self._warm_thread is not None:
+                return
+            self._warm_thread = threading.Thread(
+                target=self._warm_all, name="module-registry-warm", daemon=True
+            )
+            self._warm_thread.start()
+
+    def _warm_all(self):
+        for name in self.names():
+            self.entry(name)
+        broken = self.broken()
+        if broken:
+            log.warning("Broken modules at boot: %s", ", ".join(sorted(broken)))
+
+    def wait_warm(self, timeout: Optional[float] = None):
+        thread = self._warm_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def render(self, name: str, role: str):
+        """render(role) of module `name`; returns the entry so callers can report errors."""
+        entry = self.entry(name)
+        if not entry.ok:
+            return entry
+        if entry.first_render_seconds is None:
+            started = time.perf_counter()
+            try:
+                entry.module.render(role)
+            finally:
+                entry.first_render_seconds = time.perf_counter() - started
+        else:
+            entry.module.render(role)
+        return entry
+
+    def broken(self):
+        """{name: error} for modules that failed to import or validate."""
+        return {e.name: e.error for e in self._entries.values() if e.error}
+
+    def report(self):
+        """Rows of (module, status, import ms, first render ms) for diagnostics."""
+        rows = []
+        for e in self._entries.values():
+            if e.ok:
+                status = "ok"
+            elif e.error:
+                status = e.error
+            else:
+                status = "not loaded"
+            rows.append(
+                (
+                    e.name,
+                    status,
+                    None if e.import_seconds is None else round(e.import_seconds * 1000, 1),
+                    None if e.first_render_seconds is None else round(e.first_render_seconds * 1000, 1),
+                )
+            )
+        return rows
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ModuleRegistry:
+    """Process-wide registry; starts warming the module imports on first use."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                registry = ModuleRegistry()
+                registry.warm()
+                _registry = registry
+    return _registry
@@ -15,10 +15,12 @@ All critical business logic lives in SANZAD Core services.
 
 from __future__ import annotations
 
+import uuid
 from dataclasses import dataclass
-from datetime import datetime, date
+from datetime import date, datetime
 from typing import Optional, Dict, Any, List
 
+import pandas as pd
 import streamlit as st
 
 # -------------------------------------------------------------------
@@ -35,14 +37,31 @@ try:
     )
     from sanzad_core.notifications import send_notification, send_inbox_message
     from sanzad_core.analytics import log_event
+
+    _CORE = True
 except ImportError:
+    _CORE = False
+
     # Light, no-op fallbacks so this module can still run in demo mode.
-    class PaymentStatus:
-        PENDING = "PENDING"
-        SUCCESS = "SUCCESS"
-        FAILED = "FAILED"
+    # Payments run on the local SANZAD Pay ledger (payments.py).
+    from payments import PaymentStatus, create_payment_request, get_payment_status, complete_payment
+
+    # Platform roles -> Campus Hub roles
+    _HUB_ROLES = {
+        "Teacher": "Lecturer",
+        "Institution": "Institution Admin",
+        "Super Admin": "SANZAD Super Admin",
+    }
 
     def get_current_identity() -> Dict[str, Any]:
+        user = st.session_state.get("current_user")
+        if user:
+            return {
+                "user_id": str(user.get("id")),
+                "full_name": user.get("full_name") or user.get("email", ""),
+                "role": _HUB_ROLES.get(user.get("role"), user.get("role", "")),
+                "institution_id": user.get("institution_name") or "",
+            }
         # Demo identity for local testing
         return {
             "user_id": "demo-student-001",
@@ -55,27 +74,6 @@ except ImportError:
         ident = get_current_identity()
         return ident.get("role") in _roles
 
-    def create_payment_request(
-        *,
-        tenant_id: str,
-        payer_id: str,
-        amount: float,
-        currency: str,
-        description: str,
-        metadata: Optional[Dict[str, Any]] = None,
-    ) -> Dict[str, Any]:
-        return {
-            "payment_id": f"demo-pay-{int(datetime.utcnow().timestamp())}",
-            "qr_url": "https://example.com/demo-qr",
-            "amount": amount,
-            "currency": currency,
-            "description": description,
-            "metadata": metadata or {},
-        }
-
-    def get_payment_status(payment_id: str) -> str:
-        return PaymentStatus.SUCCESS
-
     def send_notification(
         *,
         tenant_id: str,
@@ -83,8 +81,24 @@ except ImportError:
         title: str,
         body: str,
         tags: Optional[List[str]] = None,
-    ) -> None:
-        pass
+        audience: Optional[Dict[str, Any]] = None,
+    ) -> Optional[int]:
+        # Local outbox + worker pool; returns the outbox id without waiting.
+        from notifications import send_to_audience
+
+        if audience is None:
+            if not user_ids:
+                return None
+            audience = {"user_ids": [int(u) for u in user_ids if str(u).isdigit()]}
+        ident = get_current_identity()
+        return send_to_audience(
+            tenant_id=tenant_id,
+            sender_id=str(ident.get("user_id", "")),
+            audience=audience,
+            title=title,
+            body=body,
+            tags=tags,
+        )
 
     def send_inbox_message(
         *,
@@ -92,17 +106,16 @@ except ImportError:
         thread_key: str,
         sender_id: str,
         text: str,
-    ) -> None:
-        pass
+    ) -> Optional[int]:
+        # Local threaded inbox; returns the message's sequence in its thread.
+        from db import post_thread_message
 
-    def log_event(
-        *,
-        tenant_id: str,
-        actor_id: str,
-        event_type: str,
-        payload: Optional[Dict[str, Any]] = None,
-    ) -> None:
-        pass
+        if not text.strip():
+            return None
+        return post_thread_message(thread_key, sender_id, text, tenant_id=tenant_id)
+
+    # Events still go to the local, batched event log (events table).
+    from event_log import log_event
 
 
 # -------------------------------------------------------------------
@@ -154,6 +167,1268 @@ def _info_pill(text: str):
     )
 
 
+# -------------------------------------------------------------------
+# NOTIFICATIONS
+# -------------------------------------------------------------------
+# Audiences are resolved to user ids by the notification worker pool,
+# never in the request; see notifications.py.
+_BROADCAST_AUDIENCES = {
+    "Everyone in my institution": None,
+    "Students": "Student",
+    "Teachers": "Teacher",
+    "Parents": "Parent",
+}
+
+
+def _audience_picker(identity: Identity, key: str, by_class: bool) -> Dict[str, Any]:
+    audience: Dict[str, Any] = {"institution": identity.institution_id}
+    if by_class:
+        classes, courses = [], []
+        if not _CORE and identity.user_id.isdigit():
+            from db import list_lecturer_courses, list_teacher_classes
+
+            classes = list_teacher_classes(int(identity.user_id))
+            courses = list_lecturer_courses(identity.institution_id, identity.full_name)
+        target = st.selectbox(
+            "Send to",
+            ["All students in my institution"]
+            + [f"Class: {c}" for c in classes]
+            + [f"Course: {c}" for c in courses],
+            key=key,
+        )
+        audience["role"] = "Student"
+        if target.startswith("Class: "):
+            audience["class"] = target[len("Class: "):]
+        elif target.startswith("Course: "):
+            # Students enrolled in the course, not its waitlist.
+            audience["course"] = target[len("Course: "):]
+    else:
+        role = _BROADCAST_AUDIENCES[st.selectbox("Send to", list(_BROADCAST_AUDIENCES), key=key)]
+        if role:
+            audience["role"] = role
+    return audience
+
+
+def _announce(identity: Identity, audience: Dict[str, Any], title: str, body: str, tags: List[str]):
+    if not title.strip():
+        st.warning("Please enter a title.")
+        return
+    if _CORE:
+        send_notification(
+            tenant_id=identity.institution_id,
+            user_ids=[],
+            title=title,
+            body=body,
+            tags=tags,
+        )
+        st.success("Announcement sent.")
+        return
+    from db import count_audience
+
+    outbox_id = send_notification(
+        tenant_id=identity.institution_id,
+        user_ids=[],
+        title=title,
+        body=body,
+        tags=tags,
+        audience=audience,
+    )
+    st.success(
+        f"Announcement #{outbox_id} queued for {count_audience(audience)} recipient(s); "
+        "delivery continues in the background."
+    )
+
+
+def _inbox(identity: Identity):
+    if _CORE or not identity.user_id.isdigit():
+        st.info("Your notifications appear in the SANZAD inbox.")
+        return
+    from db import count_unread_inbox, list_inbox, mark_inbox_read
+
+    user_id = int(identity.user_id)
+    unread = count_unread_inbox(user_id)
+    c1, c2 = st.columns([3, 1])
+    c1.markdown(f"**Unread notifications:** {unread}")
+    if unread and c2.button("Mark all read", key="comm_inbox_read"):
+        mark_inbox_read(user_id)
+        unread = 0
+    rows = list_inbox(user_id, limit=20)
+    if not rows:
+        st.caption("No notifications yet.")
+    for _, created_at, title, body, _, _, read_at in rows:
+        marker = "🔵 " if read_at is None else ""
+        with st.expander(f"{marker}{title} · {created_at}"):
+            st.write(body or "")
+
+
+# -------------------------------------------------------------------
+# PAYMENTS
+# -------------------------------------------------------------------
+def _pay(
+    identity: Identity,
+    scope: str,
+    amount: float,
+    description: str,
+    metadata: Dict[str, Any],
+) -> Optional[Dict[str, Any]]:
+    """
+    "Pay via SANZAD Pay" button plus the status of the scope's current payment.
+
+    The idempotency key is fixed per session, scope and inputs until that
+    payment is settled, so a double click or a rerun returns the same
+    payment instead of charging twice.
+    """
+    payment_key = f"{scope}_payment"
+    nonce_key = f"{scope}_pay_nonce"
+    created = None
+    if st.button("Pay via SANZAD Pay", key=f"{scope}_pay_btn"):
+        if amount <= 0:
+            st.warning("Enter an amount greater than zero.")
+        else:
+            nonce = st.session_state.setdefault(nonce_key, uuid.uuid4().hex)
+            request = dict(
+                tenant_id=identity.institution_id,
+                payer_id=identity.user_id,
+                amount=amount,
+                currency="KES",
+                description=description,
+                metadata=metadata,
+            )
+            if not _CORE:
+                request["idempotency_key"] = f"{scope}:{nonce}:{amount}:{description}"
+            created = create_payment_request(**request)
+            st.session_state[payment_key] = created
+
+    payment = st.session_state.get(payment_key)
+    if not payment:
+        return created
+    status = get_payment_status(payment["payment_id"])
+    st.markdown(
+        f"**Payment** `{payment['payment_id']}` · {payment['description']} · "
+        f"{payment['currency']} {payment['amount']:,.2f} · **{status}**"
+    )
+    if status == PaymentStatus.PENDING:
+        st.caption(f"Scan QR at: {payment['qr_url']}")
+        if not _CORE:
+            c1, c2 = st.columns(2)
+            if c1.button("Confirm in wallet", key=f"{scope}_pay_confirm"):
+                complete_payment(payment["payment_id"], success=True, confirmed_by=identity.user_id)
+                st.rerun()
+            if c2.button("Cancel payment", key=f"{scope}_pay_cancel"):
+                complete_payment(payment["payment_id"], success=False, confirmed_by=identity.user_id)
+                st.rerun()
+    else:
+        # Settled: the next click starts a new payment.
+        st.session_state.pop(nonce_key, None)
+    return created
+
+
+# -------------------------------------------------------------------
+# ATTENDANCE
+# -------------------------------------------------------------------
+def _qr_png(text: str) -> Optional[bytes]:
+    """PNG of a QR code for text, or None when the optional qrcode package is missing."""
+    try:
+        import qrcode
+    except ImportError:
+        return None
+    from io import BytesIO
+
+    buf = BytesIO()
+    qrcode.make(text).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _attendance_lecturer(identity: Identity):
+    from attendance import open_session
+    from db import list_lecturer_courses, list_lecturer_sessions, list_teacher_classes
+
+    lecturer_id = int(identity.user_id) if identity.user_id.isdigit() else 0
+    # Courses with seats take attendance of their enrolled students.
+    classes = list_teacher_classes(lecturer_id) + list_lecturer_courses(identity.institution_id, identity.full_name)
+    c1, c2 = st.columns([2, 1])
+    if classes:
+        class_name = c1.selectbox("Class", classes, key="att_class")
+    else:
+        class_name = c1.text_input("Class", key="att_class_text")
+    minutes = c2.number_input("Open for (minutes)", min_value=1, max_value=180, value=15, key="att_minutes")
+    if st.button("Generate attendance session QR", key="att_gen_qr"):
+        if not (class_name or "").strip():
+            st.warning("Choose a class first.")
+        else:
+            st.session_state["att_session"] = open_session(
+                identity.institution_id, class_name, lecturer_id, minutes=int(minutes)
+            )
+
+    current = st.session_state.get("att_session")
+    if current:
+        session_id, token, expires_at = current
+        left = int(expires_at - datetime.now().timestamp())
+        status = f"closes in {left // 60} min {left % 60} s" if left > 0 else "closed"
+        st.markdown(f"**Session #{session_id}** · {status}")
+        png = _qr_png(token)
+        if png:
+            st.image(png, width=260)
+        st.code(token, language=None)
+
+    sessions = list_lecturer_sessions(lecturer_id)
+    if sessions:
+        st.markdown("#### Recent sessions")
+        st.dataframe(
+            {
+                "session": [r[0] for r in sessions],
+                "class": [r[1] for r in sessions],
+                "opened": [datetime.fromtimestamp(r[2]).strftime("%Y-%m-%d %H:%M") for r in sessions],
+                "checked in": [r[4] for r in sessions],
+            },
+            use_container_width=True,
+            hide_index=True,
+        )
+
+
+def _attendance_student(identity: Identity):
+    from attendance import get_check_in_desk
+
+    token = st.text_input("Enter/scan attendance token", key="att_token")
+    if st.button("Mark my attendance", key="att_mark_btn") and token.strip():
+        user = st.session_state.get("current_user") or {}
+        try:
+            added = get_check_in_desk().check_in(
+                token,
+                int(identity.user_id) if identity.user_id.isdigit() else 0,
+                identity.institution_id,
+                user.get("student_id") or "",
+            )
+        except ValueError as exc:
+            st.error(str(exc))
+        else:
+            st.success("Attendance marked." if added else "You have already checked in to this session.")
+
+
+def _attendance_overview(identity: Identity):
+    from attendance import attendance_rates
+
+    rates = attendance_rates(identity.institution_id)
+    if not rates["courses"]:
+        st.info("No attendance sessions recorded yet.")
+        return
+    present = sum(c[3] for c in rates["courses"])
+    possible = sum(c[4] for c in rates["courses"])
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Institution attendance", f"{present / possible:.0%}" if possible else "–")
+    m2.metric("Sessions", sum(c[1] for c in rates["courses"]))
+    m3.metric("Courses", len(rates["courses"]))
+    st.dataframe(
+        {
+            "course": [c[0] for c in rates["courses"]],
+            "sessions": [c[1] for c in rates["courses"]],
+            "students": [c[2] for c in rates["courses"]],
+            "attendance": [round(c[3] / c[4] * 100, 1) if c[4] else None for c in rates["courses"]],
+        },
+        use_container_width=True,
+        hide_index=True,
+    )
+
+    students = rates["students"]
+    if identity.role == "Student":
+        students = [r for r in students if str(r[1]) == identity.user_id]
+        st.markdown("#### My attendance")
+    else:
+        st.markdown("#### Lowest attendance")
+        students = sorted((r for r in students if r[4]), key=lambda r: r[3] / r[4])[:50]
+    st.dataframe(
+        {
+            "course": [r[0] for r in students],
+            "student_id": [r[1] for r in students],
+            "name": [r[2] for r in students],
+            "attended": [r[3] for r in students],
+            "sessions": [r[4] for r in students],
+            "rate": [round(r[3] / r[4] * 100, 1) if r[4] else None for r in students],
+        },
+        use_container_width=True,
+        hide_index=True,
+    )
+
+
+# -------------------------------------------------------------------
+# THREADED INBOX
+# -------------------------------------------------------------------
+THREAD_PAGE_SIZE = 30
+
+
+def _thread_key(identity: Identity, code: str) -> str:
+    return f"group:{identity.institution_id}:{code.strip().lower()}"
+
+
+def _threads(identity: Identity):
+    if _CORE:
+        st.info("Backed by SANZAD Messaging core.")
+        return
+    from db import (
+        add_thread_members,
+        count_unread_threads,
+        is_thread_member,
+        list_message_threads,
+        list_thread_messages,
+        mark_thread_read,
+    )
+
+    code = st.text_input("Create or join group by code", key="comm_group_code")
+    if st.button("Join group", key="comm_group_join") and code.strip():
+        key = _thread_key(identity, code)
+        add_thread_members(key, [identity.user_id], tenant_id=identity.institution_id, title=code.strip())
+        st.session_state["comm_thread_pick"] = key
+
+    threads = list_message_threads(identity.user_id, limit=50)
+    if not threads:
+        st.caption("You are not in any group yet.")
+        return
+    st.markdown(f"**Threads with unread messages:** {count_unread_threads(identity.user_id)}")
+    labels = {
+        t[0]: f"{t[1]}" + (f" · {t[3]} unread" if t[3] else "") + (f" — {t[5]}" if t[5] else "")
+        for t in threads
+    }
+    if st.session_state.get("comm_thread_pick") not in labels:
+        st.session_state.pop("comm_thread_pick", None)
+    thread_key = st.radio("Your groups", list(labels), format_func=labels.get, key="comm_thread_pick")
+    # Paging position belongs to the thread it was taken in.
+    if st.session_state.get("comm_thread_before_key") != thread_key:
+        st.session_state["comm_thread_before_key"] = thread_key
+        st.session_state.pop("comm_thread_before", None)
+    if not is_thread_member(identity.user_id, thread_key):
+        return
+
+    before = st.session_state.get("comm_thread_before", 0)
+    messages = list_thread_messages(thread_key, before_seq=before, limit=THREAD_PAGE_SIZE)
+    if messages and messages[0][0] > 1 and st.button("Older messages", key="comm_thread_older"):
+        st.session_state["comm_thread_before"] = messages[0][0]
+        st.rerun()
+    if before and st.button("Latest messages", key="comm_thread_latest"):
+        st.session_state.pop("comm_thread_before", None)
+        st.rerun()
+    for seq, sender_id, text, created_at in messages:
+        who = "You" if sender_id == identity.user_id else f"User {sender_id}"
+        st.markdown(f"**{who}** · {created_at}  \n{text}")
+    if messages and not before:
+        mark_thread_read(identity.user_id, thread_key, messages[-1][0])
+
+    with st.form("comm_thread_send", clear_on_submit=True):
+        text = st.text_input("Message", key="comm_thread_text")
+        if st.form_submit_button("Send") and text.strip():
+            send_inbox_message(
+                tenant_id=identity.institution_id,
+                thread_key=thread_key,
+                sender_id=identity.user_id,
+                text=text,
+            )
+            st.session_state.pop("comm_thread_before", None)
+            st.rerun()
+
+
+# -------------------------------------------------------------------
+# TIMETABLE
+# -------------------------------------------------------------------
+# Admins keep rooms, courses and the week shape; src/timetable.py turns
+# them into a clash-free weekly timetable that admins can hand-edit, lock
+# and re-solve around.
+WEEK_DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+TIMETABLE_COURSE_COLUMNS = ["code", "title", "lecturer", "class_name", "students", "sessions"]
+
+
+def _timetable_setup(identity: Identity, settings):
+    from db import list_timetable_courses, list_timetable_rooms, save_timetable_setup
+
+    st.markdown("#### Week")
+    c1, c2, c3, c4 = st.columns([3, 1, 1, 1])
+    days = c1.multiselect("Teaching days", WEEK_DAYS, default=settings["days"], key="tt_days")
+    periods = c2.number_input("Periods a day", min_value=1, max_value=16, value=settings["periods"], key="tt_periods")
+    first_period = c3.text_input("First period starts", value=settings["first_period"], key="tt_first")
+    period_minutes = c4.number_input(
+        "Minutes per period", min_value=15, max_value=240, step=5, value=settings["period_minutes"], key="tt_minutes"
+    )
+
+    st.markdown("#### Rooms")
+    rooms = st.data_editor(
+        pd.DataFrame(list_timetable_rooms(identity.institution_id), columns=["name", "capacity"]),
+        num_rows="dynamic",
+        hide_index=True,
+        use_container_width=True,
+        column_config={"capacity": st.column_config.NumberColumn(min_value=1, step=1)},
+        key="tt_rooms_editor",
+    )
+
+    st.markdown("#### Courses")
+    upload = st.file_uploader(
+        "Import courses (CSV with columns " + ", ".join(TIMETABLE_COURSE_COLUMNS) + ")",
+        type="csv",
+        key="tt_courses_csv",
+    )
+    if upload is not None:
+        courses = pd.read_csv(upload).reindex(columns=TIMETABLE_COURSE_COLUMNS)
+    else:
+        courses = pd.DataFrame(list_timetable_courses(identity.institution_id), columns=TIMETABLE_COURSE_COLUMNS)
+    courses = st.data_editor(
+        courses,
+        num_rows="dynamic",
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            "students": st.column_config.NumberColumn(min_value=0, step=1),
+            "sessions": st.column_config.NumberColumn("sessions / week", min_value=1, step=1),
+        },
+        key="tt_courses_editor",
+    )
+
+    if st.button("Save setup", key="tt_save_setup"):
+        room_rows = [
+            (str(name).strip(), int(capacity))
+            for name, capacity in rooms.itertuples(index=False)
+            if pd.notna(name) and str(name).strip() and pd.notna(capacity)
+        ]
+        course_rows = [
+            {
+                "code": str(row.code).strip(),
+                "title": "" if pd.isna(row.title) else str(row.title),
+                "lecturer": "" if pd.isna(row.lecturer) else str(row.lecturer).strip(),
+                "class_name": "" if pd.isna(row.class_name) else str(row.class_name).strip(),
+                "students": 0 if pd.isna(row.students) else int(row.students),
+                "sessions": 1 if pd.isna(row.sessions) else int(row.sessions),
+            }
+            for row in courses.itertuples(index=False)
+            if pd.notna(row.code) and str(row.code).strip()
+        ]
+        if not days:
+            st.warning("Choose at least one teaching day.")
+        elif len({name for name, _ in room_rows}) != len(room_rows) or any(c <= 0 for _, c in room_rows):
+            st.warning("Room names must be unique and capacities above zero.")
+        elif len({c["code"] for c in course_rows}) != len(course_rows) or any(c["sessions"] < 1 for c in course_rows):
+            st.warning("Course codes must be unique and every course needs at least one session.")
+        else:
+            try:
+                datetime.strptime(first_period, "%H:%M")
+            except ValueError:
+                st.warning("Enter the first period as HH:MM, e.g. 08:00.")
+                return
+            locked_dropped = save_timetable_setup(
+                identity.institution_id,
+                {
+                    "days": [d for d in WEEK_DAYS if d in days],
+                    "periods": int(periods),
+                    "first_period": first_period,
+                    "period_minutes": int(period_minutes),
+                },
+                room_rows,
+                course_rows,
+            )
+            notice = f"Saved {len(room_rows)} room(s) and {len(course_rows)} course(s)."
+            if locked_dropped:
+                notice += (
+                    f" {locked_dropped} locked session(s) were on a removed day, period or room and are "
+                    "unlocked now; place them again before the next solve if they must stay fixed."
+                )
+            st.session_state["tt_notice"] = notice
+            st.rerun()
+
+
+def _timetable_solve(identity: Identity, settings):
+    from timetable import DEFAULT_TIME_BUDGET, solve_institution
+
+    st.markdown("#### Generate")
+    budget = st.slider(
+        "Time budget (seconds)", min_value=5, max_value=120, value=int(DEFAULT_TIME_BUDGET), key="tt_budget"
+    )
+    c1, c2 = st.columns(2)
+    fresh = c1.button("Generate new timetable", key="tt_generate")
+    warm = c2.button("Re-solve around my edits", key="tt_resolve", help="Keeps locked sessions; moves as little as possible.")
+    if not (fresh or warm):
+        return
+    bar = st.progress(0.0)
+    status = st.empty()
+
+    def progress(p):
+        bar.progress(min(p["elapsed"] / p["budget"], 1.0) if p["budget"] else 1.0)
+        status.caption(
+            f"{p['elapsed']:.1f} s · {p['iterations']:,} moves tried · best so far: "
+            f"{p['hard']} clash(es), {p['soft']} same-day repeat(s)"
+        )
+
+    try:
+        result = solve_institution(
+            identity.institution_id, warm_start=warm, time_budget=budget, progress=progress
+        )
+    except ValueError as exc:
+        st.error(str(exc))
+        return
+    log_event(
+        tenant_id=identity.institution_id,
+        actor_id=identity.user_id,
+        event_type="campus_hub.admin.timetable_solved",
+        payload={k: result[k] for k in ("hard", "soft", "moved", "iterations", "elapsed", "stopped")},
+    )
+    notice = (
+        f"Timetable saved: {result['hard']} clash(es), {result['soft']} same-day repeat(s) "
+        f"after {result['elapsed']:.1f} s."
+    )
+    if warm:
+        notice += f" {result['moved']} session(s) moved."
+    if result["oversized"]:
+        notice += " No room is big enough for: " + ", ".join(result["oversized"]) + "."
+    st.session_state["tt_notice"] = notice
+    st.rerun()
+
+
+def _timetable_edit(identity: Identity, settings):
+    from db import list_timetable_courses, list_timetable_entries, list_timetable_rooms, save_timetable_entries
+    from timetable import count_same_day, find_clashes, period_labels, session_resources, slot_interval
+
+    entries = list_timetable_entries(identity.institution_id)
+    st.markdown("#### Edit & lock sessions")
+    if not entries:
+        st.info("No timetable yet. Save the setup and generate one.")
+        return
+    days, periods = settings["days"], settings["periods"]
+    times = period_labels(settings["first_period"], settings["period_minutes"], periods)
+    rooms = list_timetable_rooms(identity.institution_id)
+    courses = list_timetable_courses(identity.institution_id)
+    if settings["solved_at"]:
+        st.caption(
+            f"Last saved {settings['solved_at']} UTC · {settings['clashes']} clash(es) · "
+            f"{settings['same_day']} same-day repeat(s)"
+        )
+    edited = st.data_editor(
+        pd.DataFrame(
+            {
+                "course": [e[0] for e in entries],
+                "session": [e[1] + 1 for e in entries],
+                "day": [days[e[2] // periods] for e in entries],
+                "time": [times[e[2] % periods] for e in entries],
+                "room": [e[3] for e in entries],
+                "locked": [bool(e[4]) for e in entries],
+            }
+        ),
+        hide_index=True,
+        use_container_width=True,
+        disabled=["course", "session"],
+        column_config={
+            "day": st.column_config.SelectboxColumn(options=days, required=True),
+            "time": st.column_config.SelectboxColumn(options=times, required=True),
+            "room": st.column_config.SelectboxColumn(options=[name for name, _ in rooms], required=True),
+            "locked": st.column_config.CheckboxColumn(help="Locked sessions stay put when re-solving."),
+        },
+        key="tt_entries_editor",
+    )
+    placement = {
+        (row.course, int(row.session) - 1): (days.index(row.day) * periods + times.index(row.time), row.room)
+        for row in edited.itertuples(index=False)
+    }
+
+    # The index follows the editor: only sessions that changed since the
+    # last rerun are re-booked, and only edited sessions are checked.
+    index = _timetable_index(identity, settings, courses, entries)
+    by_code = {c["code"]: c for c in courses}
+    saved = {(e[0], e[1]): (e[2], e[3]) for e in entries}
+    feedback = []
+    for key, (slot, room) in placement.items():
+        start, end = slot_interval(slot, settings)
+        resources = session_resources(by_code.get(key[0], {}), room)
+        index.book(key, resources, start, end)
+        if saved.get(key) != (slot, room):
+            clashes = index.clashes(resources, start, end, ignore=key)
+            where = f"{key[0]} session {key[1] + 1} → {days[slot // periods]} {times[slot % periods]} in {room}"
+            if clashes:
+                others = ", ".join(f"{item[0]} ({kind} {name})" for (kind, name), _, _, item in clashes)
+                feedback.append(f"⚠️ {where}: clashes with {others}")
+            else:
+                feedback.append(f"✅ {where}: free")
+    for line in feedback[:20]:
+        st.write(line)
+
+    problems = find_clashes(courses, rooms, placement)
+    if problems:
+        with st.expander(f"⚠️ {len(problems)} clash(es) in this timetable"):
+            st.write("\n".join(f"- {p}" for p in problems[:100]))
+    if st.button("Save edits", key="tt_save_edits"):
+        locked = {(row.course, int(row.session) - 1) for row in edited.itertuples(index=False) if row.locked}
+        save_timetable_entries(
+            identity.institution_id,
+            [(code, k, slot, room, (code, k) in locked) for (code, k), (slot, room) in placement.items()],
+            len(problems),
+            count_same_day(courses, placement, periods),
+        )
+        st.session_state["tt_notice"] = "Timetable edits saved."
+        st.rerun()
+
+    st.markdown("#### Check a slot")
+    keys = sorted(placement)
+    c1, c2, c3 = st.columns(3)
+    key = c1.selectbox("Session", keys, format_func=lambda k: f"{k[0]} · session {k[1] + 1}", key="tt_check_session")
+    day = c2.selectbox("Day", days, key="tt_check_day")
+    time_label = c3.selectbox("Time", times, key="tt_check_time")
+    course = by_code.get(key[0], {})
+    slot = days.index(day) * periods + times.index(time_label)
+    start, end = slot_interval(slot, settings)
+    people = session_resources(course, "")[1:]
+    clashes = index.clashes(people, start, end, ignore=key)
+    if clashes:
+        st.warning(
+            "Clashes with " + ", ".join(f"{item[0]} ({kind} {name})" for (kind, name), _, _, item in clashes)
+        )
+    free_rooms = [
+        name
+        for name, capacity in rooms
+        if capacity >= int(course.get("students") or 0) and index.is_free(("room", name), start, end)
+    ]
+    st.write(
+        f"**Rooms free for {course.get('students') or 0} students:** "
+        + (", ".join(free_rooms[:30]) if free_rooms else "none")
+    )
+    first = days.index(day) * periods
+    day_start, day_end = slot_interval(first, settings)[0], slot_interval(first + periods - 1, settings)[1]
+    windows = index.free_windows(people, day_start, day_end)
+    st.write(
+        f"**{course.get('lecturer') or 'Lecturer'} and {course.get('class_name') or 'class'} are both free on {day}:** "
+        + (", ".join(f"{_clock(a)}-{_clock(b)}" for a, b in windows) if windows else "not at all")
+    )
+
+
+def _clock(minutes: int) -> str:
+    return f"{minutes % 1440 // 60:02d}:{minutes % 60:02d}"
+
+
+def _timetable_index(identity: Identity, settings, courses, entries):
+    """ScheduleIndex of the saved timetable, kept in the session until the timetable or setup changes."""
+    from timetable import schedule_index
+
+    version = (
+        identity.institution_id,
+        repr(settings),
+        tuple(entries),
+        tuple(tuple(c.values()) for c in courses),
+    )
+    cached = st.session_state.get("tt_index")
+    if cached is None or cached[0] != version:
+        placement = {(code, k): (slot, room) for code, k, slot, room, _ in entries}
+        cached = (version, schedule_index(courses, placement, settings))
+        st.session_state["tt_index"] = cached
+    return cached[1]
+
+
+def _timetable_admin(identity: Identity):
+    from db import get_timetable_settings
+
+    notice = st.session_state.pop("tt_notice", None)
+    if notice:
+        st.success(notice)
+    settings = get_timetable_settings(identity.institution_id)
+    _timetable_setup(identity, settings)
+    _timetable_solve(identity, settings)
+    _timetable_edit(identity, settings)
+
+
+def _timetable_view(identity: Identity):
+    from db import get_timetable_settings, list_timetable_courses, list_timetable_entries
+    from timetable import period_labels
+
+    entries = list_timetable_entries(identity.institution_id)
+    if not entries:
+        st.info("No timetable has been published for your institution yet.")
+        return
+    settings = get_timetable_settings(identity.institution_id)
+    days, periods = settings["days"], settings["periods"]
+    times = period_labels(settings["first_period"], settings["period_minutes"], periods)
+    courses = {c["code"]: c for c in list_timetable_courses(identity.institution_id)}
+
+    if identity.role == "Student":
+        user = st.session_state.get("current_user") or {}
+        field, value = "class_name", (user.get("student_id") or "").strip()
+    elif identity.role in ("Lecturer", "Staff"):
+        field, value = "lecturer", identity.full_name.strip()
+    else:
+        c1, c2 = st.columns([1, 2])
+        view = c1.selectbox("View by", ["Class", "Lecturer", "Room"], key="acad_tt_view")
+        if view == "Room":
+            options = sorted({e[3] for e in entries})
+        else:
+            field = "class_name" if view == "Class" else "lecturer"
+            options = sorted({c[field] for c in courses.values() if c[field]})
+        value = c2.selectbox(view, options, key="acad_tt_value") if options else ""
+        field = "room" if view == "Room" else field
+
+    def matches(code, room):
+        if field == "room":
+            return room == value
+        course = courses.get(code) or {}
+        return (course.get(field) or "").strip().lower() == (value or "").lower()
+
+    grid = {day: [""] * periods for day in days}
+    for code, _, slot, room, _ in entries:
+        if matches(code, room):
+            cell = grid[days[slot // periods]]
+            text = f"{code} · {room}"
+            cell[slot % periods] = f"{cell[slot % periods]}, {text}" if cell[slot % periods] else text
+    if not any(any(cells) for cells in grid.values()):
+        st.info(f"No sessions found for {value or 'this view'}.")
+        return
+    st.dataframe(pd.DataFrame(grid, index=times), use_container_width=True)
+
+    day = WEEK_DAYS[st.session_state.get("acad_tt_date", date.today()).weekday()]
+    if day in grid:
+        today = [(times[i], text) for i, text in enumerate(grid[day]) if text]
+        st.markdown(f"**{day}:** " + (" · ".join(f"{t} {text}" for t, text in today) if today else "no sessions"))
+
+
+# -------------------------------------------------------------------
+# ACADEMIC CALENDAR
+# -------------------------------------------------------------------
+CALENDAR_KINDS = ["Semester", "Exams", "Break", "Event"]
+# Kinds an entry may not overlap; events may overlap anything.
+CALENDAR_CLASHES = {
+    "Semester": ("Semester", "Break"),
+    "Exams": ("Exams", "Break"),
+    "Break": ("Semester", "Exams", "Break"),
+    "Event": (),
+}
+
+
+def _calendar_index(identity: Identity):
+    """(entries, ScheduleIndex of the entries over date ordinals), cached in the session."""
+    from db import list_calendar_entries
+    from intervals import ScheduleIndex
+
+    entries = list_calendar_entries(identity.institution_id)
+    version = (identity.institution_id, tuple(entries))
+    cached = st.session_state.get("admin_cal_index")
+    if cached is None or cached[0] != version:
+        index = ScheduleIndex(
+            (
+                entry_id,
+                [("calendar", kind)],
+                date.fromisoformat(starts_on).toordinal(),
+                date.fromisoformat(ends_on).toordinal() + 1,
+            )
+            for entry_id, _, kind, starts_on, ends_on in entries
+        )
+        cached = (version, index)
+        st.session_state["admin_cal_index"] = cached
+    return entries, cached[1]
+
+
+def _academic_calendar(identity: Identity):
+    from db import add_calendar_entry, delete_calendar_entry, list_calendar_entries
+
+    notice = st.session_state.pop("admin_cal_notice", None)
+    if notice:
+        st.success(notice)
+    entries, index = _calendar_index(identity)
+    by_id = {row[0]: row for row in entries}
+
+    c1, c2 = st.columns([2, 1])
+    title = c1.text_input("Title", placeholder="e.g. Semester 1 2026/27", key="admin_cal_title")
+    kind = c2.selectbox("Kind", CALENDAR_KINDS, key="admin_cal_kind")
+    c3, c4 = st.columns(2)
+    start = c3.date_input("Starts", key="admin_sem_start")
+    end = c4.date_input("Ends", key="admin_sem_end")
+
+    clashes = []
+    if end < start:
+        st.warning("The end date is before the start date.")
+    else:
+        first, last = start.toordinal(), end.toordinal() + 1
+        resources = [("calendar", k) for k in CALENDAR_CLASHES[kind]]
+        clashes = index.clashes(resources, first, last)
+        if clashes:
+            overlaps = [by_id[item] for *_, item in clashes]
+            st.warning("Overlaps " + ", ".join(f"{r[1]} ({r[2]}, {r[3]} – {r[4]})" for r in overlaps))
+            # Suggest free stretches of the same length within half a year.
+            length = last - first
+            windows = [
+                (a, b) for a, b in index.free_windows(resources, first - 183, last + 183) if b - a >= length
+            ]
+            if windows:
+                spans = [f"{date.fromordinal(a):%d %b %Y} – {date.fromordinal(b - 1):%d %b %Y}" for a, b in windows[:6]]
+                st.caption(f"Free for a {length}-day {kind.lower()}: " + ", ".join(spans))
+        elif resources:
+            st.caption(f"✅ No clashing {' / '.join(CALENDAR_CLASHES[kind]).lower()} entries.")
+
+    if st.button("Add to calendar", key="admin_sem_save"):
+        if not title.strip():
+            st.warning("Give the entry a title.")
+        elif end < start or clashes:
+            st.error("Resolve the dates first.")
+        else:
+            entry_id = add_calendar_entry(
+                identity.institution_id, title.strip(), kind, start.isoformat(), end.isoformat()
+            )
+            index.book(entry_id, [("calendar", kind)], start.toordinal(), end.toordinal() + 1)
+            st.session_state["admin_cal_index"] = (
+                (identity.institution_id, tuple(list_calendar_entries(identity.institution_id))),
+                index,
+            )
+            st.session_state["admin_cal_notice"] = f"Added {kind.lower()} “{title.strip()}”."
+            st.rerun()
+
+    if entries:
+        st.dataframe(
+            {
+                "title": [r[1] for r in entries],
+                "kind": [r[2] for r in entries],
+                "starts": [r[3] for r in entries],
+                "ends": [r[4] for r in entries],
+            },
+            use_container_width=True,
+            hide_index=True,
+        )
+        c5, c6 = st.columns([3, 1])
+        entry_id = c5.selectbox(
+            "Remove an entry",
+            [r[0] for r in entries],
+            format_func=lambda i: f"{by_id[i][1]} ({by_id[i][3]} – {by_id[i][4]})",
+            key="admin_cal_remove",
+        )
+        if c6.button("Remove", key="admin_cal_remove_btn") and delete_calendar_entry(identity.institution_id, entry_id):
+            index.cancel(entry_id)
+            st.session_state["admin_cal_index"] = (
+                (identity.institution_id, tuple(list_calendar_entries(identity.institution_id))),
+                index,
+            )
+            st.session_state["admin_cal_notice"] = "Calendar entry removed."
+            st.rerun()
+
+
+# -------------------------------------------------------------------
+# COURSE ENROLLMENT
+# -------------------------------------------------------------------
+def _course_table(rows):
+    st.dataframe(
+        {
+            "code": [r[0] for r in rows],
+            "title": [r[1] for r in rows],
+            "lecturer": [r[2] for r in rows],
+            "seats": [r[3] for r in rows],
+            "free": [r[3] - r[4] for r in rows],
+            "waitlist": [r[5] for r in rows],
+        },
+        use_container_width=True,
+        hide_index=True,
+    )
+
+
+def _course_enrollment(identity: Identity, search: str):
+    from db import list_course_seats, list_student_enrollments
+    from enrollment import drop, enroll
+
+    institution = identity.institution_id
+    student_id = int(identity.user_id) if identity.user_id.isdigit() else 0
+    notice = st.session_state.pop("enroll_notice", None)
+    if notice:
+        st.success(notice)
+
+    courses = list_course_seats(institution, search)
+    if not courses:
+        st.info("No courses are open for enrollment yet.")
+    else:
+        _course_table(courses)
+        code = st.selectbox(
+            "Course",
+            [r[0] for r in courses],
+            format_func=lambda c: next(f"{r[0]} · {r[1]}" for r in courses if r[0] == c),
+            key="enroll_course",
+        )
+        if st.button("Enroll", key="enroll_btn"):
+            # Same key for every click until the outcome is shown, so a
+            # double click enrolls once.
+            nonce = st.session_state.setdefault("enroll_nonce", uuid.uuid4().hex)
+            try:
+                result = enroll(institution, code, student_id, request_key=f"enroll:{student_id}:{code}:{nonce}")
+            except (KeyError, RuntimeError, TimeoutError) as exc:
+                st.warning(f"Could not enroll in {code}: {exc}")
+            else:
+                st.session_state.pop("enroll_nonce", None)
+                log_event(
+                    tenant_id=institution,
+                    actor_id=identity.user_id,
+                    event_type="campus_hub.academic.enroll",
+                    payload={"code": code, "status": result["status"], "attempts": result["attempts"]},
+                )
+                st.session_state["enroll_notice"] = (
+                    f"You are enrolled in {code}."
+                    if result["status"] == "enrolled"
+                    else f"{code} is full; you are on the waitlist and will be enrolled when a seat opens."
+                )
+                st.rerun()
+
+    mine = list_student_enrollments(institution, student_id)
+    st.markdown("#### My courses")
+    if not mine:
+        st.caption("You are not enrolled in any course yet.")
+    for code, title, status, position in mine:
+        c1, c2 = st.columns([4, 1])
+        c1.markdown(
+            f"**{code}** · {title} · "
+            + ("enrolled" if status == "enrolled" else f"waitlisted (position {position})")
+        )
+        if c2.button("Drop", key=f"enroll_drop_{code}"):
+            drop(institution, code, student_id, sender_id=identity.user_id)
+            log_event(
+                tenant_id=institution,
+                actor_id=identity.user_id,
+                event_type="campus_hub.academic.drop",
+                payload={"code": code, "status": status},
+            )
+            st.session_state["enroll_notice"] = f"You have left {code}."
+            st.rerun()
+
+
+def _course_seats_admin(identity: Identity, search: str):
+    from db import list_course_seats, list_timetable_courses
+    from enrollment import set_capacities
+
+    institution = identity.institution_id
+    notice = st.session_state.pop("enroll_admin_notice", None)
+    if notice:
+        st.success(notice)
+
+    courses = list_course_seats(institution, search, limit=500)
+    if courses:
+        _course_table(courses)
+    else:
+        st.info("No courses are open for enrollment yet.")
+
+    c1, c2 = st.columns(2)
+    with c1:
+        st.markdown("#### Open courses")
+        timetable = list_timetable_courses(institution)
+        if timetable and st.button(
+            f"Open the {len(timetable)} timetable course(s)", key="enroll_from_timetable"
+        ):
+            promoted = set_capacities(
+                institution,
+                [(c["code"], c["title"], c["lecturer"], int(c["students"])) for c in timetable],
+                sender_id=identity.user_id,
+            )
+            st.session_state["enroll_admin_notice"] = (
+                f"{len(timetable)} course(s) open for enrollment; {promoted} student(s) moved off waitlists."
+            )
+            st.rerun()
+        upload = st.file_uploader("CSV: code, title, lecturer, capacity", type="csv", key="enroll_courses_csv")
+        if upload is not None and st.button("Import courses", key="enroll_courses_import"):
+            frame = pd.read_csv(upload)
+            rows = [
+                (
+                    str(r.code).strip(),
+                    str(r.title).strip(),
+                    "" if pd.isna(r.lecturer) else str(r.lecturer).strip(),
+                    int(r.capacity),
+                )
+                for r in frame.itertuples(index=False)
+                if pd.notna(r.code) and pd.notna(r.capacity)
+            ]
+            promoted = set_capacities(institution, rows, sender_id=identity.user_id)
+            st.session_state["enroll_admin_notice"] = (
+                f"Imported {len(rows)} course(s); {promoted} student(s) moved off waitlists."
+            )
+            st.rerun()
+    with c2:
+        st.markdown("#### Change capacity")
+        if courses:
+            with st.form("enroll_capacity_form"):
+                code = st.selectbox("Course", [r[0] for r in courses], key="enroll_capacity_code")
+                capacity = st.number_input("Seats", min_value=0, step=1, key="enroll_capacity_seats")
+                if st.form_submit_button("Save capacity"):
+                    row = next(r for r in courses if r[0] == code)
+                    promoted = set_capacities(
+                        institution, [(code, row[1], row[2], int(capacity))], sender_id=identity.user_id
+                    )
+                    log_event(
+                        tenant_id=institution,
+                        actor_id=identity.user_id,
+                        event_type="campus_hub.academic.capacity",
+                        payload={"code": code, "capacity": int(capacity), "promoted": promoted},
+                    )
+                    st.session_state["enroll_admin_notice"] = (
+                        f"{code} capacity saved (never below the students already enrolled); "
+                        f"{promoted} student(s) moved off the waitlist."
+                    )
+                    st.rerun()
+
+
+# -------------------------------------------------------------------
+# HOSTELS
+# -------------------------------------------------------------------
+def _hostel_listings(identity: Identity, search: str):
+    from db import hostel_occupancy
+    from fees import current_term
+
+    rows = [
+        r
+        for r in hostel_occupancy(identity.institution_id, current_term())
+        if search.strip().lower() in r[0].lower()
+    ]
+    if not rows:
+        st.info("No hostel rooms have been listed yet.")
+        return
+    st.dataframe(
+        {
+            "hostel": [r[0] for r in rows],
+            "room type": [r[1] for r in rows],
+            "rooms": [r[2] for r in rows],
+            "beds": [r[3] for r in rows],
+            "free beds": [r[3] - r[4] for r in rows],
+        },
+        use_container_width=True,
+        hide_index=True,
+    )
+
+
+def _hostel_application(identity: Identity):
+    from db import get_hostel_application, hostel_occupancy, upsert_hostel_applications
+    from fees import current_term
+    from hostels import TIER_LABELS, priority_tier
+
+    term = current_term()
+    student_id = int(identity.user_id) if identity.user_id.isdigit() else 0
+    application = get_hostel_application(identity.institution_id, term, student_id)
+    if application and application["status"] == "allocated":
+        st.success(
+            f"Your bed for {term}: {application['hostel']}, room {application['room']} "
+            f"(floor {application['floor']}, {application['room_type']}), bed {application['bed'] + 1}."
+        )
+        return
+    if application:
+        st.info(
+            f"Application for {term}: {application['status']} · priority: {TIER_LABELS[application['tier']]}"
+        )
+        if (
+            application["requested_tier"] < application["tier"]
+            or application["requested_accessible"] > application["accessible"]
+        ):
+            st.caption(
+                f"Requested priority ({TIER_LABELS[application['requested_tier']]}"
+                + (", accessible room" if application["requested_accessible"] else "")
+                + ") is waiting for confirmation by the hostel office."
+            )
+
+    inventory = hostel_occupancy(identity.institution_id, term)
+    hostel_names = ["Any"] + sorted({r[0] for r in inventory})
+    room_types = ["Any"] + sorted({r[1] for r in inventory})
+    choices = []
+    for n in range(3):
+        c1, c2 = st.columns(2)
+        hostel = c1.selectbox(f"Choice {n + 1}: hostel", hostel_names, key=f"hostel_pref_{n}_hostel")
+        room_type = c2.selectbox(f"Choice {n + 1}: room type", room_types, key=f"hostel_pref_{n}_type")
+        choice = ("" if hostel == "Any" else hostel, "" if room_type == "Any" else room_type)
+        if choice != ("", "") and choice not in choices:
+            choices.append(choice)
+    first_year = st.checkbox("I am a first-year student", key="hostel_first_year")
+    accessible = st.checkbox("I need an accessible room", key="hostel_accessible")
+    accept_any = st.checkbox("Give me any free bed if my choices are full", value=True, key="hostel_accept_any")
+    if st.button("Apply for hostel", key="hostel_apply_btn"):
+        upsert_hostel_applications(
+            identity.institution_id,
+            term,
+            [(student_id, choices, priority_tier(accessible, first_year), accessible, accept_any)],
+            confirmed=False,
+        )
+        log_event(
+            tenant_id=identity.institution_id,
+            actor_id=identity.user_id,
+            event_type="campus_hub.hostel.apply",
+            payload={"term": term, "choices": len(choices)},
+        )
+        st.success(
+            "Hostel application submitted. Beds are allocated in one batch at the start of term; "
+            "first-year and accessibility priority apply once the hostel office confirms them."
+        )
+
+
+def _csv_flag(value) -> bool:
+    return str(value).strip().lower() in ("1", "true", "yes", "y")
+
+
+def _parse_hostel_choice(value) -> tuple:
+    """'Block A/Double' -> ('Block A', 'Double'); 'Any' or blank parts match anything."""
+    if pd.isna(value):
+        return None
+    hostel, _, room_type = str(value).partition("/")
+    hostel, room_type = hostel.strip(), room_type.strip()
+    choice = ("" if hostel.lower() == "any" else hostel, "" if room_type.lower() == "any" else room_type)
+    return choice if choice != ("", "") else None
+
+
+def _hostel_allocation_admin(identity: Identity):
+    from db import (
+        confirm_hostel_priority,
+        hostel_application_counts,
+        hostel_occupancy,
+        list_hostel_allocations,
+        list_hostel_priority_requests,
+        release_hostel_bed,
+        upsert_hostel_applications,
+        upsert_hostel_rooms,
+    )
+    from fees import current_term
+    from hostels import TIER_LABELS, allocate_term, floor_occupancy, priority_tier
+
+    institution = identity.institution_id
+    notice = st.session_state.pop("hostel_notice", None)
+    if notice:
+        st.success(notice)
+    term = st.text_input("Term", value=current_term(), key="hostel_term").strip()
+
+    inventory = hostel_occupancy(institution, term)
+    counts = hostel_application_counts(institution, term)
+    beds = sum(r[3] for r in inventory)
+    occupied = sum(r[4] for r in inventory)
+    waiting = sum(n for _, status, n in counts if status != "allocated")
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Beds", f"{beds:,}")
+    m2.metric("Occupied", f"{occupied:,}")
+    m3.metric("Free", f"{beds - occupied:,}")
+    m4.metric("Waiting applications", f"{waiting:,}")
+
+    if st.button("Run allocation", key="hostel_allocate_btn", disabled=not waiting):
+        result = allocate_term(institution, term)
+        log_event(
+            tenant_id=institution,
+            actor_id=identity.user_id,
+            event_type="campus_hub.hostel.allocate",
+            payload=dict(result, term=term),
+        )
+        st.session_state["hostel_notice"] = (
+            f"Allocated {result['allocated']:,} of {result['applications']:,} application(s) in "
+            f"{result['elapsed']:.2f} s; {result['waitlisted']:,} waitlisted, {result['free_beds']:,} bed(s) free."
+        )
+        st.rerun()
+
+    if counts:
+        st.dataframe(
+            {
+                "priority": [TIER_LABELS.get(tier, tier) for tier, _, _ in counts],
+                "status": [status for _, status, _ in counts],
+                "applications": [n for _, _, n in counts],
+            },
+            use_container_width=True,
+            hide_index=True,
+        )
+
+    requests = list_hostel_priority_requests(institution, term)
+    if requests:
+        st.markdown(f"#### Priority requests to confirm ({len(requests):,})")
+        st.dataframe(
+            {
+                "student_id": [r[0] for r in requests],
+                "name": [r[1] for r in requests],
+                "requested": [TIER_LABELS.get(r[2], r[2]) for r in requests],
+                "accessible room": ["yes" if r[3] else "" for r in requests],
+                "confirmed": [TIER_LABELS.get(r[4], r[4]) for r in requests],
+            },
+            use_container_width=True,
+            hide_index=True,
+        )
+        confirm_ids = st.multiselect(
+            "Students whose priority is verified", [r[0] for r in requests], key="hostel_confirm_ids"
+        )
+        if st.button("Confirm priority", key="hostel_confirm_btn", disabled=not confirm_ids):
+            confirmed = confirm_hostel_priority(institution, term, confirm_ids)
+            log_event(
+                tenant_id=institution,
+                actor_id=identity.user_id,
+                event_type="campus_hub.hostel.confirm_priority",
+                payload={"term": term, "students": confirmed},
+            )
+            st.session_state["hostel_notice"] = f"Confirmed priority for {confirmed:,} application(s)."
+            st.rerun()
+
+    with st.expander("Occupancy by hostel and floor"):
+        floors = floor_occupancy(institution, term)
+        st.dataframe(
+            {
+                "hostel": [r[0] for r in floors],
+                "floor": [r[1] for r in floors],
+                "beds": [r[2] for r in floors],
+                "free": [r[3] for r in floors],
+            },
+            use_container_width=True,
+            hide_index=True,
+        )
+
+    c1, c2 = st.columns(2)
+    with c1:
+        st.markdown("#### Import rooms")
+        upload = st.file_uploader(
+            "CSV: hostel, floor, room, room_type, beds, accessible", type="csv", key="hostel_rooms_csv"
+        )
+        if upload is not None and st.button("Import rooms", key="hostel_rooms_import"):
+            frame = pd.read_csv(upload)
+            rows = [
+                (
+                    str(r.hostel).strip(),
+                    int(r.floor),
+                    str(r.room).strip(),
+                    str(r.room_type).strip(),
+                    int(r.beds),
+                    _csv_flag(r.accessible),
+                )
+                for r in frame.itertuples(index=False)
+                if pd.notna(r.hostel) and pd.notna(r.room) and pd.notna(r.beds) and int(r.beds) > 0
+            ]
+            st.session_state["hostel_notice"] = f"Imported {upsert_hostel_rooms(institution, rows):,} room(s)."
+            st.rerun()
+    with c2:
+        st.markdown("#### Import applications")
+        upload = st.file_uploader(
+            "CSV: student_id, first_year, accessible, accept_any, choice1, choice2, choice3 "
+            "(choices as Hostel/Room type; registry data, so priority counts as confirmed)",
+            type="csv",
+            key="hostel_apps_csv",
+        )
+        if upload is not None and st.button("Import applications", key="hostel_apps_import"):
+            frame = pd.read_csv(upload)
+            rows = []
+            for r in frame.to_dict("records"):
+                if pd.isna(r.get("student_id")):
+                    continue
+                choices = [_parse_hostel_choice(r.get(f"choice{n}")) for n in (1, 2, 3)]
+                accessible = _csv_flag(r.get("accessible"))
+                rows.append(
+                    (
+                        int(r["student_id"]),
+                        [c for c in choices if c],
+                        priority_tier(accessible, _csv_flag(r.get("first_year"))),
+                        accessible,
+                        _csv_flag(r.get("accept_any", True)),
+                    )
+                )
+            written = upsert_hostel_applications(institution, term, rows)
+            st.session_state["hostel_notice"] = f"Imported {written:,} application(s) for {term}."
+            st.rerun()
+
+    st.markdown("#### Allocations")
+    with st.form("hostel_release_form", clear_on_submit=True):
+        student_id = st.number_input("Student user ID", min_value=1, step=1, key="hostel_student_id")
+        if st.form_submit_button("Release bed"):
+            if release_hostel_bed(institution, term, int(student_id)):
+                st.session_state["hostel_notice"] = "Bed released; the application is pending again."
+                st.rerun()
+            st.warning("That student has no bed this term.")
+    allocations = list_hostel_allocations(institution, term)
+    if allocations:
+        st.dataframe(
+            {
+                "student_id": [r[0] for r in allocations],
+                "name": [r[1] for r in allocations],
+                "hostel": [r[2] for r in allocations],
+                "floor": [r[3] for r in allocations],
+                "room": [r[4] for r in allocations],
+                "type": [r[5] for r in allocations],
+                "bed": [r[6] + 1 for r in allocations],
+                "allocated": [r[7] for r in allocations],
+            },
+            use_container_width=True,
+            hide_index=True,
+        )
+
+
 # -------------------------------------------------------------------
 # MAIN ENTRY (CALLED BY SHELL)
 # -------------------------------------------------------------------
@@ -240,9 +1515,17 @@ def ui_academic_life(identity: Identity):
     with tab[0]:
         st.markdown("### Course & Unit Enrollment")
         _info_pill("Backed by SANZAD Identity & Institution APIs")
-        st.write("Demo: list courses pulled from SANZAD Core (placeholder).")
-        st.text_input("Search course / unit", key="acad_search_course")
-        st.button("Request enrollment (demo)", key="acad_enroll_btn")
+        search = st.text_input("Search course / unit", key="acad_search_course")
+        if _CORE:
+            st.info("Courses are listed by SANZAD Academic core.")
+        elif identity.role == "Student":
+            _course_enrollment(identity, search)
+        elif identity.role in ("Institution Admin", "Staff"):
+            _course_seats_admin(identity, search)
+        else:
+            from db import list_course_seats
+
+            _course_table(list_course_seats(identity.institution_id, search))
         log_event(
             tenant_id=identity.institution_id,
             actor_id=identity.user_id,
@@ -254,7 +1537,10 @@ def ui_academic_life(identity: Identity):
     with tab[1]:
         st.markdown("### Timetables & Academic Calendars")
         st.date_input("Filter by date", key="acad_tt_date", value=date.today())
-        st.info("Timetables are generated by SANZAD Academic core (placeholder).")
+        if _CORE:
+            st.info("Timetables are generated by SANZAD Academic core.")
+        else:
+            _timetable_view(identity)
 
     # 3. Learning Resources
     with tab[2]:
@@ -271,11 +1557,12 @@ def ui_academic_life(identity: Identity):
     with tab[3]:
         st.markdown("### Smart Attendance")
         _info_pill("Linked with Digital ID & QR check-in")
-        if identity.role in ("Lecturer", "Staff"):
-            st.button("Generate attendance session QR (demo)", key="att_gen_qr")
-        if identity.role == "Student":
-            st.text_input("Enter/scan attendance token", key="att_token")
-            st.button("Mark my attendance (demo)", key="att_mark_btn")
+        if _CORE:
+            st.info("Attendance sessions are issued by SANZAD Core.")
+        elif identity.role in ("Lecturer", "Staff"):
+            _attendance_lecturer(identity)
+        elif identity.role == "Student":
+            _attendance_student(identity)
 
     # 5. Grades & Transcripts
     with tab[4]:
@@ -290,19 +1577,13 @@ def ui_academic_life(identity: Identity):
     with tab[5]:
         st.markdown("### Lecturer Announcements")
         if identity.role in ("Lecturer", "Staff"):
+            audience = _audience_picker(identity, "ann_audience", by_class=True)
             title = st.text_input("Announcement title", key="ann_title")
             body = st.text_area("Announcement body", key="ann_body")
-            if st.button("Publish announcement (demo)", key="ann_publish_btn"):
-                send_notification(
-                    tenant_id=identity.institution_id,
-                    user_ids=[],  # would be course participants
-                    title=title,
-                    body=body,
-                    tags=["academic", "announcement"],
-                )
-                st.success("Announcement sent (demo).")
+            if st.button("Publish announcement", key="ann_publish_btn"):
+                _announce(identity, audience, title, body, ["academic", "announcement"])
         else:
-            st.info("Course announcements appear here (placeholder).")
+            _inbox(identity)
 
     st.markdown("</div>", unsafe_allow_html=True)
 
@@ -328,6 +1609,7 @@ def ui_campus_admin(identity: Identity):
             "📅 Academic Calendars",
             "👥 Staff Roles",
             "📜 Policies & Notices",
+            "🗓️ Timetable",
         ]
     )
 
@@ -345,9 +1627,10 @@ def ui_campus_admin(identity: Identity):
 
     with tab[2]:
         st.markdown("### Academic Calendars")
-        st.date_input("Semester start", key="admin_sem_start")
-        st.date_input("Semester end", key="admin_sem_end")
-        st.button("Save academic calendar (demo)", key="admin_sem_save")
+        if _CORE:
+            st.info("Academic calendars are managed by SANZAD Academic core.")
+        else:
+            _academic_calendar(identity)
 
     with tab[3]:
         st.markdown("### Staff approvals & roles")
@@ -365,6 +1648,13 @@ def ui_campus_admin(identity: Identity):
         policy_body = st.text_area("Policy body / notice content", key="admin_policy_body")
         st.button("Publish notice (demo)", key="admin_policy_publish")
 
+    with tab[5]:
+        st.markdown("### Timetable generator")
+        if _CORE:
+            st.info("Timetables are generated by SANZAD Academic core.")
+        else:
+            _timetable_admin(identity)
+
     st.markdown("</div>", unsafe_allow_html=True)
 
 
@@ -396,20 +1686,16 @@ def ui_mess_hub(identity: Identity):
             ["Breakfast", "Lunch", "Supper"],
             key="mess_meal_select",
         )
-        st.text("Price: shown from SANZAD (demo)")
-
-        if st.button("Pay via SANZAD Pay (demo)", key="mess_pay_btn"):
-            payment = create_payment_request(
-                tenant_id=identity.institution_id,
-                payer_id=identity.user_id,
-                amount=150.0,
-                currency="KES",
-                description=f"{meal} mess meal",
-                metadata={"domain": "mess", "meal_type": meal},
-            )
-            st.success(
-                f"Payment request created (demo). Scan QR at: {payment['qr_url']}"
-            )
+        st.text("Price: KES 150.00")
+
+        payment = _pay(
+            identity,
+            "mess",
+            amount=150.0,
+            description=f"{meal} mess meal",
+            metadata={"domain": "mess", "meal_type": meal},
+        )
+        if payment:
             log_event(
                 tenant_id=identity.institution_id,
                 actor_id=identity.user_id,
@@ -470,23 +1756,20 @@ def ui_hostel_hub(identity: Identity):
 
     with tab[0]:
         st.markdown("### Hostel Listings")
-        st.info("Listings are fetched from SANZAD Accommodation service (demo).")
-        st.text_input("Filter by area / hostel name", key="hostel_filter")
+        search = st.text_input("Filter by area / hostel name", key="hostel_filter")
+        if _CORE:
+            st.info("Listings are fetched from SANZAD Accommodation service.")
+        else:
+            _hostel_listings(identity, search)
 
     with tab[1]:
         st.markdown("### Applications & Tenancy")
-        if identity.role == "Student":
-            st.text_input("Preferred hostel / room type", key="hostel_pref")
-            if st.button("Apply for hostel (demo)", key="hostel_apply_btn"):
-                st.success("Hostel application submitted (demo).")
-        if identity.role in ("Institution Admin", "Vendor / Service Provider"):
-            st.text_input("Student ID / reg no", key="hostel_student_id")
-            st.selectbox(
-                "Decision",
-                ["Pending", "Approved", "Rejected"],
-                key="hostel_decision",
-            )
-            st.button("Update application (demo)", key="hostel_update_app")
+        if _CORE:
+            st.info("Applications are handled by SANZAD Accommodation service.")
+        elif identity.role == "Student":
+            _hostel_application(identity)
+        elif identity.role in ("Institution Admin", "Vendor / Service Provider"):
+            _hostel_allocation_admin(identity)
 
     with tab[2]:
         st.markdown("### Maintenance Requests")
@@ -663,18 +1946,19 @@ def ui_finance(identity: Identity):
         amount = st.number_input(
             "Amount", min_value=0.0, step=100.0, key="fin_pay_amount"
         )
-        if st.button("Pay via SANZAD Pay (demo)", key="fin_pay_btn"):
-            payment = create_payment_request(
-                tenant_id=identity.institution_id,
-                payer_id=identity.user_id,
-                amount=amount,
-                currency="KES",
-                description=payment_type,
-                metadata={"domain": "finance", "type": payment_type},
-            )
-            st.success(
-                f"Payment created (demo). Scan QR:\n{payment['qr_url']}"
-            )
+        metadata = {"domain": "finance", "type": payment_type}
+        if payment_type == "Tuition":
+            # Only fee payments count towards fee balances (db.reconcile_fees).
+            from fees import current_term
+
+            metadata.update(kind="fee", term=current_term())
+        _pay(
+            identity,
+            "fin",
+            amount=amount,
+            description=payment_type,
+            metadata=metadata,
+        )
 
     with tab[1]:
         st.markdown("### Institution billing")
@@ -727,23 +2011,18 @@ def ui_communication(identity: Identity):
 
     with tab[0]:
         st.markdown("### Groups & channels")
-        st.info("Backed by SANZAD Messaging core (demo).")
-        st.text_input("Create or join group by code", key="comm_group_code")
+        _threads(identity)
 
     with tab[1]:
         st.markdown("### Institution announcements & event broadcasts")
         if identity.role in ("Institution Admin", "Lecturer", "Staff"):
+            audience = _audience_picker(identity, "comm_announcement_audience", by_class=False)
             title = st.text_input("Announcement title", key="comm_announcement_title")
             body = st.text_area("Message", key="comm_announcement_body")
-            if st.button("Broadcast announcement (demo)", key="comm_announcement_send"):
-                send_notification(
-                    tenant_id=identity.institution_id,
-                    user_ids=[],
-                    title=title,
-                    body=body,
-                    tags=["announcement"],
-                )
-                st.success("Announcement broadcasted (demo).")
+            if st.button("Broadcast announcement", key="comm_announcement_send"):
+                _announce(identity, audience, title, body, ["announcement"])
+        st.markdown("#### My notifications")
+        _inbox(identity)
 
     with tab[2]:
         st.markdown("### Polls & surveys")
@@ -782,7 +2061,10 @@ def ui_analytics(identity: Identity):
 
     with tab[0]:
         st.markdown("### Student performance & attendance")
-        st.info("Charts powered by SANZAD Analytics Engine (demo).")
+        if _CORE:
+            st.info("Charts powered by SANZAD Analytics Engine.")
+        else:
+            _attendance_overview(identity)
 
     with tab[1]:
         st.markdown("### Revenue & service usage")
@@ -1,6 +1,8 @@
 import streamlit as st
 import pandas as pd
 
+from session_memory import load_offloaded, offloaded_count
+
 def render(role: str):
     st.header("Community Hub")
     st.write("Discussions, mentorship, clubs, and events.")
@@ -29,8 +31,14 @@ def render(role: str):
 
     with right:
         st.subheader("Active Topics (This Session)")
-        if st.session_state.community_topics:
-            df = pd.DataFrame(st.session_state.community_topics)
+        topics = st.session_state.community_topics
+        older = offloaded_count("community_topics")
+        if older and st.checkbox(
+            f"Include {older} older topic(s) moved to disk to save memory", key="community_include_offloaded"
+        ):
+            topics = load_offloaded("community_topics") + topics
+        if topics:
+            df = pd.DataFrame(topics)
             st.dataframe(df)
         else:
             st.write("No topics yet. Create the first one!")
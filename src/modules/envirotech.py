@@ -1,6 +1,9 @@
 import streamlit as st
 import pandas as pd
 
+from media_store import get_media_store
+from session_memory import load_offloaded, offloaded_count
+
 
 def _init_env_reports():
     """Ensure the env_reports list exists in session state."""
@@ -104,6 +107,18 @@ def render(role: str):
                 elif not full_location:
                     st.error("Please provide at least some location information.")
                 else:
+                    # Session state keeps only handles; the bytes live in the shared media store.
+                    store = get_media_store()
+                    image = (
+                        store.put(image_file.read(), image_file.name, image_file.type)
+                        if image_file is not None
+                        else None
+                    )
+                    audio = (
+                        store.put(audio_file.read(), audio_file.name, audio_file.type)
+                        if audio_file is not None
+                        else None
+                    )
                     report = {
                         "reporter": user_name,
                         "role": role,
@@ -116,10 +131,8 @@ def render(role: str):
                         "location": full_location,
                         "has_image": bool(image_file),
                         "has_audio": bool(audio_file),
-                        "image_bytes": image_file.read() if image_file is not None else None,
-                        "image_name": image_file.name if image_file is not None else "",
-                        "audio_bytes": audio_file.read() if audio_file is not None else None,
-                        "audio_name": audio_file.name if audio_file is not None else "",
+                        "image": image,
+                        "audio": audio,
                     }
 
                     st.session_state["env_reports"].append(report)
@@ -133,6 +146,11 @@ def render(role: str):
     st.subheader("Browse environment reports")
 
     reports = st.session_state.get("env_reports", [])
+    older = offloaded_count("env_reports")
+    if older and st.checkbox(
+        f"Include {older} older report(s) moved to disk to save memory", key="env_include_offloaded"
+    ):
+        reports = load_offloaded("env_reports") + reports
     if not reports:
         st.write("No reports have been submitted yet.")
         return
@@ -192,6 +210,7 @@ def render(role: str):
 
     # Detailed cards with media and download buttons
     st.markdown("### Report details with media")
+    store = get_media_store()
 
     for idx, r in enumerate(filtered):
         with st.expander(f"{r['type']} – {r['severity']} – {r['location'][:50]}"):
@@ -207,31 +226,37 @@ def render(role: str):
 
             # Image preview + download
             with media_cols[0]:
-                if r.get("has_image") and r.get("image_bytes"):
+                image_path = store.path(r.get("image"))
+                if image_path:
                     st.markdown("**Photo evidence**")
-                    st.image(r["image_bytes"], use_column_width=True)
+                    st.image(image_path, use_column_width=True)
                     st.download_button(
                         label="Download photo",
-                        data=r["image_bytes"],
-                        file_name=r.get("image_name") or "envirotech_photo.jpg",
-                        mime="image/jpeg",
+                        data=store.reader(r["image"]),
+                        file_name=r["image"].name or "envirotech_photo.jpg",
+                        mime=r["image"].mime or "image/jpeg",
                         key=f"download_img_{idx}",
                     )
+                elif r.get("has_image"):
+                    st.markdown("_Photo is no longer available._")
                 else:
                     st.markdown("_No photo uploaded._")
 
             # Audio playback + download
             with media_cols[1]:
-                if r.get("has_audio") and r.get("audio_bytes"):
+                audio_path = store.path(r.get("audio"))
+                if audio_path:
                     st.markdown("**Audio evidence**")
-                    st.audio(r["audio_bytes"])
+                    st.audio(audio_path, format=r["audio"].mime or "audio/mpeg")
                     st.download_button(
                         label="Download audio",
-                        data=r["audio_bytes"],
-                        file_name=r.get("audio_name") or "envirotech_audio.mp3",
-                        mime="audio/mpeg",
+                        data=store.reader(r["audio"]),
+                        file_name=r["audio"].name or "envirotech_audio.mp3",
+                        mime=r["audio"].mime or "audio/mpeg",
                         key=f"download_audio_{idx}",
                     )
+                elif r.get("has_audio"):
+                    st.markdown("_Audio is no longer available._")
                 else:
                     st.markdown("_No audio uploaded._")
 
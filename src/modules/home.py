@@ -4,44 +4,58 @@ import streamlit as st
 import pandas as pd
 from translations import t
 from db import (
-    list_institutions,
     add_institution_application,
     approve_institution_db,
     delete_institution_application,
 )
+from media_store import get_media_store
+from ecosystem import get_ecosystem
 
 
 def init_ecosystem_state():
-    """Ensure ecosystem wrapper exists and load institutions from DB."""
-    if "ecosystem" not in st.session_state:
-        st.session_state.ecosystem = {"institutions": {}}
-
+    """
+    Build this render's ecosystem view: the shared, process-wide snapshot of
+    institutions and their DB user counts (no query unless something was
+    written), merged with the session's own additions (department labels,
+    timetables, announcements) from st.session_state.ecosystem_local.
+    """
     # Pending users still in memory for now
     if "pending_users" not in st.session_state:
         st.session_state.pending_users = []
 
-    # Load institutions from DB into memory structure
-    ecosystem = st.session_state.ecosystem
-    ecosystem["institutions"] = {}
-    rows = list_institutions()
-    for _, name, code, status, country, city, details in rows:
-        ecosystem["institutions"][name] = {
-            "code": code or "",
-            "status": status or "pending",
-            "location": f"{city or ''}, {country or ''} {details or ''}".strip(", "),
-            "departments": set(),
-            "students": [],
-            "teachers": [],
-            "parents": [],
-            "timetables": [],
-            "announcements": [],
+    local = st.session_state.setdefault("ecosystem_local", {})
+    institutions = {}
+    for name, summary in get_ecosystem().institutions().items():
+        extra = local.get(name, {})
+        institutions[name] = {
+            "code": summary.code,
+            "status": summary.status,
+            "location": summary.location,
+            "country": summary.country,
+            "city": summary.city,
+            "details": summary.details,
+            "db_departments": set(summary.departments),
+            "departments": set(summary.departments) | extra.get("departments", set()),
+            "students": summary.students,
+            "teachers": summary.teachers,
+            "parents": summary.parents,
+            "timetables": extra.get("timetables", []),
+            "announcements": extra.get("announcements", []),
         }
+    return {"institutions": institutions}
+
+
+def _local_extras(inst_name):
+    """This session's additions for one institution (created on first write)."""
+    local = st.session_state.setdefault("ecosystem_local", {})
+    return local.setdefault(
+        inst_name, {"departments": set(), "timetables": [], "announcements": []}
+    )
 
 
 def render(role: str):
     lang = st.session_state.get("lang", "en")
-    init_ecosystem_state()
-    ecosystem = st.session_state.ecosystem
+    ecosystem = init_ecosystem_state()
 
     st.header(t("home_title", lang))
     st.write("Role-based overview for the Sanzad Global Ecosystem.")
@@ -151,19 +165,19 @@ def render_super_admin_sections(ecosystem):
 def render_institution_requests_admin():
     st.markdown("### Institution Applications from DB")
 
-    all_rows = list_institutions()
-    pending = [r for r in all_rows if r[3] == "pending"]
-    approved = [r for r in all_rows if r[3] == "approved"]
+    all_rows = list(get_ecosystem().institutions().values())
+    pending = [r for r in all_rows if r.status == "pending"]
+    approved = [r for r in all_rows if r.status == "approved"]
 
     if pending:
         df_pending = pd.DataFrame(
             [
                 {
-                    "Name": r[1],
-                    "Country": r[4],
-                    "City": r[5],
-                    "Details": r[6],
-                    "Code": r[2] or "",
+                    "Name": r.name,
+                    "Country": r.country,
+                    "City": r.city,
+                    "Details": r.details,
+                    "Code": r.code,
                 }
                 for r in pending
             ]
@@ -171,7 +185,7 @@ def render_institution_requests_admin():
         st.write("Pending institution applications:")
         st.dataframe(df_pending)
 
-        names = [r[1] for r in pending]
+        names = [r.name for r in pending]
         selected_name = st.selectbox("Select an institution to review", names)
         new_code = st.text_input(
             "Set / update institution code (optional)", key="inst_code_input"
@@ -195,11 +209,11 @@ def render_institution_requests_admin():
         df_inst = pd.DataFrame(
             [
                 {
-                    "Name": r[1],
-                    "Code": r[2] or "",
-                    "Country": r[4] or "",
-                    "City": r[5] or "",
-                    "Details": r[6] or "",
+                    "Name": r.name,
+                    "Code": r.code,
+                    "Country": r.country,
+                    "City": r.city,
+                    "Details": r.details,
                 }
                 for r in approved
             ]
@@ -276,9 +290,9 @@ def render_institution_role_sections(ecosystem):
         st.write(
             f"Departments: {', '.join(sorted(inst_data['departments'])) if inst_data.get('departments') else 'None'}"
         )
-        st.write(f"Students: {len(inst_data['students'])}")
-        st.write(f"Teachers: {len(inst_data['teachers'])}")
-        st.write(f"Parents linked: {len(inst_data['parents'])}")
+        st.write(f"Students: {inst_data['students']}")
+        st.write(f"Teachers: {inst_data['teachers']}")
+        st.write(f"Parents linked: {inst_data['parents']}")
 
         if inst_data.get("status") == "approved":
             render_institution_department_manager(ecosystem)
@@ -298,7 +312,7 @@ def render_institution_department_manager(ecosystem):
         return
 
     inst_data = ecosystem["institutions"][inst_name]
-    inst_data.setdefault("departments", set())
+    local_departments = _local_extras(inst_name)["departments"]
 
     col_add, col_remove = st.columns(2)
 
@@ -312,12 +326,13 @@ def render_institution_department_manager(ecosystem):
             elif d in inst_data["departments"]:
                 st.warning("Department already exists.")
             else:
-                inst_data["departments"].add(d)
+                local_departments.add(d)
                 st.success(f"Department '{d}' added.")
 
     with col_remove:
         st.markdown("**Remove Department**")
-        existing_departments = sorted(inst_data["departments"])
+        # Labels derived from registered users can only change through the users themselves.
+        existing_departments = sorted(local_departments)
         if existing_departments:
             dept_to_remove = st.selectbox(
                 "Select department to remove",
@@ -325,7 +340,7 @@ def render_institution_department_manager(ecosystem):
                 key="inst_remove_dept",
             )
             if st.button("Remove department"):
-                inst_data["departments"].discard(dept_to_remove)
+                local_departments.discard(dept_to_remove)
                 st.success(f"Department '{dept_to_remove}' removed.")
         else:
             st.write("No departments to remove yet.")
@@ -339,9 +354,7 @@ def render_institution_resources(ecosystem):
         st.info("Link this profile to an approved institution first.")
         return
 
-    inst_data = ecosystem["institutions"][inst_name]
-    inst_data.setdefault("timetables", [])
-    inst_data.setdefault("announcements", [])
+    inst_data = _local_extras(inst_name)
 
     st.markdown("### Timetables (PDF Upload)")
     with st.form("inst_timetable_form"):
@@ -358,7 +371,9 @@ def render_institution_resources(ecosystem):
                     {
                         "title": tt_title.strip(),
                         "filename": tt_file.name,
-                        "data": tt_file.read(),
+                        "media": get_media_store().put(
+                            tt_file.read(), tt_file.name, "application/pdf"
+                        ),
                     }
                 )
                 st.success("Timetable posted.")
@@ -500,7 +515,7 @@ def render_parent_apply_section():
 
 
 def render_admin_view(ecosystem):
-    st.subheader("Ecosystem Overview (from DB + memory)")
+    st.subheader("Ecosystem Overview (from DB + this session)")
 
     institutions = ecosystem["institutions"]
     if not institutions:
@@ -515,9 +530,9 @@ def render_admin_view(ecosystem):
                 "Code": data.get("code", "N/A"),
                 "Status": data.get("status", "pending"),
                 "Departments": len(data.get("departments", [])),
-                "Students": len(data["students"]),
-                "Teachers": len(data["teachers"]),
-                "Parents linked": len(data["parents"]),
+                "Students": data["students"],
+                "Teachers": data["teachers"],
+                "Parents linked": data["parents"],
                 "Timetables": len(data.get("timetables", [])),
                 "Announcements": len(data.get("announcements", [])),
             }
@@ -1,6 +1,8 @@
 import streamlit as st
 import pandas as pd
 
+from session_memory import load_offloaded, offloaded_count
+
 def render(role: str):
     st.header("Innovation Lab")
     st.write("Hackathons, projects, funding, and collaboration.")
@@ -28,8 +30,14 @@ def render(role: str):
 
     with right:
         st.subheader("Projects (This Session)")
-        if st.session_state.projects:
-            df = pd.DataFrame(st.session_state.projects)
+        projects = st.session_state.projects
+        older = offloaded_count("projects")
+        if older and st.checkbox(
+            f"Include {older} older project(s) moved to disk to save memory", key="projects_include_offloaded"
+        ):
+            projects = load_offloaded("projects") + projects
+        if projects:
+            df = pd.DataFrame(projects)
             st.dataframe(df)
         else:
             st.write("No projects submitted yet.")
@@ -1,6 +1,23 @@
 import streamlit as st
 import pandas as pd
-import base64
+
+from media_store import get_media_store
+
+
+def _pdf_download(file_info, key):
+    """Download button that reads the PDF from the media store only when clicked."""
+    store = get_media_store()
+    if store.path(file_info["media"]) is None:
+        st.write(f'{file_info["filename"]} (no longer available)')
+        return
+    st.download_button(
+        label=f'Download: {file_info["filename"]}',
+        data=store.reader(file_info["media"]),
+        file_name=file_info["filename"],
+        mime="application/pdf",
+        key=key,
+    )
+
 
 def render(role: str):
     st.header("Knowledge Hub")
@@ -18,7 +35,7 @@ def render(role: str):
         ]
 
     if "subject_pdfs" not in st.session_state:
-        # key: subject code, value: list of dicts {filename, data}
+        # key: subject code, value: list of dicts {filename, media}
         st.session_state.subject_pdfs = {}
 
     # ---------------------------------
@@ -124,7 +141,12 @@ def render(role: str):
                     if target_code not in st.session_state.subject_pdfs:
                         st.session_state.subject_pdfs[target_code] = []
                     st.session_state.subject_pdfs[target_code].append(
-                        {"filename": pdf_file.name, "data": pdf_file.read()}
+                        {
+                            "filename": pdf_file.name,
+                            "media": get_media_store().put(
+                                pdf_file.read(), pdf_file.name, "application/pdf"
+                            ),
+                        }
                     )
                     st.success(f"Saved PDF '{pdf_file.name}' under {target}.")
 
@@ -152,20 +174,16 @@ def render(role: str):
                     if code in st.session_state.subject_pdfs and st.session_state.subject_pdfs[code]:
                         any_pdf = True
                         st.write(f'**{s["Name"]} ({s["Code"]})**')
-                        for file_info in st.session_state.subject_pdfs[code]:
-                            b64 = base64.b64encode(file_info["data"]).decode()
-                            href = f'<a href="data:application/pdf;base64,{b64}" download="{file_info["filename"]}">Download: {file_info["filename"]}</a>'
-                            st.markdown(href, unsafe_allow_html=True)
+                        for i, file_info in enumerate(st.session_state.subject_pdfs[code]):
+                            _pdf_download(file_info, f"kh_pdf_{code}_{i}")
                 if not any_pdf:
                     st.write("No PDFs uploaded yet for any subject.")
             else:
                 code = selected_subject.split("(")[-1].strip(")")
                 st.write(f"Subject: {selected_subject}")
                 if code in st.session_state.subject_pdfs and st.session_state.subject_pdfs[code]:
-                    for file_info in st.session_state.subject_pdfs[code]:
-                        b64 = base64.b64encode(file_info["data"]).decode()
-                        href = f'<a href="data:application/pdf;base64,{b64}" download="{file_info["filename"]}">Download: {file_info["filename"]}</a>'
-                        st.markdown(href, unsafe_allow_html=True)
+                    for i, file_info in enumerate(st.session_state.subject_pdfs[code]):
+                        _pdf_download(file_info, f"kh_pdf_{code}_{i}")
                 else:
                     st.write("No PDFs uploaded yet for this subject.")
         else:
@@ -1,96 +1,54 @@
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date
+from functools import partial
+
 import streamlit as st
 import pandas as pd
-from datetime import date
-from src.translations import t
-from src.db import (
+from translations import t
+from db import (
     create_assignment_db,
-    list_teacher_assignments,
     list_student_assignments,
     save_submission_db,
-    list_teacher_submissions,
     list_student_submissions,
     save_grade_db,
     list_student_grades,
     get_user_by_email,
-    get_conn,  # make sure this is exported from db.py
+    post_class_message,
+    list_class_messages_since,
+    get_class_message_cursor,
+    mark_class_messages_read,
+    list_student_reminders,
+    mark_student_reminders_read,
+    class_deadline_status,
+    count_rows,
+    list_teacher_classes,
+    find_student_by_reg_no,
 )
+from deadlines import get_scheduler
+from grid import paged_grid, source_fetch
 
 
 def _get_current_user():
     """
-    Expect that after login/registration you stored:
-    st.session_state['user_email']
+    Full user row for the signed-in profile: st.session_state['user_email']
+    if set, otherwise the shell's st.session_state['current_user'].
     """
     email = st.session_state.get("user_email", "")
+    if not email:
+        email = (st.session_state.get("current_user") or {}).get("email", "")
     if not email:
         return None
     return get_user_by_email(email)
 
 
 def _find_child_user(parent_user):
-    """
-    Resolve child user by parent's stored child reg no + institution.
-    Uses users table; can be optimized later.
-    """
+    """Resolve child user by parent's stored child reg no + institution."""
     child_reg = (parent_user.get("parent_child_reg_no") or "").strip()
     inst = (parent_user.get("institution_name") or "").strip()
     if not child_reg or not inst:
         return None
-
-    conn = None
-    try:
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT id, user_code, full_name, email, password_hash, role, phone,
-                   student_id, institution_name, teacher_reg_no, student_reg_no,
-                   parent_child_name, parent_child_reg_no, status
-            FROM users
-            WHERE role = 'Student'
-              AND institution_name = ?
-              AND student_reg_no = ?
-            """,
-            (inst, child_reg),
-        )
-        row = cur.fetchone()
-        if not row:
-            return None
-        (
-            id_,
-            user_code,
-            full_name,
-            email,
-            password_hash,
-            role,
-            phone,
-            student_id,
-            institution_name,
-            teacher_reg_no,
-            student_reg_no,
-            parent_child_name,
-            parent_child_reg_no,
-            status,
-        ) = row
-        return {
-            "id": id_,
-            "user_code": user_code,
-            "full_name": full_name,
-            "email": email,
-            "password_hash": password_hash,
-            "role": role,
-            "phone": phone,
-            "student_id": student_id,
-            "institution_name": institution_name,
-            "teacher_reg_no": teacher_reg_no,
-            "student_reg_no": student_reg_no,
-            "parent_child_name": parent_child_name,
-            "parent_child_reg_no": parent_child_reg_no,
-            "status": status,
-        }
-    finally:
-        if conn is not None:
-            conn.close()
+    return find_student_by_reg_no(inst, child_reg)
 
 
 def render(role: str):
@@ -123,21 +81,24 @@ def render(role: str):
     role = current_user["role"]
     st.info(f"Logged in as: **{current_user['full_name']}** ({role})")
 
-    if "class_messages" not in st.session_state:
-        st.session_state.class_messages = []
+    # Starts the process-wide reminder thread on first use; no-op afterwards.
+    get_scheduler()
 
-    tab_overview, tab_assign, tab_grades, tab_messages, tab_ai_tools = st.tabs(
-        [
-            t("overview_tab", lang),
-            t("assign_tab", lang),
-            t("grades_tab", lang),
-            t("messages_tab", lang),
-            t("ai_tab", lang),
-        ]
-    )
+    section = st.segmented_control(
+        "Smart Teacher section",
+        options=list(SECTION_TABS),
+        format_func=lambda key: t(SECTION_TABS[key], lang),
+        default="overview",
+        key="smart_teacher_section",
+        label_visibility="collapsed",
+    ) or "overview"
+
+    # Only the visible section runs (and touches the database); the data of
+    # the other sections is prefetched in the background for instant switching.
+    data = _load_datasets(current_user, SECTION_DATASETS[section])
 
     # -------- Overview --------
-    with tab_overview:
+    if section == "overview":
         st.subheader(t("overview_tab", lang))
 
         col1, col2 = st.columns(2)
@@ -145,20 +106,15 @@ def render(role: str):
             st.write(f"**Current Smart Teacher role:** {role}")
 
             if role in ["Teacher", "Super Admin"]:
-                teacher_assignments = list_teacher_assignments(current_user["id"]) if role != "Super Admin" else []
-                st.write(f"**Assignments you created:** {len(teacher_assignments)}")
-                teacher_subs = list_teacher_submissions(current_user["id"]) if role != "Super Admin" else []
-                st.write(f"**Submissions for your assignments:** {len(teacher_subs)}")
+                st.write(f"**Assignments you created:** {data['teacher_counts']['assignments']}")
+                st.write(f"**Submissions for your assignments:** {data['teacher_counts']['submissions']}")
 
             if role == "Student":
-                student_assigns = list_student_assignments(current_user)
-                st.write(f"**Assignments available to you:** {len(student_assigns)}")
-                student_subs = list_student_submissions(current_user["id"])
-                st.write(f"**Your submissions:** {len(student_subs)}")
+                st.write(f"**Assignments available to you:** {len(data['student_assignments'])}")
+                st.write(f"**Your submissions:** {len(data['student_submissions'])}")
 
             if role == "Parent":
-                child_grades = _get_child_grades(current_user)
-                st.write(f"**Recorded grades for your child:** {len(child_grades)}")
+                st.write(f"**Recorded grades for your child:** {len(data['child_grades'])}")
 
         with col2:
             st.write(
@@ -170,46 +126,169 @@ def render(role: str):
             )
 
         st.markdown("---")
-        st.write("Use the tabs above to manage assignments, grades, messages, and AI tools.")
+        st.write("Use the sections above to manage assignments, grades, messages, and AI tools.")
 
     # -------- Assignments --------
-    with tab_assign:
+    elif section == "assign":
         st.subheader(t("assign_tab", lang))
 
         if role in ["Teacher", "Super Admin"]:
-            _teacher_assignments_and_submissions(current_user)
+            _teacher_assignments_and_submissions(current_user, data)
         elif role == "Student":
-            _student_assignments_and_submissions(current_user)
+            _student_assignments_and_submissions(current_user, data)
         elif role == "Parent":
             st.info("Parents do not create or submit assignments. Use the Grades tab to see your child's marks.")
         elif role == "Institution":
             st.info("Institution accounts can review summary analytics here in future versions.")
 
     # -------- Grades --------
-    with tab_grades:
+    elif section == "grades":
         st.subheader(t("grades_tab", lang))
 
         if role in ["Teacher", "Super Admin"]:
-            _teacher_grades_view(current_user)
+            _teacher_grades_view(current_user, data)
         elif role == "Student":
-            _student_grades_view(current_user)
+            _student_grades_view(current_user, data)
         elif role == "Parent":
-            _parent_grades_view(current_user)
+            _parent_grades_view(current_user, data)
         elif role == "Institution":
             st.info("Institution accounts will see aggregated performance analytics here later.")
 
     # -------- Messages --------
-    with tab_messages:
+    elif section == "messages":
         _messages_view(current_user)
 
     # -------- AI Tools --------
-    with tab_ai_tools:
+    elif section == "ai":
         _ai_tools_view(current_user)
 
+    _prefetch_datasets(
+        current_user,
+        {name for key, names in SECTION_DATASETS.items() if key != section for name in names},
+    )
+
+
+# ================== SECTION DATA (lazy + prefetched) ==================
+
+SECTION_TABS = {
+    "overview": "overview_tab",
+    "assign": "assign_tab",
+    "grades": "grades_tab",
+    "messages": "messages_tab",
+    "ai": "ai_tab",
+}
+
+# Datasets each section reads; unknown names for a role are simply skipped.
+SECTION_DATASETS = {
+    "overview": (
+        "teacher_counts",
+        "student_assignments",
+        "student_submissions",
+        "child_grades",
+    ),
+    "assign": (
+        "teacher_counts",
+        "teacher_classes",
+        "student_reminders",
+        "student_assignments",
+        "student_submissions",
+    ),
+    "grades": ("teacher_counts", "student_grades", "child_grades"),
+    "messages": (),  # the class board is already fetched incrementally
+    "ai": (),
+}
+
+# Cached datasets are refreshed after this many seconds (other users' writes).
+DATASET_TTL_SECONDS = 60
+
+_PREFETCH_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="smart-teacher-prefetch")
+
+
+def _dataset_loaders(user):
+    """Loaders for the datasets visible to this user (plain db calls, thread-safe)."""
+    uid = user["id"]
+    role = user["role"]
+    if role in ["Teacher", "Super Admin"]:
+        # Tables are paged straight from the db; only counts and class names are cached.
+        return {
+            "teacher_counts": partial(_teacher_counts, uid),
+            "teacher_classes": partial(list_teacher_classes, uid),
+        }
+    if role == "Student":
+        return {
+            "student_assignments": partial(list_student_assignments, user),
+            "student_submissions": partial(list_student_submissions, uid),
+            "student_grades": partial(list_student_grades, uid),
+            "student_reminders": partial(list_student_reminders, uid),
+        }
+    if role == "Parent":
+        return {"child_grades": partial(_get_child_grades, user)}
+    return {}
+
+
+def _teacher_counts(teacher_id):
+    filters = {"teacher_id": teacher_id}
+    return {
+        "assignments": count_rows("teacher_assignments", filters),
+        "submissions": count_rows("teacher_submissions", filters),
+    }
+
+
+def _dataset_cache(user):
+    """Per-session {name: (loaded_at, Future)} cache, reset when the user changes."""
+    key = (user["id"], user["role"])
+    cache = st.session_state.get("smart_teacher_data")
+    if cache is None or cache["key"] != key:
+        cache = {"key": key, "entries": {}}
+        st.session_state["smart_teacher_data"] = cache
+    entries = cache["entries"]
+    now = time.monotonic()
+    for name in [n for n, (loaded_at, _) in entries.items() if now - loaded_at > DATASET_TTL_SECONDS]:
+        del entries[name]
+    return entries
+
+
+def _prefetch_datasets(user, names):
+    loaders = _dataset_loaders(user)
+    entries = _dataset_cache(user)
+    for name in names:
+        if name in loaders and name not in entries:
+            entries[name] = (time.monotonic(), _PREFETCH_POOL.submit(loaders[name]))
+
+
+def _load_datasets(user, names):
+    """Return {name: rows}, reusing finished or in-flight prefetches."""
+    loaders = _dataset_loaders(user)
+    entries = _dataset_cache(user)
+    data = {}
+    for name in names:
+        if name not in loaders:
+            continue
+        entry = entries.get(name)
+        if entry is not None:
+            try:
+                data[name] = entry[1].result()
+                continue
+            except Exception:
+                pass  # failed prefetch: load again below
+        result = loaders[name]()
+        done = Future()
+        done.set_result(result)
+        entries[name] = (time.monotonic(), done)
+        data[name] = result
+    return data
+
+
+def _invalidate_datasets(*names):
+    cache = st.session_state.get("smart_teacher_data")
+    if cache is not None:
+        for name in names:
+            cache["entries"].pop(name, None)
+
 
 # ================== TEACHER FLOW ==================
 
-def _teacher_assignments_and_submissions(user):
+def _teacher_assignments_and_submissions(user, data):
     st.markdown("### Create Assignment (Teacher)")
 
     col_left, col_right = st.columns(2)
@@ -230,7 +309,7 @@ def _teacher_assignments_and_submissions(user):
                     st.error("Please enter an Assignment Title before creating.")
                 else:
                     teacher_id = user["id"] if user["id"] != -1 else 0  # Super Admin placeholder
-                    create_assignment_db(
+                    assignment_id = create_assignment_db(
                         teacher_id=teacher_id,
                         title=title,
                         subject=subject,
@@ -240,68 +319,68 @@ def _teacher_assignments_and_submissions(user):
                         status=status,
                         description=description,
                     )
+                    if status == "Published":
+                        get_scheduler().schedule(assignment_id, due_date)
+                    _invalidate_datasets("teacher_counts", "teacher_classes")
                     st.success(f"Assignment '{title}' ({status}) created for {subject} - {class_name}.")
 
     with col_right:
         st.markdown("### Your Assignments")
         if user["id"] == -1:
             st.info("As Super Admin, you can create assignments for demo, but no teacher is linked.")
-            rows = []
-        else:
-            rows = list_teacher_assignments(user["id"])
-        if not rows:
-            st.write("No assignments found yet.")
-        else:
-            df_assign = pd.DataFrame(
-                [
-                    {
-                        "ID": r[0],
-                        "Title": r[1],
-                        "Subject": r[2],
-                        "Class": r[3],
-                        "Due Date": r[4],
-                        "Max Points": r[5],
-                        "Status": r[6],
-                    }
-                    for r in rows
-                ]
-            )
-            st.dataframe(df_assign, use_container_width=True)
+        paged_grid(
+            "teacher_assign_grid",
+            source_fetch("teacher_assignments", {"teacher_id": user["id"]}),
+            columns=["id", "title", "subject", "class_name", "due_date", "max_points", "status"],
+            labels=["ID", "Title", "Subject", "Class", "Due Date", "Max Points", "Status"],
+            default_sort="id",
+            descending=True,
+        )
+
+    if data["teacher_classes"]:
+        _deadline_status_view(user, data["teacher_classes"])
 
     st.markdown("---")
     st.markdown("### Student Submissions for Your Assignments")
 
     if user["id"] == -1:
         st.info("Super Admin is not linked to a specific teacher; submissions list is empty for now.")
-        subs = []
-    else:
-        subs = list_teacher_submissions(user["id"])
 
+    subs = paged_grid(
+        "teacher_sub_grid",
+        source_fetch("teacher_submissions", {"teacher_id": user["id"]}),
+        columns=[
+            "id",
+            "assignment_id",
+            "student_id",
+            "filename",
+            "submitted_at",
+            "title",
+            "class_name",
+            "student_name",
+        ],
+        labels=[
+            "Submission ID",
+            "Assignment ID",
+            "Student ID",
+            "Filename",
+            "Submitted At",
+            "Assignment Title",
+            "Class",
+            "Student Name",
+        ],
+        default_sort="submitted_at",
+        descending=True,
+    )
     if not subs:
-        st.write("No submissions for your assignments yet.")
+        if not st.session_state.get("teacher_sub_grid_search"):
+            st.write("No submissions for your assignments yet.")
         return
 
-    df_sub = pd.DataFrame(
-        [
-            {
-                "Submission ID": s[0],
-                "Assignment ID": s[1],
-                "Student ID": s[2],
-                "Filename": s[3],
-                "Submitted At": s[4],
-                "Assignment Title": s[5],
-                "Class": s[6],
-                "Student Name": s[7],
-            }
-            for s in subs
-        ]
-    )
-    st.dataframe(df_sub, use_container_width=True)
-
     st.markdown("#### Manual Grading for Selected Submission")
 
-    sub_labels = [f"{s[0]} – {s[7]} – {s[5]} ({s[3]})" for s in subs]
-    selected = st.selectbox("Select submission to grade", sub_labels)
+    sub_labels = [f"{s['id']} – {s['student_name']} – {s['title']} ({s['filename']})" for s in subs]
+    selected = st.selectbox("Select submission to grade (from the page shown above)", sub_labels)
     if selected:
         submission_id = int(selected.split("–")[0].strip())
         score = st.number_input("Score", min_value=0.0, max_value=100.0, value=10.0, step=0.5)
@@ -317,13 +396,56 @@ def _teacher_assignments_and_submissions(user):
             st.success(f"Saved grade {score}/{max_points} for submission ID {submission_id}.")
 
 
-def _teacher_grades_view(user):
+DEADLINE_STATUS_LABELS = {
+    "on_time": "On time",
+    "late": "Late",
+    "missing": "Missing",
+    "pending": "Not yet due",
+}
+
+
+def _deadline_status_view(user, classes):
+    st.markdown("### Deadline Status by Class")
+    class_name = st.selectbox("Class / Group", classes, key="deadline_status_class")
+    rows = class_deadline_status(user["id"], class_name)
+    if not rows:
+        st.write("No published assignments or no registered students for this class yet.")
+        return
+
+    df = pd.DataFrame(
+        [
+            {
+                "Assignment ID": r[0],
+                "Title": r[1],
+                "Due Date": r[2],
+                "Student": r[4],
+                "Submitted At": r[5] or "",
+                "Status": DEADLINE_STATUS_LABELS[r[6]],
+            }
+            for r in rows
+        ]
+    )
+    summary = (
+        df.pivot_table(
+            index=["Assignment ID", "Title", "Due Date"],
+            columns="Status",
+            values="Student",
+            aggfunc="count",
+            fill_value=0,
+        )
+        .reset_index()
+    )
+    st.dataframe(summary, use_container_width=True)
+    with st.expander("Per-student status"):
+        st.dataframe(df, use_container_width=True)
+
+
+def _teacher_grades_view(user, data):
     st.markdown("### Gradebook (Teacher Overview)")
     if user["id"] == -1:
         st.info("Super Admin overview is not linked to specific teacher gradebook yet.")
         return
-    subs = list_teacher_submissions(user["id"])
-    if not subs:
+    if not data["teacher_counts"]["submissions"]:
         st.write("No submissions yet, so no grades to aggregate.")
         return
     st.info(
@@ -334,10 +456,26 @@ def _teacher_grades_view(user):
 
 # ================== STUDENT FLOW ==================
 
-def _student_assignments_and_submissions(user):
+def _student_reminders(user, reminders):
+    if not reminders:
+        return
+    st.markdown("### Deadline Reminders")
+    for r in reminders:
+        hours = r[5] // 60
+        when = f"{hours // 24} day(s)" if hours >= 24 else f"{hours} hour(s)"
+        st.warning(f"**{r[2]}** ({r[3]}) is due on {r[4]} — less than {when} left.")
+    if st.button("Dismiss reminders", key="dismiss_deadline_reminders"):
+        mark_student_reminders_read(user["id"])
+        _invalidate_datasets("student_reminders")
+        st.rerun()
+
+
+def _student_assignments_and_submissions(user, data):
+    _student_reminders(user, data["student_reminders"])
+
     st.markdown("### Assignments Available to You")
 
-    assigns = list_student_assignments(user)
+    assigns = data["student_assignments"]
     if not assigns:
         st.write("No published assignments available for your institution/class yet.")
         return
@@ -382,12 +520,14 @@ def _student_assignments_and_submissions(user):
                 filename=submission_pdf.name,
                 file_bytes=submission_pdf.read(),
             )
+            _invalidate_datasets("student_submissions")
             st.success("Submission uploaded successfully.")
+            data.update(_load_datasets(user, ["student_submissions"]))
 
     st.markdown("---")
     st.markdown("### Your Previous Submissions")
 
-    subs = list_student_submissions(user["id"])
+    subs = data["student_submissions"]
     if not subs:
         st.write("You have not submitted any assignments yet.")
     else:
@@ -408,10 +548,10 @@ def _student_assignments_and_submissions(user):
         st.dataframe(df_sub, use_container_width=True)
 
 
-def _student_grades_view(user):
+def _student_grades_view(user, data):
     st.markdown("### Your Grades")
 
-    grades = list_student_grades(user["id"])
+    grades = data["student_grades"]
     if not grades:
         st.write("No grades recorded for you yet.")
         return
@@ -443,10 +583,10 @@ def _get_child_grades(parent_user):
     return list_student_grades(child_user["id"])
 
 
-def _parent_grades_view(parent_user):
+def _parent_grades_view(parent_user, data):
     st.markdown("### Your Child's Results")
 
-    grades = _get_child_grades(parent_user)
+    grades = data["child_grades"]
     if not grades:
         st.write(
             "No grades found for your linked child. "
@@ -474,9 +614,71 @@ def _parent_grades_view(parent_user):
 
 # ================== MESSAGES & AI ==================
 
+# Keep at most this many messages per class in the session cache.
+CLASS_BOARD_CACHE_SIZE = 200
+
+
+def _class_board(user, class_name: str):
+    """
+    Session cache for one class board.
+
+    Only messages newer than the last id already held in this session are
+    fetched, so re-opening the tab (or any rerun) transfers just the delta.
+    The user's read cursor is loaded once and then tracked locally, which
+    keeps the unread count free of extra queries.
+    """
+    institution = (user.get("institution_name") or "").strip()
+    key = (institution, class_name.strip())
+
+    boards = st.session_state.setdefault("class_boards", {})
+    board = boards.get(key)
+    if board is None:
+        board = {
+            "messages": [],
+            "last_id": 0,
+            "read_id": get_class_message_cursor(user["id"], *key) if user["id"] != -1 else 0,
+        }
+        boards[key] = board
+
+    new_rows = list_class_messages_since(
+        *key, since_id=board["last_id"], limit=CLASS_BOARD_CACHE_SIZE
+    )
+    if new_rows:
+        board["messages"].extend(
+            {
+                "id": r[0],
+                "SenderName": r[2],
+                "SenderRole": r[3],
+                "Message": r[4],
+                "SentAt": r[5],
+            }
+            for r in new_rows
+        )
+        del board["messages"][:-CLASS_BOARD_CACHE_SIZE]
+        board["last_id"] = new_rows[-1][0]
+
+    board["unread"] = sum(1 for m in board["messages"] if m["id"] > board["read_id"])
+    return board
+
+
+def _mark_board_read(user, class_name: str, board):
+    if board["last_id"] <= board["read_id"]:
+        return
+    board["read_id"] = board["last_id"]
+    board["unread"] = 0
+    if user["id"] != -1:
+        mark_class_messages_read(
+            user["id"],
+            (user.get("institution_name") or "").strip(),
+            class_name.strip(),
+            board["last_id"],
+        )
+
+
 def _messages_view(user):
     st.subheader(t("messages_tab", st.session_state.get("lang", "en")))
     role = user["role"]
+    default_class = (user.get("student_id") or "").strip() or "Grade 10 A"
 
     col_left, col_right = st.columns(2)
 
@@ -489,14 +691,16 @@ def _messages_view(user):
                 msg = message_text.strip()
                 if not msg:
                     st.error("Message cannot be empty.")
+                elif not class_name.strip():
+                    st.error("Enter a target class.")
                 else:
-                    st.session_state.class_messages.append(
-                        {
-                            "Class": class_name.strip(),
-                            "SenderRole": role,
-                            "SenderName": user["full_name"],
-                            "Message": msg,
-                        }
+                    post_class_message(
+                        institution_name=user.get("institution_name") or "",
+                        class_name=class_name,
+                        sender_id=user["id"] if user["id"] != -1 else 0,
+                        sender_name=user["full_name"],
+                        sender_role=role,
+                        text=msg,
                     )
                     st.success(f"Message sent to class: {class_name}")
         else:
@@ -504,13 +708,23 @@ def _messages_view(user):
 
     with col_right:
         st.markdown("### View Messages")
-        class_to_view = st.text_input("View messages for class", value="Grade 10 A")
-        msgs = [m for m in st.session_state.class_messages if m["Class"] == class_to_view.strip()]
-        if msgs:
-            for m in msgs:
-                st.write(f"**{m['SenderName']} ({m['SenderRole']}) → {m['Class']}:** {m['Message']}")
+        class_to_view = st.text_input("View messages for class", value=default_class)
+        if not class_to_view.strip():
+            st.write("Enter a class to view its messages.")
+            return
+
+        board = _class_board(user, class_to_view)
+        if board["unread"]:
+            st.caption(f"{board['unread']} new message(s) since your last visit.")
+        if board["messages"]:
+            for m in board["messages"]:
+                marker = "🆕 " if m["id"] > board["read_id"] else ""
+                st.write(
+                    f"{marker}**{m['SenderName']} ({m['SenderRole']}) → {class_to_view.strip()}:** {m['Message']}"
+                )
         else:
             st.write("No messages for this class yet.")
+        _mark_board_read(user, class_to_view, board)
 
 
 def _ai_tools_view(user):
@@ -0,0 +1,125 @@
+# src/notifications.py
+"""
+Notification fan-out: outbox row per send, worker pool expands to inboxes.
+
+send_to_audience() writes one notification_outbox row and returns its id
+straight away; the sender never waits for delivery. A small worker pool
+claims the row, walks the audience's user ids in id order CHUNK_SIZE at a
+time (one indexed, set-based query per chunk) and inserts each chunk into
+notification_inbox with one executemany in one transaction, advancing the
+outbox cursor in the same transaction. A crash or error therefore resumes
+from the last committed chunk, and INSERT OR IGNORE on (outbox_id, user_id)
+keeps a re-sent chunk from duplicating inbox rows.
+
+Failed deliveries are retried with exponential back-off until
+db.NOTIFICATION_MAX_ATTEMPTS; rows left unfinished by a previous process
+are picked up when the notifier is first created. A worker holds its row
+under a lease renewed with every chunk, so a row is only taken over once
+its worker has stopped renewing it for db.NOTIFICATION_LEASE_SECONDS.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Optional
+
+from db import (
+    NOTIFICATION_MAX_ATTEMPTS,
+    audience_user_ids,
+    claim_notification,
+    create_notification,
+    deliver_notification_chunk,
+    finish_notification,
+    list_unfinished_notifications,
+)
+
+WORKERS = 2
+CHUNK_SIZE = 5_000
+RETRY_BASE_SECONDS = 2.0
+
+
+class Notifier:
+    def __init__(self, workers: int = WORKERS, chunk_size: int = CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="notify")
+        self._lock = threading.Lock()
+        self._stats = {"queued": 0, "delivered": 0, "failed": 0, "recipients": 0}
+
+    def send(self, tenant_id, sender_id, audience: Dict[str, Any], title, body, tags=None) -> int:
+        outbox_id = create_notification(tenant_id, sender_id, audience, title, body, tags)
+        self.submit(outbox_id)
+        return outbox_id
+
+    def submit(self, outbox_id: int):
+        with self._lock:
+            self._stats["queued"] += 1
+        self._pool.submit(self._deliver, outbox_id)
+
+    def _deliver(self, outbox_id: int):
+        claimed = claim_notification(outbox_id)
+        if claimed is None:
+            return
+        audience, cursor, attempts = claimed
+        delivered = 0
+        try:
+            while True:
+                user_ids = audience_user_ids(audience, after_id=cursor, limit=self.chunk_size)
+                if not user_ids:
+                    break
+                deliver_notification_chunk(outbox_id, user_ids)
+                cursor = user_ids[-1]
+                delivered += len(user_ids)
+            finish_notification(outbox_id)
+        except Exception as exc:
+            finish_notification(outbox_id, error=f"{type(exc).__name__}: {exc}")
+            with self._lock:
+                self._stats["failed"] += 1
+            if attempts < NOTIFICATION_MAX_ATTEMPTS:
+                self._retry_later(outbox_id, attempts)
+            return
+        with self._lock:
+            self._stats["delivered"] += 1
+            self._stats["recipients"] += delivered
+
+    def _retry_later(self, outbox_id: int, attempts: int):
+        delay = RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+        timer = threading.Timer(delay, self.submit, args=(outbox_id,))
+        timer.daemon = True
+        timer.start()
+
+    def recover(self):
+        """Re-queue notifications a previous process left unfinished."""
+        for outbox_id in list_unfinished_notifications():
+            self.submit(outbox_id)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+
+_notifier = None
+_notifier_lock = threading.Lock()
+
+
+def get_notifier() -> Notifier:
+    """Process-wide notifier; the first call also resumes unfinished deliveries."""
+    global _notifier
+    if _notifier is None:
+        with _notifier_lock:
+            if _notifier is None:
+                notifier = Notifier()
+                notifier.recover()
+                _notifier = notifier
+    return _notifier
+
+
+def send_to_audience(
+    *,
+    tenant_id: str,
+    sender_id: str,
+    audience: Dict[str, Any],
+    title: str,
+    body: str,
+    tags: Optional[Iterable[str]] = None,
+) -> int:
+    """Queue a notification for every active user in `audience`; returns the outbox id."""
+    return get_notifier().send(tenant_id, sender_id, audience, title, body, list(tags or []))
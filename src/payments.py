@@ -0,0 +1,152 @@
+# src/payments.py
+"""
+Local SANZAD Pay: the create_payment_request / get_payment_status contract
+of sanzad_core.payments on a double-entry ledger in SQLite.
+
+A payment request is stored PENDING under an idempotency key, so a retried
+or double-clicked request returns the original payment instead of a
+second one. complete_payment() stands in for the wallet / QR callback and
+moves the payment to SUCCESS or FAILED exactly once; a SUCCESS posts
+
+    payer:<payer_id>        -amount
+    revenue:<domain>        +amount
+
+to the tenant's ledger in the same transaction (see db.transition_payment),
+so concurrent payments from the Mess Hub and Fees tabs can neither
+double-post nor leave a half-written payment.
+
+get_payment_status() is served from a process-wide cache: final statuses
+never change and are cached for good, PENDING for PENDING_CACHE_SECONDS
+so status polling does not hit the database on every rerun.
+"""
+
+import threading
+import time
+import uuid
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Dict, Optional
+
+from db import (
+    PAYMENT_FINAL_STATUSES,
+    get_payment_request,
+    insert_payment_request,
+    transition_payment,
+)
+
+PENDING_CACHE_SECONDS = 2.0
+STATUS_CACHE_SIZE = 50_000
+
+
+class PaymentStatus:
+    PENDING = "PENDING"
+    SUCCESS = "SUCCESS"
+    FAILED = "FAILED"
+
+
+def to_cents(amount) -> int:
+    cents = (Decimal(str(amount)) * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP)
+    return int(cents)
+
+
+class _StatusCache:
+    def __init__(self, size: int = STATUS_CACHE_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        # payment_id -> (status, expires_at or None for final statuses)
+        self._items: Dict[str, tuple] = {}
+
+    def get(self, payment_id: str) -> Optional[str]:
+        with self._lock:
+            item = self._items.get(payment_id)
+        if item is None:
+            return None
+        status, expires_at = item
+        if expires_at is not None and time.monotonic() > expires_at:
+            return None
+        return status
+
+    def put(self, payment_id: str, status: str):
+        final = status in PAYMENT_FINAL_STATUSES
+        with self._lock:
+            if len(self._items) >= self.size and payment_id not in self._items:
+                # Drop the oldest half; dicts keep insertion order.
+                for key in list(self._items)[: self.size // 2]:
+                    del self._items[key]
+            self._items[payment_id] = (status, None if final else time.monotonic() + PENDING_CACHE_SECONDS)
+
+
+_status_cache = _StatusCache()
+
+
+def create_payment_request(
+    *,
+    tenant_id: str,
+    payer_id: str,
+    amount: float,
+    currency: str,
+    description: str,
+    metadata: Optional[Dict[str, Any]] = None,
+    idempotency_key: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Create (or, for a repeated idempotency_key, return) a PENDING payment.
+    Without a key every call creates a new payment.
+    """
+    amount_cents = to_cents(amount)
+    if amount_cents <= 0:
+        raise ValueError("Amount must be greater than zero.")
+    payment = insert_payment_request(
+        payment_id=f"pay-{uuid.uuid4().hex}",
+        tenant_id=tenant_id,
+        payer_id=str(payer_id),
+        idempotency_key=idempotency_key or uuid.uuid4().hex,
+        amount_cents=amount_cents,
+        currency=currency,
+        description=description,
+        metadata=metadata,
+    )
+    _status_cache.put(payment["payment_id"], payment["status"])
+    return {
+        "payment_id": payment["payment_id"],
+        "qr_url": f"sanzadpay://pay/{payment['payment_id']}",
+        "amount": payment["amount_cents"] / 100,
+        "currency": payment["currency"],
+        "description": payment["description"],
+        "metadata": payment["metadata"],
+        "status": payment["status"],
+    }
+
+
+def get_payment_status(payment_id: str) -> str:
+    status = _status_cache.get(payment_id)
+    if status is None:
+        payment = get_payment_request(payment_id)
+        if payment is None:
+            raise KeyError(payment_id)
+        status = payment["status"]
+        _status_cache.put(payment_id, status)
+    return status
+
+
+def complete_payment(payment_id: str, success: bool = True, confirmed_by: Optional[str] = None) -> str:
+    """
+    Settle a PENDING payment (wallet / QR confirmation); returns the final
+    status. confirmed_by is the user who confirmed it by hand, if any.
+    """
+    cached = _status_cache.get(payment_id)
+    if cached in PAYMENT_FINAL_STATUSES:
+        return cached
+    payment = get_payment_request(payment_id)
+    if payment is None:
+        raise KeyError(payment_id)
+    if success:
+        domain = payment["metadata"].get("domain") or "general"
+        postings = [
+            (f"payer:{payment['payer_id']}", -payment["amount_cents"]),
+            (f"revenue:{domain}", payment["amount_cents"]),
+        ]
+        status = transition_payment(payment_id, PaymentStatus.SUCCESS, postings, confirmed_by=confirmed_by)
+    else:
+        status = transition_payment(payment_id, PaymentStatus.FAILED, confirmed_by=confirmed_by)
+    _status_cache.put(payment_id, status)
+    return status
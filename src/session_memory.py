@@ -0,0 +1,287 @@
+# src/session_memory.py
+"""
+Per-session memory accounting and caps for st.session_state.
+
+account_session() runs at the end of every script run but measures at most
+once per MemoryPolicy.measure_every seconds per session. A measurement:
+
+1. offloads the oldest items of the growing lists named in LIST_CAPS to
+   disk, keeping their newest items in session state,
+2. measures the deep size of every session-state key,
+3. drops rebuildable caches (REBUILDABLE_KEYS) that exceed the per-key cap,
+   then, while the session is over its total cap, drops the largest
+   rebuildable cache or offloads the older half of the largest capped list,
+4. records the result in a process-wide registry keyed by session id.
+
+Offloaded items are appended to a file of the session under ARCHIVE_DIR,
+the way media_store keeps uploads out of session state, and views read
+them back only when asked:
+
+    older = offloaded_count("env_reports")
+    if older and st.checkbox(f"Show {older} older report(s)"):
+        reports = load_offloaded("env_reports") + reports
+
+A session's files are removed once the session has closed.
+
+The Super Admin diagnostics read usage_report() for per-session and total
+figures and can change the process-wide policy at runtime.
+"""
+
+import pickle
+import shutil
+import sys
+import threading
+import time
+import types
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+MB = 1024 * 1024
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+ARCHIVE_DIR = BASE_DIR / "session_archive"
+
+# Growing lists -> newest items kept in session state; older items are
+# offloaded to disk, not dropped. Pending approvals and emergency reports
+# are never capped.
+LIST_CAPS = {
+    "env_reports": 200,
+    "wellbeing_logs": 500,
+    "projects": 200,
+    "community_topics": 300,
+}
+
+# Caches every view rebuilds from the database (or media store) on demand.
+REBUILDABLE_KEYS = ("smart_teacher_data", "class_boards")
+
+MEASURED_AT_KEY = "_memory_measured_at"
+# list key -> (archive file name, items offloaded), in session state.
+OFFLOADED_KEY = "_memory_offloaded"
+# Sessions not seen for this long are dropped from the registry.
+SESSION_TTL_SECONDS = 3600
+
+
+@dataclass
+class MemoryPolicy:
+    session_bytes: int = 64 * MB
+    key_bytes: int = 16 * MB
+    measure_every: float = 30.0
+    list_caps: Dict[str, int] = field(default_factory=lambda: dict(LIST_CAPS))
+
+
+@dataclass
+class SessionUsage:
+    session_id: str
+    user: str
+    total_bytes: int
+    key_bytes: Dict[str, int]
+    measured_at: float
+    evictions: int = 0
+    offloaded: int = 0
+
+
+policy = MemoryPolicy()
+
+_sessions: Dict[str, SessionUsage] = {}
+_sessions_lock = threading.Lock()
+_swept_at = 0.0
+
+
+_OPAQUE = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+
+def deep_size(obj) -> int:
+    """
+    Approximate retained size of obj. Containers and plain objects are
+    walked; objects with their own __sizeof__ (e.g. DataFrames) report
+    their full size and are not walked further.
+    """
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        o = stack.pop()
+        if id(o) in seen or isinstance(o, _OPAQUE):
+            continue
+        seen.add(id(o))
+        try:
+            total += sys.getsizeof(o)
+        except TypeError:
+            continue
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset, deque)):
+            stack.extend(o)
+        elif isinstance(o, (str, bytes, bytearray, int, float, bool)) or o is None:
+            continue
+        elif type(o).__sizeof__ is not object.__sizeof__:
+            continue
+        elif hasattr(o, "__dict__"):
+            stack.append(vars(o))
+        elif hasattr(o, "__slots__"):
+            stack.extend(getattr(o, s) for s in o.__slots__ if hasattr(o, s))
+    return total
+
+
+def _archive(session_id: str, name: str) -> Path:
+    return ARCHIVE_DIR / session_id / name
+
+
+def _offload(state, session_id: str, key: str, count: int) -> int:
+    """
+    Append the oldest count items of state[key] to the session's archive and
+    remove them from the list. Returns the number moved (0 if the write failed,
+    in which case the list is left as it was).
+    """
+    value = state[key]
+    offloaded = state.setdefault(OFFLOADED_KEY, {})
+    name, moved = offloaded.get(key, (f"{key}-{uuid.uuid4().hex}.pkl", 0))
+    path = _archive(session_id, name)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "ab") as fh:
+            pickle.dump(value[:count], fh, protocol=pickle.HIGHEST_PROTOCOL)
+    except (OSError, pickle.PicklingError):
+        return 0
+    del value[:count]
+    offloaded[key] = (name, moved + count)
+    return count
+
+
+def offloaded_count(key: str) -> int:
+    """Items of the session list key that have been moved to disk."""
+    entry = st.session_state.get(OFFLOADED_KEY, {}).get(key)
+    return entry[1] if entry else 0
+
+
+def load_offloaded(key: str) -> List:
+    """The items of the session list key moved to disk, oldest first."""
+    ctx = get_script_run_ctx()
+    entry = st.session_state.get(OFFLOADED_KEY, {}).get(key)
+    if ctx is None or entry is None:
+        return []
+    items = []
+    try:
+        with open(_archive(ctx.session_id, entry[0]), "rb") as fh:
+            while True:
+                try:
+                    items.extend(pickle.load(fh))
+                except EOFError:
+                    break
+    except FileNotFoundError:
+        pass
+    return items
+
+
+def _trim_lists(state, session_id: str, caps):
+    for key, cap in caps.items():
+        value = state.get(key)
+        if isinstance(value, list) and len(value) > cap:
+            _offload(state, session_id, key, len(value) - cap)
+
+
+def _enforce(state, session_id: str, sizes: Dict[str, int]) -> int:
+    """Apply the per-key and per-session caps; updates sizes in place. Returns caches dropped."""
+    evictions = 0
+    for key in REBUILDABLE_KEYS:
+        if sizes.get(key, 0) > policy.key_bytes:
+            del state[key]
+            sizes.pop(key)
+            evictions += 1
+
+    while sum(sizes.values()) > policy.session_bytes:
+        rebuildable = [k for k in REBUILDABLE_KEYS if k in sizes]
+        if rebuildable:
+            key = max(rebuildable, key=sizes.get)
+            del state[key]
+            sizes.pop(key)
+        else:
+            lists = [k for k in policy.list_caps if isinstance(state.get(k), list) and len(state[k]) > 1]
+            if not lists:
+                break
+            key = max(lists, key=lambda k: sizes.get(k, 0))
+            if not _offload(state, session_id, key, len(state[key]) // 2):
+                break
+            sizes[key] = deep_size(state[key])
+            continue
+        evictions += 1
+    return evictions
+
+
+def account_session(force: bool = False) -> Optional[SessionUsage]:
+    """Measure and cap the current session (rate-limited unless force)."""
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return None
+    state = st.session_state
+    now = time.time()
+    last = state.get(MEASURED_AT_KEY)
+    if not force and last is not None and now - last < policy.measure_every:
+        return None
+    state[MEASURED_AT_KEY] = now
+
+    _trim_lists(state, ctx.session_id, policy.list_caps)
+    sizes = {key: deep_size(state[key]) for key in list(state.keys())}
+    evictions = _enforce(state, ctx.session_id, sizes)
+
+    user = (state.get("current_user") or {}).get("email") or (
+        "Super Admin" if state.get("is_super_admin") else "anonymous"
+    )
+    with _sessions_lock:
+        previous = _sessions.get(ctx.session_id)
+        usage = SessionUsage(
+            session_id=ctx.session_id,
+            user=user,
+            total_bytes=sum(sizes.values()),
+            key_bytes=dict(sorted(sizes.items(), key=lambda kv: -kv[1])),
+            measured_at=now,
+            evictions=(previous.evictions if previous else 0) + evictions,
+            offloaded=sum(n for _, n in state.get(OFFLOADED_KEY, {}).values()),
+        )
+        _sessions[ctx.session_id] = usage
+    _sweep_archives(now)
+    return usage
+
+
+def _is_active(session_id: str) -> bool:
+    try:
+        from streamlit.runtime import Runtime
+
+        return Runtime.instance().is_active_session(session_id)
+    except Exception:
+        return True
+
+
+def _sweep_archives(now: float):
+    """Remove the archives of closed sessions (at most once per SESSION_TTL_SECONDS)."""
+    global _swept_at
+    if now - _swept_at < SESSION_TTL_SECONDS:
+        return
+    _swept_at = now
+    if not ARCHIVE_DIR.is_dir():
+        return
+    for path in ARCHIVE_DIR.iterdir():
+        # An archive written recently may belong to another process's session.
+        if path.is_dir() and not _is_active(path.name) and now - path.stat().st_mtime > SESSION_TTL_SECONDS:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def usage_report():
+    """(sessions sorted by size, total bytes); forgets closed or long-idle sessions."""
+    now = time.time()
+    with _sessions_lock:
+        for session_id, usage in list(_sessions.items()):
+            active = _is_active(session_id)
+            if not active:
+                shutil.rmtree(ARCHIVE_DIR / session_id, ignore_errors=True)
+            if now - usage.measured_at > SESSION_TTL_SECONDS or not active:
+                del _sessions[session_id]
+        sessions = sorted(_sessions.values(), key=lambda u: -u.total_bytes)
+    return sessions, sum(u.total_bytes for u in sessions)
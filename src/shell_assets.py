@@ -0,0 +1,64 @@
+# src/shell_assets.py
+"""
+Static pieces of the app shell, built once per process.
+
+Streamlit re-executes app.py from the top on every rerun, so anything
+defined there is rebuilt each time. The theme CSS and the Wings navigation
+tables never change while the server runs; they live in this imported
+module instead and are computed on first import.
+"""
+
+import re
+from functools import lru_cache
+from pathlib import Path
+
+THEME_PATH = Path(__file__).parent / "static" / "theme.css"
+
+
+@lru_cache(maxsize=1)
+def theme_css() -> str:
+    """Contents of static/theme.css with comments and indentation stripped."""
+    css = THEME_PATH.read_text(encoding="utf-8")
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    return css.strip()
+
+
+# Sidebar label -> module file under src/modules (resolved via module_registry).
+WING_MODULES = {
+    "Home": "home",
+    "Sanzad Campus Hub": "campus_hub",
+    "Smart Teacher": "smart_teacher",
+    "Knowledge Hub": "knowledge_hub",
+    "Community Hub": "community_hub",
+    "Gamification": "gamification",
+    "Analytics": "analytics",
+    "Career": "career",
+    "Innovation Lab": "innovation_lab",
+    "Finance": "finance",
+    "Wellbeing": "wellbeing",
+    "EnviroTech": "envirotech",
+}
+
+WING_ICONS = {
+    "Home": "🏠",
+    "Sanzad Campus Hub": "🎓",
+    "Smart Teacher": "🧑‍🏫",
+    "Knowledge Hub": "📚",
+    "Community Hub": "🌐",
+    "Gamification": "🎯",
+    "Analytics": "📊",
+    "Career": "💼",
+    "Innovation Lab": "🧪",
+    "Finance": "💰",
+    "Wellbeing": "🩺",
+    "EnviroTech": "♻️",
+}
+
+MODULE_LIST = list(WING_MODULES)
+
+# Sidebar selectbox label ("🏠  Home") -> module name, and the reverse.
+LABEL_TO_MODULE = {f"{WING_ICONS[m]}  {m}": m for m in MODULE_LIST}
+MODULE_TO_LABEL = {m: label for label, m in LABEL_TO_MODULE.items()}
+NAV_LABELS = list(LABEL_TO_MODULE)
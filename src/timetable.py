@@ -0,0 +1,435 @@
+# src/timetable.py
+"""
+Weekly timetable solver.
+
+Each course needs `sessions` weekly sessions; a session is one (slot, room)
+pair, a slot being one period of one teaching day. Hard constraints: a
+room, a lecturer and a class are in at most one session per slot, and a
+session's room holds the course's students. Soft constraint: sessions of
+one course fall on different days.
+
+solve() places sessions greedily (hardest first: fewest rooms that fit,
+then largest class) and then improves the timetable by simulated
+annealing, moving one session to another slot and room at a time. Clash
+counts per (room, slot), (lecturer, slot), (class, slot) and (course, day)
+are kept in flat lists, so a move is priced in constant time. The search
+stops at the time budget or as soon as the timetable is clash-free with
+the best achievable spread.
+
+Re-solving after local edits: pass the saved timetable as `initial`
+(warm start) and the hand-placed sessions as `locked`; locked sessions
+never move, the rest start where they were. solve_institution() does this
+for the timetable saved in the database.
+"""
+
+import math
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from db import (
+    get_timetable_settings,
+    list_timetable_courses,
+    list_timetable_entries,
+    list_timetable_rooms,
+    save_timetable_entries,
+)
+from intervals import ScheduleIndex
+
+HARD_WEIGHT = 10
+DEFAULT_TIME_BUDGET = 30.0
+PROGRESS_SECONDS = 0.5
+
+# (course_code, session_index) -> (slot, room_name)
+Placement = Dict[Tuple[str, int], Tuple[int, str]]
+
+
+class _Model:
+    def __init__(self, courses, rooms, n_days, periods):
+        self.n_days = n_days
+        self.periods = periods
+        self.n_slots = n_days * periods
+        self.room_names = [name for name, _ in rooms]
+        room_index = {name: i for i, name in enumerate(self.room_names)}
+        by_capacity = sorted(range(len(rooms)), key=lambda r: (rooms[r][1], r))
+
+        lecturers: Dict[str, int] = {}
+        classes: Dict[str, int] = {}
+        self.course_codes = [c["code"] for c in courses]
+        self.events: List[Tuple[str, int]] = []
+        self.course_of: List[int] = []
+        self.lecturer_of: List[int] = []
+        self.class_of: List[int] = []
+        self.rooms_of: List[List[int]] = []
+        self.oversized: List[bool] = []
+        self.min_soft = 0
+        for c, course in enumerate(courses):
+            size = int(course.get("students") or 0)
+            fits = [r for r in by_capacity if rooms[r][1] >= size]
+            # No room is big enough: use the largest ones and report it.
+            oversized = not fits
+            if oversized:
+                largest = rooms[by_capacity[-1]][1]
+                fits = [r for r in by_capacity if rooms[r][1] == largest]
+            lecturer = lecturers.setdefault(str(course.get("lecturer") or f"#{course['code']}"), len(lecturers))
+            group = classes.setdefault(str(course.get("class_name") or f"#{course['code']}"), len(classes))
+            sessions = int(course.get("sessions") or 1)
+            self.min_soft += max(0, sessions - n_days)
+            for k in range(sessions):
+                self.events.append((course["code"], k))
+                self.course_of.append(c)
+                self.lecturer_of.append(lecturer)
+                self.class_of.append(group)
+                self.rooms_of.append(fits)
+                self.oversized.append(oversized)
+        self.room_index = room_index
+
+        S = self.n_slots
+        self.room_use = [0] * (len(rooms) * S)
+        self.lecturer_use = [0] * (len(lecturers) * S)
+        self.class_use = [0] * (len(classes) * S)
+        self.course_day = [0] * (len(courses) * n_days)
+        self.slot = [-1] * len(self.events)
+        self.room = [-1] * len(self.events)
+        self.hard = 0
+        self.soft = 0
+
+    def _keys(self, e, s, r):
+        S = self.n_slots
+        return (
+            r * S + s,
+            self.lecturer_of[e] * S + s,
+            self.class_of[e] * S + s,
+            self.course_of[e] * self.n_days + s // self.periods,
+        )
+
+    def delta_remove(self, e):
+        rk, lk, ck, dk = self._keys(e, self.slot[e], self.room[e])
+        hard = (self.room_use[rk] > 1) + (self.lecturer_use[lk] > 1) + (self.class_use[ck] > 1)
+        return -hard, -(self.course_day[dk] > 1)
+
+    def delta_add(self, e, s, r):
+        rk, lk, ck, dk = self._keys(e, s, r)
+        hard = (self.room_use[rk] > 0) + (self.lecturer_use[lk] > 0) + (self.class_use[ck] > 0)
+        return hard, int(self.course_day[dk] > 0)
+
+    def place(self, e, s, r):
+        hard, soft = self.delta_add(e, s, r)
+        rk, lk, ck, dk = self._keys(e, s, r)
+        self.room_use[rk] += 1
+        self.lecturer_use[lk] += 1
+        self.class_use[ck] += 1
+        self.course_day[dk] += 1
+        self.slot[e], self.room[e] = s, r
+        self.hard += hard
+        self.soft += soft
+
+    def unplace(self, e):
+        hard, soft = self.delta_remove(e)
+        rk, lk, ck, dk = self._keys(e, self.slot[e], self.room[e])
+        self.room_use[rk] -= 1
+        self.lecturer_use[lk] -= 1
+        self.class_use[ck] -= 1
+        self.course_day[dk] -= 1
+        self.slot[e] = self.room[e] = -1
+        self.hard += hard
+        self.soft += soft
+
+    def clashing(self, e) -> bool:
+        rk, lk, ck, _ = self._keys(e, self.slot[e], self.room[e])
+        return self.room_use[rk] > 1 or self.lecturer_use[lk] > 1 or self.class_use[ck] > 1
+
+    def free_room(self, e, s):
+        """Smallest room that fits the event and is free in slot s, or None."""
+        S = self.n_slots
+        for r in self.rooms_of[e]:
+            if not self.room_use[r * S + s]:
+                return r
+        return None
+
+    def best_spot(self, e):
+        """Cheapest (slot, room) for an unplaced event; smallest free room that fits."""
+        best, best_cost = None, None
+        S = self.n_slots
+        lecturer, group = self.lecturer_of[e] * S, self.class_of[e] * S
+        day_base = self.course_of[e] * self.n_days
+        for s in range(S):
+            people = (self.lecturer_use[lecturer + s] > 0) + (self.class_use[group + s] > 0)
+            spread = self.course_day[day_base + s // self.periods] > 0
+            base = HARD_WEIGHT * people + spread
+            if best_cost is not None and base >= best_cost:
+                continue
+            room = self.free_room(e, s)
+            cost = base if room is not None else base + HARD_WEIGHT
+            if room is None:
+                room = self.rooms_of[e][0]
+            if best_cost is None or cost < best_cost:
+                best, best_cost = (s, room), cost
+                if cost == 0:
+                    break
+        return best
+
+
+def solve(
+    courses: Sequence[dict],
+    rooms: Sequence[Tuple[str, int]],
+    n_days: int,
+    periods: int,
+    *,
+    initial: Optional[Placement] = None,
+    locked: Iterable[Tuple[str, int]] = (),
+    time_budget: float = DEFAULT_TIME_BUDGET,
+    progress: Optional[Callable[[dict], None]] = None,
+    seed: Optional[int] = None,
+) -> dict:
+    """
+    courses: [{"code", "lecturer", "class_name", "students", "sessions"}]
+    rooms:   [(name, capacity)]
+
+    Returns {"placement": {(code, session): (slot, room_name)}, "hard",
+    "soft", "moved", "oversized", "iterations", "elapsed", "stopped"}; hard
+    is the number of clashes (0 = clash-free), soft the number of extra
+    sessions of a course on a day it already has one, moved the number of
+    warm-started sessions that left their spot. `progress` is called about
+    every PROGRESS_SECONDS with the same counters for the best timetable
+    so far.
+    """
+    if not rooms:
+        raise ValueError("Add at least one room.")
+    if n_days < 1 or periods < 1:
+        raise ValueError("The week needs at least one day and one period.")
+    codes = [c["code"] for c in courses]
+    if len(set(codes)) != len(codes):
+        raise ValueError("Course codes must be unique.")
+
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    model = _Model(courses, rooms, n_days, periods)
+    n_events = len(model.events)
+    event_index = {key: e for e, key in enumerate(model.events)}
+    initial = initial or {}
+
+    # Warm start: locked sessions first, then saved sessions that still fit.
+    # A warm-started session costs 1 for leaving its saved spot, so a
+    # re-solve repairs the edited timetable instead of reshuffling it.
+    anchor: List[Optional[Tuple[int, int]]] = [None] * n_events
+    frozen = set()
+    for key in locked:
+        e = event_index.get(key)
+        spot = initial.get(key)
+        if e is not None and spot and spot[1] in model.room_index and 0 <= spot[0] < model.n_slots:
+            model.place(e, spot[0], model.room_index[spot[1]])
+            frozen.add(e)
+    pending = []
+    for e, key in enumerate(model.events):
+        if e in frozen:
+            continue
+        spot = initial.get(key)
+        r = model.room_index.get(spot[1]) if spot else None
+        if r is not None and 0 <= spot[0] < model.n_slots and r in model.rooms_of[e]:
+            model.place(e, spot[0], r)
+            anchor[e] = (spot[0], r)
+        else:
+            pending.append(e)
+
+    # Greedy construction, hardest sessions first.
+    pending.sort(key=lambda e: (len(model.rooms_of[e]), -int(courses[model.course_of[e]].get("students") or 0)))
+    for e in pending:
+        model.place(e, *model.best_spot(e))
+
+    movable = [e for e in range(n_events) if e not in frozen]
+    best_cost = HARD_WEIGHT * model.hard + model.soft
+    moved = 0
+    best = (list(model.slot), list(model.room), model.hard, model.soft, moved)
+    target = model.min_soft
+    iterations = 0
+
+    def solved():
+        # The moved-session penalty is not part of the target: a repaired
+        # timetable that had to move sessions is still done.
+        return best[2] == 0 and best[3] <= target
+
+    def report():
+        if progress:
+            progress(
+                {
+                    "elapsed": time.perf_counter() - started,
+                    "iterations": iterations,
+                    "hard": best[2],
+                    "soft": best[3],
+                    "budget": time_budget,
+                }
+            )
+
+    report()
+    t_start, t_end = 0.3, 0.05
+    next_report = started + PROGRESS_SECONDS
+    cost = best_cost
+    temperature = t_start
+    clashing = [e for e in movable if model.clashing(e)]
+    while movable and not solved():
+        iterations += 1
+        if iterations % 512 == 0:
+            now = time.perf_counter()
+            fraction = (now - started) / time_budget if time_budget > 0 else 1.0
+            if fraction >= 1.0:
+                break
+            temperature = t_start * (t_end / t_start) ** fraction
+            if now >= next_report:
+                next_report = now + PROGRESS_SECONDS
+                report()
+
+            # Mostly move sessions that are part of a clash.
+            clashing = [e for e in movable if model.clashing(e)]
+
+        pool = clashing if clashing and rng.random() < 0.8 else movable
+        e = pool[rng.randrange(len(pool))]
+        s = rng.randrange(model.n_slots)
+        rooms_e = model.rooms_of[e]
+        r = model.free_room(e, s)
+        if r is None or rng.random() < 0.1:
+            r = rooms_e[rng.randrange(len(rooms_e))]
+        old_s, old_r = model.slot[e], model.room[e]
+        if s == old_s and r == old_r:
+            continue
+        h1, s1 = model.delta_remove(e)
+        model.unplace(e)
+        h2, s2 = model.delta_add(e, s, r)
+        m = 0
+        if anchor[e] is not None:
+            m = ((s, r) != anchor[e]) - ((old_s, old_r) != anchor[e])
+        delta = HARD_WEIGHT * (h1 + h2) + s1 + s2 + m
+        if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+            model.place(e, s, r)
+            cost += delta
+            moved += m
+            if cost < best_cost:
+                best_cost = cost
+                best = (list(model.slot), list(model.room), model.hard, model.soft, moved)
+        else:
+            model.place(e, old_s, old_r)
+
+    report()
+    slots, room_idx, hard, soft, moved = best
+    return {
+        "placement": {
+            model.events[e]: (slots[e], model.room_names[room_idx[e]]) for e in range(n_events)
+        },
+        "hard": hard,
+        "soft": soft,
+        "moved": moved,
+        "oversized": sorted({model.events[e][0] for e in range(n_events) if model.oversized[e]}),
+        "iterations": iterations,
+        "elapsed": time.perf_counter() - started,
+        "stopped": "solved" if solved() else "time budget",
+    }
+
+
+def find_clashes(courses: Sequence[dict], rooms: Sequence[Tuple[str, int]], placement: Placement) -> List[str]:
+    """Human-readable hard-constraint violations of a (possibly hand-edited) timetable."""
+    capacity = dict(rooms)
+    by_code = {c["code"]: c for c in courses}
+    seen: Dict[tuple, str] = {}
+    problems = []
+    for (code, k), (s, room) in sorted(placement.items()):
+        course = by_code.get(code)
+        if course is None:
+            continue
+        size = int(course.get("students") or 0)
+        if room not in capacity:
+            problems.append(f"{code} session {k + 1}: unknown room {room}")
+        elif capacity[room] < size:
+            problems.append(f"{code} session {k + 1}: {room} holds {capacity[room]}, course has {size}")
+        for what, who in (("room", room), ("lecturer", course.get("lecturer")), ("class", course.get("class_name"))):
+            if not who:
+                continue
+            other = seen.setdefault((what, who, s), (code, k))
+            if other != (code, k):
+                problems.append(f"slot {s}: {what} {who} has both {other[0]} and {code}")
+    return problems
+
+
+def count_same_day(courses: Sequence[dict], placement: Placement, periods: int) -> int:
+    """Extra sessions of a course on a day it already has one (the soft count of solve())."""
+    known = {c["code"] for c in courses}
+    days: Dict[Tuple[str, int], int] = {}
+    for (code, _), (slot, _) in placement.items():
+        if code in known:
+            key = (code, slot // periods)
+            days[key] = days.get(key, 0) + 1
+    return sum(n - 1 for n in days.values())
+
+def slot_interval(slot: int, settings: dict) -> Tuple[int, int]:
+    """[start, end) of a slot in minutes from midnight of the first teaching day."""
+    hours, minutes = map(int, settings["first_period"].split(":"))
+    day, period = divmod(int(slot), int(settings["periods"]))
+    start = day * 24 * 60 + hours * 60 + minutes + period * int(settings["period_minutes"])
+    return start, start + int(settings["period_minutes"])
+
+
+def session_resources(course: dict, room: str):
+    """Resources a session of `course` in `room` occupies, for a ScheduleIndex."""
+    return (("room", room), ("lecturer", course.get("lecturer")), ("class", course.get("class_name")))
+
+
+def schedule_index(courses: Sequence[dict], placement: Placement, settings: dict) -> ScheduleIndex:
+    """ScheduleIndex of a timetable, items keyed (course_code, session)."""
+    by_code = {c["code"]: c for c in courses}
+    return ScheduleIndex(
+        (key, session_resources(by_code[key[0]], room), *slot_interval(slot, settings))
+        for key, (slot, room) in placement.items()
+        if key[0] in by_code
+    )
+
+
+def period_labels(first_period: str, period_minutes: int, periods: int) -> List[str]:
+    """['08:00-09:00', '09:00-10:00', ...]"""
+    start = datetime.strptime(first_period, "%H:%M")
+    step = timedelta(minutes=int(period_minutes))
+    return [
+        f"{(start + i * step):%H:%M}-{(start + (i + 1) * step):%H:%M}" for i in range(int(periods))
+    ]
+
+
+def solve_institution(
+    institution_name: str,
+    *,
+    warm_start: bool = True,
+    time_budget: float = DEFAULT_TIME_BUDGET,
+    progress: Optional[Callable[[dict], None]] = None,
+) -> dict:
+    """
+    Solve the institution's saved rooms and courses and save the result.
+    With warm_start the saved timetable is the starting point and its
+    locked sessions stay where they are; otherwise it is rebuilt from
+    scratch (locked sessions still stay).
+    """
+    settings = get_timetable_settings(institution_name)
+    courses = list_timetable_courses(institution_name)
+    rooms = list_timetable_rooms(institution_name)
+    if not courses:
+        raise ValueError("Add courses before generating a timetable.")
+    saved = list_timetable_entries(institution_name)
+    locked = [(code, k) for code, k, _, _, is_locked in saved if is_locked]
+    initial = {
+        (code, k): (slot, room) for code, k, slot, room, is_locked in saved if warm_start or is_locked
+    }
+    result = solve(
+        courses,
+        rooms,
+        len(settings["days"]),
+        settings["periods"],
+        initial=initial,
+        locked=locked,
+        time_budget=time_budget,
+        progress=progress,
+    )
+    frozen = set(locked)
+    save_timetable_entries(
+        institution_name,
+        [(code, k, slot, room, (code, k) in frozen) for (code, k), (slot, room) in result["placement"].items()],
+        result["hard"],
+        result["soft"],
+    )
+    return result